@@ -0,0 +1,27 @@
+# histogram.py
+
+
+class Histogram:
+    """Histograma de buckets fixos (o ultimo bucket e "acima do maior limite")."""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def add(self, value: float):
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+    def export(self):
+        labels = [f"le_{b}" for b in self.bounds] + ["inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.total,
+            "mean": round(self.sum / self.total, 4) if self.total else None,
+        }
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Proxy local de inferencia para o Triton (gRPC, protocolo KServe v2).
+
+Um unico processo abre a conexao com o Triton e os pipelines (um run.py por
+camera) apontam o nvinferserver para ele (run.py --triton-url localhost:8011).
+Requisicoes ModelInfer do mesmo modelo que chegam dentro de window_ms sao
+concatenadas na dimensao de batch, enviadas em uma chamada e a resposta e
+fatiada de volta por requisicao. As demais RPCs sao repassadas como estao.
+
+Metricas (JSON) em http://<stats-host>:<stats-port>/metrics: profundidade
+da fila, tamanho dos batches e espera por modelo.
+
+Uso (dentro do container, a partir de /app):
+  python3 infer_proxy.py --upstream localhost:8001 --listen 0.0.0.0:8011 --window-ms 5
+Teste contra um Triton falso: python3 scripts/mock_triton.py --check
+"""
+import argparse
+import collections
+import json
+import threading
+import time
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import grpc
+from tritonclient.grpc import service_pb2, service_pb2_grpc
+
+from common.histogram import Histogram
+
+BATCH_BUCKETS = [1, 2, 3, 4, 6, 8, 12, 16, 32]
+DEPTH_BUCKETS = [0, 1, 2, 4, 8, 16, 32, 64]
+WAIT_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50]
+
+# Tensores de uma camera (3x640x640 FP32 ~ 5 MB) passam do limite padrao de 4 MB.
+GRPC_OPTIONS = [
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+]
+
+
+# Parametros de sequencia amarram a requisicao ao estado de um sequence
+# batcher no Triton: nunca podem ir junto com outras.
+_SEQUENCE_PARAMS = ("sequence_id", "sequence_start", "sequence_end")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class _Pending:
+    __slots__ = ("request", "rows", "signature", "enqueued_at", "done", "response", "error")
+
+    def __init__(self, request, rows, signature):
+        self.request = request
+        self.rows = rows
+        self.signature = signature
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+def _signature(request):
+    """
+    Chave de compatibilidade para concatenar requisicoes: mesmas entradas
+    (nome, tipo, shape sem a dim de batch), mesmas saidas pedidas e mesmos
+    parametros da requisicao (priority, timeout...). None se a requisicao
+    nao pode ser agrupada (shared memory, sem raw_input_contents, sequencia).
+    """
+    if not request.inputs or len(request.raw_input_contents) != len(request.inputs):
+        return None
+    if any(k in request.parameters for k in _SEQUENCE_PARAMS):
+        return None
+    if any(len(i.parameters) for i in request.inputs) or any(len(o.parameters) for o in request.outputs):
+        return None
+    if any(not i.shape for i in request.inputs):
+        return None
+    return (
+        tuple((i.name, i.datatype, tuple(i.shape[1:])) for i in request.inputs),
+        tuple(o.name for o in request.outputs),
+        tuple(sorted((k, v.SerializeToString(deterministic=True)) for k, v in request.parameters.items())),
+    )
+
+
+def merge_requests(requests):
+    """Uma ModelInferRequest com as entradas concatenadas na dim 0."""
+    first = requests[0]
+    merged = service_pb2.ModelInferRequest(model_name=first.model_name, model_version=first.model_version)
+    total = sum(r.inputs[0].shape[0] for r in requests)
+    for k, inp in enumerate(first.inputs):
+        t = merged.inputs.add()
+        t.name = inp.name
+        t.datatype = inp.datatype
+        t.shape.extend([total, *inp.shape[1:]])
+        merged.raw_input_contents.append(b"".join(r.raw_input_contents[k] for r in requests))
+    for out in first.outputs:
+        merged.outputs.add().name = out.name
+    # iguais em todas (fazem parte da _signature)
+    for key, value in first.parameters.items():
+        merged.parameters[key].CopyFrom(value)
+    return merged
+
+
+def split_response(response, requests):
+    """Fatia a resposta do batch de volta em uma resposta por requisicao."""
+    rows = [r.inputs[0].shape[0] for r in requests]
+    total = sum(rows)
+    if len(response.raw_output_contents) != len(response.outputs):
+        raise ValueError("resposta do Triton sem raw_output_contents")
+    out = []
+    offsets = [0] * len(response.outputs)
+    for req, n in zip(requests, rows):
+        r = service_pb2.ModelInferResponse(
+            model_name=response.model_name,
+            model_version=response.model_version,
+            id=req.id,
+        )
+        for k, tensor in enumerate(response.outputs):
+            if not tensor.shape or tensor.shape[0] != total:
+                raise ValueError(f"saida {tensor.name} sem dimensao de batch {total}")
+            raw = response.raw_output_contents[k]
+            step = len(raw) // total
+            t = r.outputs.add()
+            t.name = tensor.name
+            t.datatype = tensor.datatype
+            t.shape.extend([n, *tensor.shape[1:]])
+            r.raw_output_contents.append(raw[offsets[k] : offsets[k] + n * step])
+            offsets[k] += n * step
+        out.append(r)
+    return out
+
+
+class ModelCoalescer:
+    """
+    Fila de um modelo. A thread de despacho espera a primeira requisicao,
+    junta as compativeis que chegarem ate window_ms depois dela (ou ate
+    max_batch linhas) e faz uma unica chamada ModelInfer no Triton.
+    """
+
+    def __init__(self, stub, max_batch: int, window_ms: float, timeout_s: float, max_queue: int):
+        self.stub = stub
+        self.max_batch = int(max_batch)
+        self.window_s = float(window_ms) / 1000.0
+        self.timeout_s = float(timeout_s)
+        self.max_queue = int(max_queue)
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self.batch_hist = Histogram(BATCH_BUCKETS)
+        self.depth_hist = Histogram(DEPTH_BUCKETS)
+        self.wait_hist = Histogram(WAIT_BUCKETS_MS)
+        self.requests = 0
+        self.upstream_calls = 0
+        self.rejected = 0
+        self.errors = 0
+
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, request):
+        sig = _signature(request)
+        rows = request.inputs[0].shape[0] if sig is not None else 0
+        if sig is None or rows >= self.max_batch:
+            with self._cond:
+                self.requests += 1
+                self.upstream_calls += 1
+                self.batch_hist.add(rows or 1)
+            return self.stub.ModelInfer(request, timeout=self.timeout_s)
+
+        pending = _Pending(request, rows, sig)
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(f"fila cheia ({self.max_queue})")
+            self._queue.append(pending)
+            self.requests += 1
+            self._cond.notify()
+        if not pending.done.wait(self.timeout_s + self.window_s + 1.0):
+            raise TimeoutError("sem resposta do despacho")
+        if pending.error is not None:
+            raise pending.error
+        return pending.response
+
+    def _take(self):
+        """Proximo grupo: bloqueia ate a janela da primeira requisicao fechar."""
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            first = self._queue[0]
+            deadline = first.enqueued_at + self.window_s
+            while True:
+                rows = sum(p.rows for p in self._queue if p.signature == first.signature)
+                left = deadline - time.monotonic()
+                if rows >= self.max_batch or left <= 0:
+                    break
+                self._cond.wait(left)
+
+            self.depth_hist.add(len(self._queue))
+            group, rest, rows = [], collections.deque(), 0
+            for p in self._queue:
+                if p.signature == first.signature and rows + p.rows <= self.max_batch:
+                    group.append(p)
+                    rows += p.rows
+                else:
+                    rest.append(p)
+            self._queue = rest
+            now = time.monotonic()
+            for p in group:
+                self.wait_hist.add((now - p.enqueued_at) * 1000.0)
+            self.batch_hist.add(rows)
+            self.upstream_calls += 1
+            return group
+
+    def _run(self):
+        while True:
+            group = self._take()
+            try:
+                if len(group) == 1:
+                    responses = [self.stub.ModelInfer(group[0].request, timeout=self.timeout_s)]
+                else:
+                    merged = merge_requests([p.request for p in group])
+                    resp = self.stub.ModelInfer(merged, timeout=self.timeout_s)
+                    responses = split_response(resp, [p.request for p in group])
+                for p, r in zip(group, responses):
+                    p.response = r
+            except Exception as exc:
+                with self._cond:
+                    self.errors += 1
+                for p in group:
+                    p.error = exc
+            for p in group:
+                p.done.set()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_batch": self.max_batch,
+                "window_ms": round(self.window_s * 1000.0, 2),
+                "queue_depth": len(self._queue),
+                "requests": self.requests,
+                "upstream_calls": self.upstream_calls,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "batch_size": self.batch_hist.export(),
+                "queue_depth_at_dispatch": self.depth_hist.export(),
+                "wait_ms": self.wait_hist.export(),
+            }
+
+
+class InferenceProxy(service_pb2_grpc.GRPCInferenceServiceServicer):
+    """
+    Servicer gRPC do Triton: ModelInfer passa pelo ModelCoalescer do modelo
+    (max_batch = min(max_batch_size do config no Triton, max_batch)); modelos
+    sem batching (max_batch_size 0) e as demais RPCs sao repassados.
+    """
+
+    def __init__(self, upstream: str, window_ms: float = 5.0, max_batch: int = 32, timeout_s: float = 10.0, max_queue: int = 256):
+        self.upstream = upstream
+        self.window_ms = float(window_ms)
+        self.max_batch = int(max_batch)
+        self.timeout_s = float(timeout_s)
+        self.max_queue = int(max_queue)
+        self._channel = grpc.insecure_channel(upstream, options=GRPC_OPTIONS)
+        self._stub = service_pb2_grpc.GRPCInferenceServiceStub(self._channel)
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _coalescer(self, name: str, version: str):
+        key = (name, version)
+        with self._lock:
+            if key in self._models:
+                return self._models[key]
+        cfg = self._stub.ModelConfig(
+            service_pb2.ModelConfigRequest(name=name, version=version), timeout=self.timeout_s
+        ).config
+        c = None
+        if cfg.max_batch_size > 0:
+            c = ModelCoalescer(
+                self._stub,
+                min(cfg.max_batch_size, self.max_batch),
+                self.window_ms,
+                self.timeout_s,
+                self.max_queue,
+            )
+        with self._lock:
+            return self._models.setdefault(key, c)
+
+    def _forward(self, method: str, request, context):
+        try:
+            return getattr(self._stub, method)(request, timeout=self.timeout_s)
+        except grpc.RpcError as exc:
+            context.abort(exc.code(), exc.details())
+
+    def ModelInfer(self, request, context):
+        try:
+            c = self._coalescer(request.model_name, request.model_version)
+            if c is None:
+                return self._stub.ModelInfer(request, timeout=self.timeout_s)
+            return c.submit(request)
+        except grpc.RpcError as exc:
+            context.abort(exc.code(), exc.details())
+        except QueueFull as exc:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(exc))
+        except (TimeoutError, ValueError) as exc:
+            context.abort(grpc.StatusCode.INTERNAL, str(exc))
+
+    def stats(self):
+        with self._lock:
+            models = dict(self._models)
+        return {
+            "upstream": self.upstream,
+            "models": {
+                f"{name}:{version or 'latest'}": (c.stats() if c else {"passthrough": True})
+                for (name, version), c in models.items()
+            },
+        }
+
+
+def _make_forward(method: str):
+    def _forward(self, request, context):
+        return self._forward(method, request, context)
+
+    _forward.__name__ = method
+    return _forward
+
+
+for _m in service_pb2.DESCRIPTOR.services_by_name["GRPCInferenceService"].methods:
+    if _m.name != "ModelInfer" and not (_m.client_streaming or _m.server_streaming):
+        setattr(InferenceProxy, _m.name, _make_forward(_m.name))
+
+
+def start_proxy(proxy: InferenceProxy, listen: str, workers: int = 64):
+    """Sobe o servidor gRPC; workers limita requisicoes simultaneas (~ cameras)."""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers), options=GRPC_OPTIONS)
+    service_pb2_grpc.add_GRPCInferenceServiceServicer_to_server(proxy, server)
+    if server.add_insecure_port(listen) == 0:
+        raise RuntimeError(f"Nao foi possivel escutar em {listen}")
+    server.start()
+    return server
+
+
+class _StatsHandler(BaseHTTPRequestHandler):
+    proxy = None
+
+    def log_message(self, format, *args):
+        return
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps(self.proxy.stats()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stats_server(proxy: InferenceProxy, host: str, port: int):
+    handler = type("ProxyStatsHandler", (_StatsHandler,), {"proxy": proxy})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Proxy gRPC do Triton com agrupamento de requisicoes")
+    ap.add_argument("--upstream", default="localhost:8001", help="gRPC do Triton")
+    ap.add_argument("--listen", default="0.0.0.0:8011", help="Endereco gRPC do proxy")
+    ap.add_argument("--window-ms", type=float, default=5.0, help="Espera maxima para completar um batch")
+    ap.add_argument("--max-batch", type=int, default=32, help="Teto de linhas por chamada (alem do max_batch_size do modelo)")
+    ap.add_argument("--max-queue", type=int, default=256, help="Requisicoes pendentes por modelo antes de recusar")
+    ap.add_argument("--timeout-s", type=float, default=10.0)
+    ap.add_argument("--workers", type=int, default=64)
+    ap.add_argument("--stats-host", default="0.0.0.0")
+    ap.add_argument("--stats-port", type=int, default=8012)
+    args = ap.parse_args()
+
+    proxy = InferenceProxy(
+        args.upstream,
+        window_ms=args.window_ms,
+        max_batch=args.max_batch,
+        timeout_s=args.timeout_s,
+        max_queue=args.max_queue,
+    )
+    server = start_proxy(proxy, args.listen, workers=args.workers)
+    start_stats_server(proxy, args.stats_host, args.stats_port)
+    print(f">> Proxy Triton: {args.listen} -> {args.upstream} (janela {args.window_ms}ms)")
+    print(f">> Metricas: http://127.0.0.1:{args.stats_port}/metrics")
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(grace=1.0)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -18,7 +18,11 @@ def _read_perf_csv(path):
         vram_total = []
         vram_pct = []
         meta_cols = {"ts_epoch", "gpu_pct", "vram_used_mb", "vram_total_mb", "vram_pct"}
-        fps_cols = [c for c in reader.fieldnames if c not in meta_cols]
+        # Colunas apos gpu_pct sao extras (shedding, drops, interval...), nao FPS.
+        names = list(reader.fieldnames)
+        if "gpu_pct" in names:
+            names = names[: names.index("gpu_pct")]
+        fps_cols = [c for c in names if c not in meta_cols]
         fps = {c: [] for c in fps_cols}
 
         for row in reader:
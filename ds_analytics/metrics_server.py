@@ -7,28 +7,116 @@ from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 class _MetricsHandler(BaseHTTPRequestHandler):
     provider = None
     metadata = None
+    sources = None
 
-    def do_GET(self):
-        if self.path.rstrip("/") != "/metrics":
-            self.send_response(404)
-            self.end_headers()
-            return
-        payload = self.provider()
+    def _send_json(self, payload, status: int = 200):
         body = json.dumps(payload).encode("utf-8")
-        self.send_response(200)
+        self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", str(len(body)))
         self.end_headers()
         self.wfile.write(body)
 
+    def _not_found(self):
+        self.send_response(404)
+        self.end_headers()
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path == "/metrics":
+            self._send_json(self.provider())
+        elif path == "/sources" and self.sources is not None:
+            self._send_json({"sources": self.sources.list()})
+        else:
+            self._not_found()
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        """
+        POST /sources {"uri": "...", "name": "video05", "tier": "low"} -> adiciona camera.
+        POST /sources/<slot|nome>/tier {"tier": "medium"} -> troca o tier.
+        """
+        path = self.path.rstrip("/")
+        if self.sources is None or not path.startswith("/sources"):
+            self._not_found()
+            return
+        if path.endswith("/tier"):
+            key = path[len("/sources/"):-len("/tier")]
+            try:
+                tier = self._read_json()["tier"]
+            except Exception:
+                self._send_json({"error": "JSON com campo 'tier' obrigatorio"}, 400)
+                return
+            try:
+                info = self.sources.run_sync(self.sources.set_tier, key, tier)
+            except KeyError as exc:
+                self._send_json({"error": str(exc)}, 404)
+                return
+            except Exception as exc:
+                self._send_json({"error": str(exc)}, 409)
+                return
+            self._send_json(info)
+            return
+        if path != "/sources":
+            self._not_found()
+            return
+        try:
+            req = self._read_json()
+            uri = req["uri"]
+        except Exception:
+            self._send_json({"error": "JSON com campo 'uri' obrigatorio"}, 400)
+            return
+        try:
+            info = self.sources.run_sync(
+                self.sources.add, uri, req.get("name"), tier=req.get("tier")
+            )
+        except Exception as exc:
+            self._send_json({"error": str(exc)}, 409)
+            return
+        self._send_json(info, 201)
+
+    def do_DELETE(self):
+        """DELETE /sources/<slot|nome> -> remove camera."""
+        prefix = "/sources/"
+        if not self.path.startswith(prefix) or self.sources is None:
+            self._not_found()
+            return
+        key = self.path[len(prefix):].rstrip("/")
+        try:
+            info = self.sources.run_sync(self.sources.remove, key)
+        except KeyError as exc:
+            self._send_json({"error": str(exc)}, 404)
+            return
+        except Exception as exc:
+            self._send_json({"error": str(exc)}, 409)
+            return
+        self._send_json(info)
+
     def log_message(self, fmt, *args):
         return
 
 
-def start_metrics_server(perf_mgr, host: str, port: int, pgie_config: str, labels_path: str | None):
+def start_metrics_server(
+    perf_mgr,
+    host: str,
+    port: int,
+    pgie_config: str,
+    labels_path: str | None,
+    source_mgr=None,
+    extras: dict | None = None,
+):
+    """
+    Sobe o /metrics em background. `extras` ({chave: callable}) acrescenta
+    secoes ao payload, avaliadas a cada requisicao.
+    """
+    extras = dict(extras or {})
+
     def _provider():
         counts = perf_mgr.get_counts()
-        return {
+        payload = {
             "counts": counts,
             "label_order": list(perf_mgr.label_names),
             "model": {
@@ -37,9 +125,16 @@ def start_metrics_server(perf_mgr, host: str, port: int, pgie_config: str, label
             },
             "updated_at": counts.get("updated_at", time.time()),
         }
+        for key, fn in extras.items():
+            try:
+                payload[key] = fn()
+            except Exception as exc:
+                payload[key] = {"error": str(exc)}
+        return payload
 
     handler = type("MetricsHandler", (_MetricsHandler,), {})
     handler.provider = staticmethod(_provider)
+    handler.sources = source_mgr
     handler.metadata = {
         "pgie_config": pgie_config,
         "labels_path": labels_path,
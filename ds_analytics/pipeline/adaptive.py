@@ -0,0 +1,117 @@
+# ds_analytics/pipeline/adaptive.py
+import time
+from collections import deque
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import GLib
+
+
+class InferIntervalController:
+    """
+    Ajusta o `interval` do pgie em runtime a partir das leituras do
+    PerfManager (FPS medio dos streams, GPU %) e do estado de carga:
+      - sobrecarga (GPU >= gpu_high, FPS abaixo de fps_low_ratio da
+        referencia ou LoadShedder em shedding): interval + 1
+      - folga (GPU <= gpu_low e FPS >= fps_ok_ratio da referencia): interval - 1
+    sempre dentro de [min_interval, max_interval] e com cooldown_s entre
+    mudancas. O nvtracker cobre os frames pulados. Cada mudanca vai para a
+    coluna pgie_interval do CSV de performance.
+    """
+
+    def __init__(
+        self,
+        pgie,
+        perf,
+        min_interval: int = 0,
+        max_interval: int = 4,
+        gpu_high: float = 90.0,
+        gpu_low: float = 60.0,
+        target_fps: float = 0.0,
+        fps_low_ratio: float = 0.85,
+        fps_ok_ratio: float = 0.95,
+        cooldown_s: float = 15.0,
+        check_ms: int = 5000,
+        reference_window_s: float = 300.0,
+    ):
+        if min_interval < 0 or max_interval < min_interval:
+            raise ValueError("Faixa de interval invalida")
+        self.pgie = pgie
+        self.perf = perf
+        self.min_interval = int(min_interval)
+        self.max_interval = int(max_interval)
+        self.gpu_high = float(gpu_high)
+        self.gpu_low = float(gpu_low)
+        # target_fps=0: usa o maior FPS medio dos ultimos reference_window_s
+        self.target_fps = float(target_fps)
+        self.reference_window_s = float(reference_window_s)
+        self.fps_low_ratio = float(fps_low_ratio)
+        self.fps_ok_ratio = float(fps_ok_ratio)
+        self.cooldown_s = float(cooldown_s)
+        self.check_ms = int(check_ms)
+
+        self.interval = min(max(int(pgie.get_property("interval") or 0), self.min_interval), self.max_interval)
+        self._fps_window = deque()  # (monotonic, fps medio), maximo decrescente
+        self._best_fps = 0.0
+        self._changed_at = 0.0
+        self._last_reason = None
+        self._apply(self.interval, "inicial")
+
+    def start(self):
+        GLib.timeout_add(self.check_ms, self.step)
+
+    def _apply(self, interval: int, reason: str):
+        self.pgie.set_property("interval", int(interval))
+        self.interval = int(interval)
+        self._changed_at = time.monotonic()
+        self._last_reason = reason
+        self.perf.set_csv_field("pgie_interval", self.interval)
+        print(f">> pgie interval={self.interval} ({reason})")
+
+    def _reference_fps(self, avg_fps: float):
+        if self.target_fps > 0:
+            return self.target_fps
+        # O probe conta todos os frames (inferidos ou nao), entao o maior FPS
+        # medio recente serve como FPS "saudavel" dos sources. Janela
+        # deslizante: um pico antigo (ou um source rapido ja removido) deixa
+        # de valer depois de reference_window_s.
+        now = time.monotonic()
+        win = self._fps_window
+        while win and win[-1][1] <= avg_fps:
+            win.pop()
+        win.append((now, avg_fps))
+        while win[0][0] < now - self.reference_window_s:
+            win.popleft()
+        self._best_fps = win[0][1]
+        return self._best_fps
+
+    def step(self):
+        fps = [v for v in self.perf.last_fps.values() if v is not None]
+        gpu = self.perf.last_gpu
+        if not fps or gpu is None:
+            return True
+        avg_fps = sum(fps) / len(fps)
+        ref = self._reference_fps(avg_fps)
+        shedding = self.perf.get_load().get("state") == "shedding"
+
+        if time.monotonic() - self._changed_at < self.cooldown_s:
+            return True
+
+        if gpu >= self.gpu_high or shedding or (ref > 0 and avg_fps < self.fps_low_ratio * ref):
+            if self.interval < self.max_interval:
+                reason = f"carga: gpu={gpu}% fps={avg_fps:.1f}/{ref:.1f}" + (" shedding" if shedding else "")
+                self._apply(self.interval + 1, reason)
+        elif gpu <= self.gpu_low and (ref <= 0 or avg_fps >= self.fps_ok_ratio * ref):
+            if self.interval > self.min_interval:
+                self._apply(self.interval - 1, f"folga: gpu={gpu}% fps={avg_fps:.1f}/{ref:.1f}")
+        return True
+
+    def status(self):
+        return {
+            "interval": self.interval,
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "reason": self._last_reason,
+            "reference_fps": round(self.target_fps or self._best_fps, 2),
+        }
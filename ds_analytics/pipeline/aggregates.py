@@ -0,0 +1,129 @@
+# ds_analytics/pipeline/aggregates.py
+import threading
+import time
+
+# janela -> (largura do bucket em s, buckets fechados na janela)
+WINDOWS = {
+    "1m": (1.0, 60),
+    "15m": (15.0, 60),
+    "1h": (60.0, 60),
+}
+
+# Lacuna maxima entre amostras contada como ocupacao (stream parado, etc.).
+MAX_OCCUPANCY_GAP_S = 1.0
+
+
+class _Ring:
+    """
+    Buckets circulares de uma serie em uma janela. add() e O(1); ao virar o
+    bucket, o resumo da janela (buckets fechados) e recalculado uma vez e
+    guardado em `published`, que e o que a consulta devolve.
+    """
+
+    __slots__ = ("width", "size", "ids", "cnt", "sum", "mn", "mx", "occ", "cur", "published")
+
+    def __init__(self, width: float, buckets: int):
+        self.width = width
+        # +1: o bucket em andamento nao entra no resumo publicado
+        self.size = buckets + 1
+        self.ids = [-1] * self.size
+        self.cnt = [0] * self.size
+        self.sum = [0.0] * self.size
+        self.mn = [0.0] * self.size
+        self.mx = [0.0] * self.size
+        self.occ = [0.0] * self.size
+        self.cur = None
+        self.published = None
+
+    def add(self, t: float, value: float, occ_dt: float):
+        b = int(t // self.width)
+        if b != self.cur:
+            self._advance(b)
+        i = b % self.size
+        if self.cnt[i] == 0:
+            self.mn[i] = self.mx[i] = value
+        elif value < self.mn[i]:
+            self.mn[i] = value
+        elif value > self.mx[i]:
+            self.mx[i] = value
+        self.cnt[i] += 1
+        self.sum[i] += value
+        self.occ[i] += occ_dt
+
+    def _advance(self, b: int):
+        self.cur = b
+        i = b % self.size
+        self.ids[i] = b
+        self.cnt[i] = 0
+        self.sum[i] = 0.0
+        self.occ[i] = 0.0
+        self._publish(b)
+
+    def _publish(self, b: int):
+        lo = b - self.size + 1
+        n, total, occ = 0, 0.0, 0.0
+        mn = mx = None
+        for i in range(self.size):
+            bid = self.ids[i]
+            if bid == b or bid < lo or self.cnt[i] == 0:
+                continue
+            n += self.cnt[i]
+            total += self.sum[i]
+            occ += self.occ[i]
+            mn = self.mn[i] if mn is None else min(mn, self.mn[i])
+            mx = self.mx[i] if mx is None else max(mx, self.mx[i])
+        self.published = {
+            "min": mn,
+            "max": mx,
+            "mean": round(total / n, 3) if n else None,
+            "occupancy_s": round(occ, 2),
+            "samples": n,
+            "as_of": b * self.width,
+        }
+
+
+class WindowedAggregator:
+    """
+    min/max/media/ocupacao-segundos por (stream, label) nas janelas de
+    WINDOWS. Cada amostra e a contagem do label em um frame do stream;
+    ocupacao soma o tempo entre amostras em que a contagem era > 0.
+    Memoria fixa por serie (len(WINDOWS) x 61 buckets).
+    """
+
+    def __init__(self, windows: dict | None = None):
+        self.windows = dict(windows or WINDOWS)
+        self._series = {}
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def add(self, stream_key: str, counts: dict, t: float | None = None):
+        t = time.time() if t is None else t
+        with self._lock:
+            for label, value in counts.items():
+                key = (stream_key, label)
+                rings = self._series.get(key)
+                if rings is None:
+                    rings = self._series[key] = {
+                        name: _Ring(width, buckets) for name, (width, buckets) in self.windows.items()
+                    }
+                prev = self._last.get(key)
+                occ_dt = 0.0
+                if prev is not None and prev[1] > 0:
+                    occ_dt = min(MAX_OCCUPANCY_GAP_S, max(0.0, t - prev[0]))
+                self._last[key] = (t, value)
+                for ring in rings.values():
+                    ring.add(t, value, occ_dt)
+
+    def remove_stream(self, stream_key: str):
+        with self._lock:
+            for key in [k for k in self._series if k[0] == stream_key]:
+                self._series.pop(key, None)
+                self._last.pop(key, None)
+
+    def snapshot(self):
+        """{stream: {label: {janela: resumo}}} com os resumos ja publicados."""
+        out = {}
+        with self._lock:
+            for (stream, label), rings in self._series.items():
+                out.setdefault(stream, {})[label] = {name: ring.published for name, ring in rings.items()}
+        return out
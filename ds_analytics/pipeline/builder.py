@@ -2,13 +2,31 @@
 import gi
 import configparser
 import math
+import threading
+import time
 
 gi.require_version("Gst", "1.0")
-from gi.repository import Gst, GLib
-
-from .nodes import create_source_bin, make, link_many
-from .probes import pgie_src_pad_buffer_probe
+gi.require_version("GstVideo", "1.0")
+from gi.repository import Gst, GLib, GstVideo
+
+from .nodes import make, link_many
+from .probes import (
+    pgie_src_pad_buffer_probe,
+    analytics_src_pad_buffer_probe,
+    zones_src_pad_buffer_probe,
+    events_src_pad_buffer_probe,
+    tracker_src_pad_buffer_probe,
+    recorder_src_pad_buffer_probe,
+)
 from .perf import PerfManager
+from .sources import SourceManager
+from .shedding import LoadShedder, QUEUE_POLICIES
+from .muxtune import MuxTuner
+from .profiles import DEFAULT_TUNING
+from .engines import first_inference_probe
+from .triton import write_nvinferserver_config
+from .tracks import TrackCounter
+from .crops import crop_src_pad_buffer_probe
 
 
 class PipelineBuilder:
@@ -17,6 +35,58 @@ class PipelineBuilder:
       sources -> nvstreammux -> nvinfer -> nvtracker -> nvdsanalytics -> tiler
       -> nvvideoconvert -> nvdsosd -> nvvideoconvert -> capsfilter
       -> encoder -> rtph26xpay -> udpsink (RTP/H264|H265)
+
+    output="appsink" troca o final por encoder -> h26xparse -> appsink, para
+    alimentar o RTSP server no mesmo processo (ver rtsp.AppSrcBridge).
+
+    layout="demux" troca o tiler por nvstreamdemux: um ramo
+    osd -> encoder -> appsink por camera, servido como mount proprio
+    (/ds-<stream>) por um unico RTSP server (ver rtsp.start_rtsp_server_multi).
+
+    layout="headless" termina em nvdsanalytics -> fakesink: sem tiler, osd,
+    encoder nem RTSP. Os probes continuam alimentando PerfManager/metricas;
+    util para sites so de analytics (ver scripts/bench_headless.py).
+
+    max_sources > len(uris) reserva slots no batch para cameras adicionadas
+    em runtime pelo SourceManager (self.sources), sem reiniciar o pipeline.
+
+    queue_policy="bounded" (default) usa filas limitadas e leaky (ver
+    shedding.QUEUE_POLICIES), inclusive uma antes do nvinfer, monitoradas
+    pelo LoadShedder; "unbounded" mantem as filas sem limite.
+
+    mux_tuning="observe" mede a ocupacao/espera dos batches do nvstreammux
+    (ver muxtune.MuxTuner); "auto" tambem ajusta batched-push-timeout e
+    batch-size dentro de mux_latency_ms.
+
+    tuning (ver profiles.DEFAULT_TUNING / config/app_config.yaml) define
+    resolucao do mux e do tiler, limites das filas, encoder e os configs de
+    tracker/analytics; sem tuning valem os defaults.
+
+    engine_cache (engines.EngineCache) aponta o model-engine-file do nvinfer
+    para o engine do batch atual; engines novos sao adotados pelo cache apos
+    a primeira inferencia (tempo ate ela em engine_status()).
+
+    Com config .pbtxt (nvinferserver) e triton_config_dir, o config e
+    regravado em triton_config_dir com max_batch_size = batch do mux (ver
+    triton.py e scripts/gen_triton_configs.py para o lado do Triton);
+    triton_url troca o grpc url (ex.: infer_proxy.py compartilhado).
+
+    crop_writer (crops.CropWriter) insere nvvideoconvert -> capsfilter RGBA
+    apos o nvdsanalytics (get_nvds_buf_surface exige RGBA) e grava o melhor
+    recorte de cada track para o painel do web (/app/crops/index.jsonl).
+
+    zone_engine (zones.ZoneEngine) conta a ocupacao por zona a partir dos
+    boxes na saida do nvdsanalytics, com mascaras na resolucao do mux.
+
+    event_publisher (events.EventPublisher) recebe deteccoes, cruzamentos de
+    linha e mudancas de overcrowding de cada frame, em batches.
+
+    recorder (recorder.DetectionRecorder) grava as deteccoes de cada frame
+    em arquivo colunar para replay sem GPU (scripts/replay.py).
+
+    gate_on_viewers=True insere um valve antes do tiler: o ramo
+    tiler -> osd -> encoder so processa frames enquanto houver clientes RTSP
+    (ver set_viewers). Inferencia, tracker e analytics continuam rodando.
     """
 
     def __init__(
@@ -31,11 +101,32 @@ class PipelineBuilder:
         udp_port=5400,
         udp_host="127.0.0.1",
         rtp_payload=96,
+        output="udp",
+        gate_on_viewers=False,
+        gate_grace_s=5.0,
+        layout="mosaic",
+        max_sources=None,
+        queue_policy="bounded",
+        source_tiers=None,
+        mux_tuning="off",
+        mux_latency_ms=50.0,
+        tuning=None,
+        engine_cache=None,
+        triton_config_dir=None,
+        triton_url=None,
+        track_ttl_s=5.0,
+        track_window_s=60.0,
+        crop_writer=None,
+        zone_engine=None,
+        event_publisher=None,
+        recorder=None,
     ):
         self.uris = uris
         self.codec = codec.upper()
         self.bitrate = int(bitrate)
         self.n = len(uris)
+        # batch do mux/nvinfer: reserva slots para sources adicionados em runtime
+        self.max_sources = max(self.n, int(max_sources or 0))
 
         self.pgie_config = pgie_config
         self.labels = labels or []
@@ -45,38 +136,96 @@ class PipelineBuilder:
         self.udp_host = udp_host
         self.udp_port = int(udp_port)
         self.rtp_payload = int(rtp_payload)
+        self.output = output
+        self.layout = layout
+        self.queue_policy = queue_policy
+        self.source_tiers = dict(source_tiers or {})
+        self.shedder = None
+        self.pgie = None
+        self.mux_tuning = mux_tuning
+        self.mux_latency_ms = float(mux_latency_ms)
+        self.mux_tuner = None
+        self.tuning = tuning or DEFAULT_TUNING
+        self.engine_cache = engine_cache
+        self.triton_config_dir = triton_config_dir
+        self.triton_url = triton_url
+        # objetos distintos por object_id do nvtracker (ver tracks.TrackCounter)
+        self.tracks = TrackCounter(ttl_s=track_ttl_s, window_s=track_window_s)
+        self.crop_writer = crop_writer
+        self.zone_engine = zone_engine
+        self.event_publisher = event_publisher
+        self.recorder = recorder
+        self._engine = {"engine": None, "cached": False, "first_inference_s": None, "started_at": None}
+        self.queue_policies = dict(QUEUE_POLICIES)
+        for name, q in self.tuning["queues"].items():
+            self.queue_policies[name] = {
+                "buffers": int(q["buffers"]),
+                "time_ns": int(q["time_ms"] * 1_000_000),
+                "leaky": int(q["leaky"]),
+            }
+        self.gate_on_viewers = bool(gate_on_viewers)
+        self.gate_grace_s = float(gate_grace_s)
+        self.gate = None
+        self._gate_close_id = None
 
         self.pipeline = None
         self.perf = None
+        self.appsink = None
+        self.appsinks = []
+        self.sources = None
 
         if self.n <= 0:
             raise ValueError("Nenhuma URI de entrada fornecida.")
         if self.codec not in ("H264", "H265"):
             raise ValueError("codec deve ser H264 ou H265")
-
-    def _q(self, name: str, max_time_ns: int = 0):
+        if self.output not in ("udp", "appsink"):
+            raise ValueError("output deve ser udp ou appsink")
+        if self.triton_url and not self.triton_config_dir:
+            raise ValueError("triton_url exige triton_config_dir (o config do nvinferserver e regravado)")
+        if self.mux_tuning not in ("off", "observe", "auto"):
+            raise ValueError("mux_tuning deve ser off, observe ou auto")
+        if self.queue_policy not in ("bounded", "unbounded"):
+            raise ValueError("queue_policy deve ser bounded ou unbounded")
+        if self.layout not in ("mosaic", "demux", "headless"):
+            raise ValueError("layout deve ser mosaic, demux ou headless")
+        if self.layout != "mosaic" and self.gate_on_viewers:
+            raise ValueError("gate_on_viewers so e suportado no layout mosaic")
+        if self.layout == "demux" and self.max_sources > self.n:
+            raise ValueError("max_sources (sources em runtime) so e suportado no layout mosaic")
+
+    def _q(self, name: str, max_time_ns: int = 0, policy: str = "unbounded"):
         """
         Queue para estabilizar o pipeline.
+        Com queue_policy="bounded" usa os limites/leaky de self.queue_policies[policy]
+        e registra a fila no LoadShedder; com "unbounded" (ou policy="unbounded")
         max_time_ns=0 deixa sem limite (default do GStreamer).
         """
         q = make(name, "queue")
+        if self.queue_policy == "bounded" and policy != "unbounded":
+            pol = self.queue_policies[policy]
+            q.set_property("max-size-buffers", pol["buffers"])
+            q.set_property("max-size-time", pol["time_ns"])
+            q.set_property("max-size-bytes", 0)
+            q.set_property("leaky", pol["leaky"])
+            self.shedder.watch(q, policy, pol)
+            return q
         if max_time_ns and max_time_ns > 0:
             q.set_property("max-size-time", int(max_time_ns))
         q.set_property("max-size-buffers", 0)
         q.set_property("max-size-bytes", 0)
         return q
 
-    def _make_encoder(self):
-        enc = make("encoder", "nvv4l2h264enc" if self.codec == "H264" else "nvv4l2h265enc")
+    def _make_encoder(self, name="encoder"):
+        enc = make(name, "nvv4l2h264enc" if self.codec == "H264" else "nvv4l2h265enc")
         enc.set_property("bitrate", self.bitrate)
-
+        tune = self.tuning["encoder"]
 
         for prop, val in [
-            ("iframeinterval", 30),
+            ("iframeinterval", tune["iframeinterval"]),
             ("insert-sps-pps", 1),
             ("bufapi-version", 1),
-            ("preset-level", 1),
-            ("control-rate", 1),
+            ("preset-level", tune["preset_level"]),
+            ("control-rate", tune["control_rate"]),
         ]:
             try:
                 enc.set_property(prop, val)
@@ -84,7 +233,7 @@ class PipelineBuilder:
                 pass
 
         for prop, val in [
-            ("tuning-info-id", 2),
+            ("tuning-info-id", tune["tuning_info_id"]),
         ]:
             try:
                 enc.set_property(prop, val)
@@ -111,6 +260,71 @@ class PipelineBuilder:
             pass
         return sink
 
+    def _make_appsink(self, name="appsink"):
+        """Saida intra-processo: access units H.264/H.265 byte-stream."""
+        sink = make(name, "appsink")
+        media = "video/x-h264" if self.codec == "H264" else "video/x-h265"
+        sink.set_property(
+            "caps",
+            Gst.Caps.from_string(f"{media}, stream-format=byte-stream, alignment=au"),
+        )
+        sink.set_property("sync", False)
+        sink.set_property("max-buffers", 30)
+        sink.set_property("drop", True)
+        return sink
+
+    def _make_output(self):
+        """Elementos apos o encoder, conforme self.output."""
+        if self.output == "appsink":
+            parse = make("outparse", "h264parse" if self.codec == "H264" else "h265parse")
+            self.appsink = self._make_appsink()
+            return [parse, self.appsink]
+        return [self._make_rtppay(), self._make_udpsink()]
+
+    def _make_gate(self):
+        """Valve do ramo de render; comeca fechado (sem viewers)."""
+        valve = make("render_gate", "valve")
+        valve.set_property("drop", True)
+        try:
+            valve.set_property("drop-mode", 1)  # forward-sticky-events
+        except Exception:
+            pass
+        self.gate = valve
+        return valve
+
+    def _force_keyframe(self):
+        enc = self.pipeline.get_by_name("encoder") if self.pipeline else None
+        if enc is None:
+            return
+        event = GstVideo.video_event_new_upstream_force_key_unit(Gst.CLOCK_TIME_NONE, True, 0)
+        enc.get_static_pad("src").send_event(event)
+
+    def _close_gate(self):
+        self._gate_close_id = None
+        if self.gate is not None and not self.gate.get_property("drop"):
+            self.gate.set_property("drop", True)
+            print(">> Render gate fechado (sem viewers)")
+        return False
+
+    def set_viewers(self, count: int):
+        """
+        Abre o valve (com keyframe forcado) quando ha viewers e fecha apos
+        gate_grace_s sem nenhum, para nao oscilar em reconexoes.
+        """
+        if self.gate is None:
+            return
+        if count > 0:
+            if self._gate_close_id is not None:
+                GLib.source_remove(self._gate_close_id)
+                self._gate_close_id = None
+            if self.gate.get_property("drop"):
+                self.gate.set_property("drop", False)
+                self._force_keyframe()
+                print(f">> Render gate aberto (viewers={count})")
+        elif self._gate_close_id is None:
+            self._gate_close_id = GLib.timeout_add(
+                int(self.gate_grace_s * 1000), self._close_gate
+            )
 
     def build(self):
         Gst.init(None)
@@ -126,12 +340,15 @@ class PipelineBuilder:
             stream_names=self.stream_names,
         )
 
+        self.shedder = LoadShedder(self.perf)
+
         # nvstreammux
         mux = make("streammux", "nvstreammux")
-        mux.set_property("width", 640)
-        mux.set_property("height", 480)
-        mux.set_property("batch-size", self.n)
-        mux.set_property("batched-push-timeout", 33000)
+        mux_cfg = self.tuning["mux"]
+        mux.set_property("width", mux_cfg["width"])
+        mux.set_property("height", mux_cfg["height"])
+        mux.set_property("batch-size", self.max_sources)
+        mux.set_property("batched-push-timeout", mux_cfg["batched_push_timeout_us"])
 
         try:
             mux.set_property("live-source", 1)
@@ -140,16 +357,32 @@ class PipelineBuilder:
 
         p.add(mux)
 
-        # Sources -> mux
+        # Antes dos sources: o tuner instala o probe em cada sink pad pedido.
+        if self.mux_tuning != "off":
+            self.mux_tuner = MuxTuner(
+                mux,
+                self.perf,
+                self.max_sources,
+                mode=self.mux_tuning,
+                latency_budget_ms=self.mux_latency_ms,
+            )
+
+        # Sources -> mux (via SourceManager, que tambem permite add/remove em runtime)
+        on_remove = [self.tracks.remove_stream]
+        if self.crop_writer is not None:
+            on_remove.append(self.crop_writer.remove_stream)
+        if self.zone_engine is not None:
+            on_remove.append(self.zone_engine.remove_stream)
+        self.sources = SourceManager(
+            p,
+            mux,
+            self.perf,
+            self.max_sources,
+            tiers=self.source_tiers,
+            on_remove=on_remove,
+        )
         for i, uri in enumerate(self.uris):
-            src_bin = create_source_bin(i, uri)
-            p.add(src_bin)
-            sinkpad = mux.request_pad_simple(f"sink_{i}")
-            srcpad = src_bin.get_static_pad("src")
-            if not srcpad or not sinkpad:
-                raise RuntimeError(f"Falha criando pads para source {i} ({uri})")
-            if srcpad.link(sinkpad) != Gst.PadLinkReturn.OK:
-                raise RuntimeError(f"Falha linkando source {i} no nvstreammux")
+            self.sources.add(uri, self.perf.stream_key(i), index=i)
 
         # nvinfer
         # pgie = make("pgie", "nvinfer")
@@ -158,16 +391,27 @@ class PipelineBuilder:
         # pgie (troca automática conforme extensão do arquivo)
         if self.pgie_config.endswith(".pbtxt"):
             pgie = make("pgie", "nvinferserver")
-            pgie.set_property("config-file-path", self.pgie_config)
+            cfg_path = self.pgie_config
+            if self.triton_config_dir:
+                cfg_path = write_nvinferserver_config(
+                    self.pgie_config, self.max_sources, self.triton_config_dir, url=self.triton_url
+                )
+                print(f">> nvinferserver (batch {self.max_sources}): {cfg_path}")
+            pgie.set_property("config-file-path", cfg_path)
+            try:
+                pgie.set_property("batch-size", self.max_sources)
+            except Exception:
+                pass
         else:
             pgie = make("pgie", "nvinfer")
             pgie.set_property("config-file-path", self.pgie_config)
-            pgie.set_property("batch-size", self.n)
+            pgie.set_property("batch-size", self.max_sources)
+            self._use_engine_cache(pgie)
 
         # tracker
         tracker = make("tracker", "nvtracker")
         cfg = configparser.ConfigParser()
-        cfg.read("/app/config/dsnvanalytics_tracker_config.txt")
+        cfg.read(self.tuning["tracker_config"])
         if "tracker" in cfg:
             for k in cfg["tracker"]:
                 val = cfg.get("tracker", k)
@@ -184,16 +428,155 @@ class PipelineBuilder:
 
         # analytics (opcional)
         nvanalytics = make("analytics", "nvdsanalytics")
-        nvanalytics.set_property("config-file", "/app/config/config_nvdsanalytics.txt")
+        nvanalytics.set_property("config-file", self.tuning["analytics_config"])
+
+        # fila antes do nvinfer: sob sobrecarga descarta batches antigos
+        q_infer = self._q("q_infer", policy="infer")
 
+        for e in [q_infer, pgie, tracker, nvanalytics]:
+            p.add(e)
+        link_many(mux, q_infer, pgie, tracker, nvanalytics)
+
+        head = nvanalytics
+        if self.crop_writer is not None:
+            head = self._build_crop_convert(p, nvanalytics)
+            head.get_static_pad("src").add_probe(
+                Gst.PadProbeType.BUFFER,
+                crop_src_pad_buffer_probe,
+                (self.crop_writer, self.perf, self.pgie_config.endswith(".pbtxt")),
+            )
+
+        if self.layout == "demux":
+            self._build_demux(p, head)
+        elif self.layout == "headless":
+            self._build_headless(p, head)
+        else:
+            self._build_mosaic(p, head)
+
+        self.pgie = pgie
+
+        # Probe (para perf / analytics no probe)
+        pgie_src = pgie.get_static_pad("src")
+        if pgie_src:
+            pgie_src.add_probe(Gst.PadProbeType.BUFFER, pgie_src_pad_buffer_probe, self.perf)
+            pgie_src.add_probe(Gst.PadProbeType.BUFFER, first_inference_probe, self._engine)
+
+        tracker.get_static_pad("src").add_probe(
+            Gst.PadProbeType.BUFFER, tracker_src_pad_buffer_probe, (self.tracks, self.perf)
+        )
+
+        # nvdsanalytics -> contadores por stream (linhas, ROI, overcrowding)
+        nvanalytics.get_static_pad("src").add_probe(
+            Gst.PadProbeType.BUFFER, analytics_src_pad_buffer_probe, self.perf
+        )
+        if self.zone_engine is not None:
+            # caminho Triton cru (.pbtxt) adiciona objetos em coordenadas da origem
+            nvanalytics.get_static_pad("src").add_probe(
+                Gst.PadProbeType.BUFFER,
+                zones_src_pad_buffer_probe,
+                (self.zone_engine, self.perf, self.pgie_config.endswith(".pbtxt")),
+            )
+        if self.event_publisher is not None:
+            nvanalytics.get_static_pad("src").add_probe(
+                Gst.PadProbeType.BUFFER, events_src_pad_buffer_probe, (self.event_publisher, self.perf)
+            )
+        if self.recorder is not None:
+            nvanalytics.get_static_pad("src").add_probe(
+                Gst.PadProbeType.BUFFER,
+                recorder_src_pad_buffer_probe,
+                (self.recorder, self.perf, self.pgie_config.endswith(".pbtxt")),
+            )
+
+        if self.layout == "headless":
+            print(">> HEADLESS: nvdsanalytics -> fakesink (so metadados)")
+        elif self.layout == "demux":
+            print(f">> DEMUX out ({self.codec}) -> {self.n} appsinks -> RTSP in-process")
+        elif self.output == "appsink":
+            print(f">> APPSINK out ({self.codec}) -> RTSP in-process")
+        else:
+            print(f">> UDP out (RTP/{self.codec}) -> {self.udp_host}:{self.udp_port} (pt={self.rtp_payload})")
+        return p
+
+    def _use_engine_cache(self, pgie):
+        if self.engine_cache is None:
+            return
+        try:
+            engine, cached = self.engine_cache.lookup(self.pgie_config, self.max_sources)
+        except Exception as exc:
+            print(f">> Engine cache indisponivel: {exc}")
+            return
+        if engine is None:
+            return
+        self._engine["engine"] = engine
+        self._engine["cached"] = cached
+        if cached:
+            pgie.set_property("model-engine-file", engine)
+            print(f">> Engine (cache): {engine}")
+        else:
+            # sem model-engine-file valido o nvinfer constroi a partir do onnx
+            self._engine["on_first"] = self._adopt_engine
+            print(f">> Engine b{self.max_sources} fora do cache: TensorRT vai construir ({engine})")
+
+    def _adopt_engine(self):
+        # a copia (centenas de MB) roda fora do main loop, que tambem atende
+        # o bus, o supervisor e o RTSP server; so o status volta por idle_add
+        threading.Thread(target=self._adopt_engine_worker, name="engine-adopt", daemon=True).start()
+        return False
+
+    def _adopt_engine_worker(self):
+        try:
+            path = self.engine_cache.adopt(self.pgie_config, self.max_sources, self._engine["started_wall"])
+        except Exception as exc:
+            print(f">> Falha adotando engine no cache: {exc}")
+            return
+        if path:
+            GLib.idle_add(self._engine_adopted, path)
+
+    def _engine_adopted(self, path: str):
+        self._engine["engine"] = path
+        self._engine["cached"] = True
+        print(f">> Engine adicionado ao cache: {path}")
+        return False
+
+    def engine_status(self):
+        """Engine em uso e tempo do PLAYING ate a primeira inferencia (/metrics)."""
+        return {k: self._engine[k] for k in ("engine", "cached", "first_inference_s")}
+
+    def _build_crop_convert(self, p, head):
+        """head -> nvvideoconvert -> capsfilter RGBA (memoria acessivel pela CPU no dGPU)."""
+        conv = make("crop_conv", "nvvideoconvert")
+        try:
+            # NVBUF_MEM_CUDA_UNIFIED; no Jetson o default (surface array) ja e mapeavel
+            conv.set_property("nvbuf-memory-type", 3)
+        except Exception:
+            pass
+        caps = make("crop_caps", "capsfilter")
+        caps.set_property("caps", Gst.Caps.from_string("video/x-raw(memory:NVMM), format=RGBA"))
+        p.add(conv)
+        p.add(caps)
+        link_many(head, conv, caps)
+        return caps
+
+    def _build_headless(self, p, head):
+        """head -> fakesink: nenhum frame e renderizado nem encodado."""
+        sink = make("sink", "fakesink")
+        sink.set_property("sync", False)
+        sink.set_property("async", False)
+        sink.set_property("enable-last-sample", False)
+        p.add(sink)
+        link_many(head, sink)
+
+    def _build_mosaic(self, p, head):
+        """head -> [valve] -> tiler -> conv -> osd -> conv -> caps -> encoder -> saida."""
         # tiler
         tiler = make("tiler", "nvmultistreamtiler")
         rows = int(math.ceil(math.sqrt(self.n)))
         cols = int(math.ceil(self.n / rows))
         tiler.set_property("rows", rows)
         tiler.set_property("columns", cols)
-        tiler.set_property("width", 1280)
-        tiler.set_property("height", 720)
+        tiler.set_property("width", self.tuning["tiler"]["width"])
+        tiler.set_property("height", self.tuning["tiler"]["height"])
+        self.sources.tiler = tiler
 
         # conv + osd + conv + caps
         conv1 = make("conv1", "nvvideoconvert")
@@ -203,33 +586,34 @@ class PipelineBuilder:
         caps = make("caps", "capsfilter")
         caps.set_property("caps", Gst.Caps.from_string("video/x-raw(memory:NVMM), format=I420"))
 
-        # encoder + pay + udpsink
+        # encoder + (pay + udpsink | parse + appsink)
         enc = self._make_encoder()
-        pay = self._make_rtppay()
-        sink = self._make_udpsink()
+        out = self._make_output()
+
+        # valve do ramo de render (opcional)
+        render = [tiler]
+        if self.gate_on_viewers:
+            render = [self._make_gate(), tiler]
 
         # queues (estabilidade)
-        q0 = self._q("q0")
-        q1 = self._q("q1")
-        q2 = self._q("q2")
-        q3 = self._q("q3")
-        q4 = self._q("q4")
+        q0 = self._q("q0", policy="render")
+        q1 = self._q("q1", policy="render")
+        q2 = self._q("q2", policy="render")
+        q3 = self._q("q3", policy="render")
+        q4 = self._q("q4", policy="encode")
 
         # Add elements
         for e in [
-            pgie, tracker, nvanalytics, tiler,
+            *render,
             q0, conv1, q1, osd, q2, conv2, q3, caps,
-            q4, enc, pay, sink
+            q4, enc, *out
         ]:
             p.add(e)
 
         # Link main chain
         link_many(
-            mux,
-            pgie,
-            tracker,
-            nvanalytics,
-            tiler,
+            head,
+            *render,
             q0,
             conv1,
             q1,
@@ -240,27 +624,62 @@ class PipelineBuilder:
             caps,
             q4,
             enc,
-            pay,
-            sink
+            *out
         )
 
-        # Probe (para perf / analytics no probe)
-        pgie_src = pgie.get_static_pad("src")
-        if pgie_src:
-            pgie_src.add_probe(Gst.PadProbeType.BUFFER, pgie_src_pad_buffer_probe, self.perf)
-
-        print(f">> UDP out (RTP/{self.codec}) -> {self.udp_host}:{self.udp_port} (pt={self.rtp_payload})")
-        return p
+    def _build_demux(self, p, head):
+        """
+        head -> nvstreamdemux -> por stream:
+          queue -> conv -> osd -> conv -> caps -> encoder -> h26xparse -> appsink
+        Os appsinks ficam em self.appsinks, na ordem das URIs.
+        """
+        demux = make("demux", "nvstreamdemux")
+        p.add(demux)
+        link_many(head, demux)
+
+        parser = "h264parse" if self.codec == "H264" else "h265parse"
+        self.appsinks = []
+        for i in range(self.n):
+            q = self._q(f"dq_{i}", policy="render")
+            conv1 = make(f"conv1_{i}", "nvvideoconvert")
+            osd = make(f"osd_{i}", "nvdsosd")
+            conv2 = make(f"conv2_{i}", "nvvideoconvert")
+            caps = make(f"caps_{i}", "capsfilter")
+            caps.set_property("caps", Gst.Caps.from_string("video/x-raw(memory:NVMM), format=I420"))
+            enc = self._make_encoder(f"encoder_{i}")
+            parse = make(f"outparse_{i}", parser)
+            sink = self._make_appsink(f"appsink_{i}")
+
+            for e in [q, conv1, osd, conv2, caps, enc, parse, sink]:
+                p.add(e)
+            link_many(q, conv1, osd, conv2, caps, enc, parse, sink)
+
+            srcpad = demux.request_pad_simple(f"src_{i}")
+            sinkpad = q.get_static_pad("sink")
+            if not srcpad or srcpad.link(sinkpad) != Gst.PadLinkReturn.OK:
+                raise RuntimeError(f"Falha linkando nvstreamdemux src_{i}")
+            self.appsinks.append(sink)
 
     def start(self):
         if not self.pipeline:
             raise RuntimeError("Call build() first")
+        self._engine["started_at"] = time.monotonic()
+        self._engine["started_wall"] = time.time()
         self.pipeline.set_state(Gst.State.PLAYING)
 
     def stop(self):
         if self.pipeline:
             self.pipeline.set_state(Gst.State.NULL)
 
+    def _perf_tick(self):
+        # o pico das zonas fecha junto com o intervalo do nvdsanalytics
+        if self.zone_engine is not None:
+            self.zone_engine.roll()
+        return self.perf.snapshot_and_log()
+
     def schedule_perf_log(self):
         # a cada 5s
-        GLib.timeout_add(5000, self.perf.snapshot_and_log)
+        GLib.timeout_add(5000, self._perf_tick)
+        GLib.timeout_add(self.shedder.interval_ms, self.shedder.sample)
+        if self.mux_tuner is not None:
+            self.mux_tuner.start()
@@ -0,0 +1,249 @@
+# ds_analytics/pipeline/crops.py
+import collections
+import os
+import platform
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pyds
+from gi.repository import Gst
+
+from .cropstore import CropStore
+from .probes import _frame_dims
+from .tracks import UNTRACKED_OBJECT_ID
+
+# Jetson: a superficie mapeada precisa ser liberada apos a copia
+_IS_AARCH64 = platform.machine() == "aarch64"
+
+
+def _safe_name(name: str):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "stream"
+
+
+class CropWriter:
+    """
+    Recortes do melhor box de cada track (maior confianca), por stream:
+      - o probe so chama get_nvds_buf_surface quando select() escolhe um
+        candidato: track cuja confianca supera o melhor ja gravado por
+        min_gain, respeitando min_interval_s por stream e max_pending
+      - no probe so o recorte e copiado; conversao, JPEG e escrita rodam
+        em um pool de `workers` threads
+      - cada recorte gravado entra no CropStore (index.jsonl append-only,
+        retencao por quota/idade, ver cropstore.py)
+    """
+
+    def __init__(
+        self,
+        out_dir: str = "/app/crops",
+        url_prefix: str = "/crops",
+        min_interval_s: float = 2.0,
+        min_conf: float = 0.3,
+        min_gain: float = 0.05,
+        min_px: int = 16,
+        workers: int = 2,
+        max_pending: int = 8,
+        jpeg_quality: int = 85,
+        max_tracks: int = 1024,
+        store: CropStore | None = None,
+    ):
+        if workers < 1:
+            raise ValueError("workers deve ser >= 1")
+        if max_pending < 1:
+            raise ValueError("max_pending deve ser >= 1")
+        self.out_dir = out_dir
+        self.url_prefix = url_prefix.rstrip("/")
+        self.min_interval_s = float(min_interval_s)
+        self.min_conf = float(min_conf)
+        self.min_gain = float(min_gain)
+        self.min_px = int(min_px)
+        self.max_pending = int(max_pending)
+        self.jpeg_quality = int(jpeg_quality)
+        self.max_tracks = int(max_tracks)
+        self.store = store or CropStore(out_dir, url_prefix=url_prefix)
+
+        self._pool = ThreadPoolExecutor(max_workers=int(workers), thread_name_prefix="crops")
+        self._lock = threading.Lock()
+        # stream -> OrderedDict(track_id -> melhor confianca gravada), LRU
+        self._best = {}
+        self._last_at = {}
+        self._pending = 0
+        self._counters = {"selected": 0, "written": 0, "rate_limited": 0, "busy": 0, "errors": 0}
+
+    def select(self, stream_key: str, objects):
+        """
+        objects: iteravel de (track_id, label, conf, (left, top, width, height)).
+        Devolve o candidato a recorte do frame ou None (sem tocar nos pixels).
+        """
+        now = time.monotonic()
+        with self._lock:
+            best = self._best.get(stream_key)
+            if best is None:
+                best = self._best[stream_key] = collections.OrderedDict()
+            chosen = None
+            for obj in objects:
+                track_id, _, conf, box = obj
+                if track_id in best:
+                    best.move_to_end(track_id)
+                if conf < self.min_conf or box[2] < self.min_px or box[3] < self.min_px:
+                    continue
+                if conf < best.get(track_id, 0.0) + self.min_gain:
+                    continue
+                if chosen is None or conf > chosen[2]:
+                    chosen = obj
+            if chosen is None:
+                return None
+            if now - self._last_at.get(stream_key, float("-inf")) < self.min_interval_s:
+                self._counters["rate_limited"] += 1
+                return None
+            if self._pending >= self.max_pending:
+                self._counters["busy"] += 1
+                return None
+            self._last_at[stream_key] = now
+            best[chosen[0]] = chosen[2]
+            best.move_to_end(chosen[0])
+            while len(best) > self.max_tracks:
+                best.popitem(last=False)
+            self._pending += 1
+            self._counters["selected"] += 1
+            return chosen
+
+    def submit(self, stream_key: str, candidate, rgba):
+        """Enfileira o recorte (copia RGBA ja feita pelo probe) para o pool."""
+        self._pool.submit(self._write, stream_key, candidate, rgba, time.time())
+
+    def cancel(self):
+        """Candidato escolhido por select() que nao pode ser recortado."""
+        with self._lock:
+            self._pending -= 1
+
+    def _write(self, stream_key: str, candidate, rgba, ts: float):
+        track_id, label, conf, _ = candidate
+        try:
+            bgr = cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR)
+            ok, jpg = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise RuntimeError("imencode falhou")
+            sdir = _safe_name(stream_key)
+            fname = f"{int(ts * 1000)}_{track_id}_{_safe_name(label)}.jpg"
+            os.makedirs(os.path.join(self.out_dir, sdir), exist_ok=True)
+            path = os.path.join(self.out_dir, sdir, fname)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(jpg.tobytes())
+            os.replace(tmp, path)
+            self.store.add(
+                stream_key,
+                {
+                    "stream": stream_key,
+                    "path": f"{self.url_prefix}/{sdir}/{fname}",
+                    "ts": round(ts, 3),
+                    "track_id": int(track_id),
+                    "label": label,
+                    "conf": round(float(conf), 3),
+                },
+                jpg.size,
+            )
+            with self._lock:
+                self._counters["written"] += 1
+        except Exception as exc:
+            with self._lock:
+                self._counters["errors"] += 1
+            print(f">> Falha gravando recorte de {stream_key}: {exc}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def remove_stream(self, stream_key: str):
+        with self._lock:
+            self._best.pop(stream_key, None)
+            self._last_at.pop(stream_key, None)
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._counters)
+            out["pending"] = self._pending
+        out["min_interval_s"] = self.min_interval_s
+        out["store"] = self.store.stats()
+        return out
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.store.close()
+
+
+def crop_src_pad_buffer_probe(pad, info, args):
+    """
+    Probe no src do capsfilter RGBA apos o nvdsanalytics: escolhe no maximo
+    um objeto por frame (CropWriter.select) e so entao mapeia a superficie.
+    Com source_coords (caminho Triton cru) os boxes estao na resolucao da
+    origem e sao levados para a da superficie (mux) antes do recorte.
+    """
+    writer, perf_mgr, source_coords = args
+    buf = info.get_buffer()
+    if not buf:
+        return Gst.PadProbeReturn.OK
+
+    batch_meta = pyds.gst_buffer_get_nvds_batch_meta(hash(buf))
+    l_frame = batch_meta.frame_meta_list
+    while l_frame:
+        try:
+            fmeta = pyds.NvDsFrameMeta.cast(l_frame.data)
+        except StopIteration:
+            break
+        objects = []
+        l_obj = fmeta.obj_meta_list
+        while l_obj:
+            try:
+                obj_meta = pyds.NvDsObjectMeta.cast(l_obj.data)
+            except StopIteration:
+                break
+            if obj_meta.object_id != UNTRACKED_OBJECT_ID:
+                r = obj_meta.rect_params
+                objects.append(
+                    (
+                        obj_meta.object_id,
+                        perf_mgr.label_for_class_id(int(obj_meta.class_id)),
+                        float(obj_meta.confidence),
+                        (r.left, r.top, r.width, r.height),
+                    )
+                )
+            try:
+                l_obj = l_obj.next
+            except StopIteration:
+                break
+
+        stream_key = perf_mgr.stream_key(fmeta.pad_index)
+        chosen = writer.select(stream_key, objects) if objects else None
+        if chosen is not None:
+            rgba = None
+            try:
+                surface = pyds.get_nvds_buf_surface(hash(buf), fmeta.batch_id)
+                left, top, width, height = chosen[3]
+                if source_coords:
+                    h, w = _frame_dims(buf, fmeta)
+                    sx, sy = surface.shape[1] / w, surface.shape[0] / h
+                    left, top, width, height = left * sx, top * sy, width * sx, height * sy
+                x0, y0 = max(0, int(left)), max(0, int(top))
+                x1 = min(surface.shape[1], int(left + width))
+                y1 = min(surface.shape[0], int(top + height))
+                if x1 > x0 and y1 > y0:
+                    rgba = np.array(surface[y0:y1, x0:x1], copy=True, order="C")
+                if _IS_AARCH64:
+                    pyds.unmap_nvds_buf_surface(hash(buf), fmeta.batch_id)
+            except Exception as exc:
+                print(f">> Recorte indisponivel ({stream_key}): {exc}")
+            if rgba is None:
+                writer.cancel()
+            else:
+                writer.submit(stream_key, chosen, rgba)
+
+        try:
+            l_frame = l_frame.next
+        except StopIteration:
+            break
+
+    return Gst.PadProbeReturn.OK
@@ -0,0 +1,177 @@
+# ds_analytics/pipeline/cropstore.py
+import collections
+import json
+import os
+import threading
+import time
+
+INDEX_NAME = "index.jsonl"
+
+
+class CropStore:
+    """
+    Indice em memoria dos recortes em <root>, persistido como JSONL
+    append-only (<root>/index.jsonl):
+      {"op": "add", "stream", "path", "ts", "bytes", ...}
+      {"op": "del", "path"}
+    Retencao:
+      - idade: recortes com mais de max_age_s sao apagados (varredura a
+        cada sweep_s, so olhando o inicio de cada stream)
+      - quota: acima de max_bytes apaga o recorte mais antigo do stream
+        menos recentemente atualizado (LRU por stream), preservando o
+        ultimo de cada stream enquanto houver outro candidato
+      - keep_per_stream: limite de recortes por stream
+    Quando o JSONL passa de ~2x os itens vivos ele e compactado (reescrito
+    so com os vivos, tmp + os.replace); leitores detectam pelo inode/tamanho.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        url_prefix: str = "/crops",
+        max_bytes: int = 512 * 1024 * 1024,
+        max_age_s: float = 72 * 3600.0,
+        keep_per_stream: int = 200,
+        sweep_s: float = 60.0,
+    ):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes deve ser > 0")
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        self.max_bytes = int(max_bytes)
+        self.max_age_s = float(max_age_s)
+        self.keep_per_stream = int(keep_per_stream)
+        self.sweep_s = float(sweep_s)
+        self.index_path = os.path.join(root, INDEX_NAME)
+
+        self._lock = threading.Lock()
+        # stream -> deque de itens (ordem de ts); ordem do dict = LRU por stream
+        self._streams = collections.OrderedDict()
+        self._bytes = 0
+        self._lines = 0
+        self._last_sweep = 0.0
+        self._evicted = {"age": 0, "quota": 0, "count": 0}
+        os.makedirs(root, exist_ok=True)
+        self._load()
+        self._log = open(self.index_path, "a", encoding="utf-8")
+
+    def _load(self):
+        live = {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._lines += 1
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    if rec.get("op") == "add":
+                        live[rec["path"]] = rec
+                    elif rec.get("op") == "del":
+                        live.pop(rec.get("path"), None)
+        except OSError:
+            return
+        for rec in sorted(live.values(), key=lambda r: r.get("ts", 0)):
+            if not os.path.exists(self._file(rec)):
+                continue
+            self._streams.setdefault(rec["stream"], collections.deque()).append(rec)
+            self._streams.move_to_end(rec["stream"])
+            self._bytes += int(rec.get("bytes", 0))
+
+    def _file(self, rec: dict):
+        return os.path.join(self.root, rec["path"][len(self.url_prefix) + 1:])
+
+    def _append(self, rec: dict):
+        self._log.write(json.dumps(rec) + "\n")
+        self._lines += 1
+
+    def add(self, stream_key: str, item: dict, size: int):
+        """Registra um recorte ja gravado (item: stream/path/ts/...) e aplica a retencao."""
+        rec = {"op": "add", **item, "stream": stream_key, "bytes": int(size)}
+        dropped = []
+        with self._lock:
+            items = self._streams.get(stream_key)
+            if items is None:
+                items = self._streams[stream_key] = collections.deque()
+            items.append(rec)
+            self._streams.move_to_end(stream_key)
+            self._bytes += rec["bytes"]
+            self._append(rec)
+            while len(items) > self.keep_per_stream:
+                dropped.append(self._pop(stream_key, "count"))
+            now = time.time()
+            if now - self._last_sweep >= self.sweep_s:
+                self._last_sweep = now
+                dropped += self._expire(now)
+            dropped += self._enforce_quota()
+            self._log.flush()
+            self._maybe_compact()
+        for old in dropped:
+            try:
+                os.remove(self._file(old))
+            except OSError:
+                pass
+
+    def _pop(self, stream_key: str, reason: str):
+        items = self._streams[stream_key]
+        rec = items.popleft()
+        if not items:
+            del self._streams[stream_key]
+        self._bytes -= rec["bytes"]
+        self._evicted[reason] += 1
+        self._append({"op": "del", "path": rec["path"]})
+        return rec
+
+    def _expire(self, now: float):
+        dropped = []
+        cutoff = now - self.max_age_s
+        for key in list(self._streams):
+            while key in self._streams and self._streams[key][0].get("ts", 0) < cutoff:
+                dropped.append(self._pop(key, "age"))
+        return dropped
+
+    def _enforce_quota(self):
+        dropped = []
+        while self._bytes > self.max_bytes and self._streams:
+            # stream menos recente com mais de um item; senao, o mais antigo
+            victim = next((k for k, v in self._streams.items() if len(v) > 1), None)
+            if victim is None:
+                victim = min(self._streams, key=lambda k: self._streams[k][0].get("ts", 0))
+            dropped.append(self._pop(victim, "quota"))
+        return dropped
+
+    def _live(self):
+        return sum(len(v) for v in self._streams.values())
+
+    def _maybe_compact(self):
+        live = self._live()
+        if self._lines <= 2 * live + 1000:
+            return
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for items in self._streams.values():
+                for rec in items:
+                    f.write(json.dumps(rec) + "\n")
+        self._log.close()
+        os.replace(tmp, self.index_path)
+        self._log = open(self.index_path, "a", encoding="utf-8")
+        self._lines = live
+
+    def latest(self):
+        """{stream: item mais recente}."""
+        with self._lock:
+            return {k: dict(v[-1]) for k, v in self._streams.items()}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "items": {k: len(v) for k, v in self._streams.items()},
+                "evicted": dict(self._evicted),
+                "index_lines": self._lines,
+            }
+
+    def close(self):
+        with self._lock:
+            self._log.close()
@@ -0,0 +1,215 @@
+# ds_analytics/pipeline/engines.py
+import configparser
+import glob
+import hashlib
+import os
+import shutil
+import time
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst, GLib
+from pynvml import nvmlInit, nvmlDeviceGetHandleByIndex, nvmlDeviceGetCudaComputeCapability
+
+from .nodes import make, link_many
+
+# network-mode do nvinfer -> sufixo usado pelo proprio nvinfer nos .engine
+PRECISIONS = {0: "fp32", 1: "int8", 2: "fp16"}
+
+
+def read_nvinfer_config(path: str):
+    """[property] do config do nvinfer, com caminhos relativos resolvidos."""
+    cfg = configparser.ConfigParser()
+    cfg.read(path)
+    if "property" not in cfg:
+        raise ValueError(f"{path}: secao [property] ausente")
+    prop = dict(cfg["property"])
+    base = os.path.dirname(os.path.abspath(path))
+    for key in ("onnx-file", "model-file", "model-engine-file", "int8-calib-file"):
+        if prop.get(key) and not os.path.isabs(prop[key]):
+            prop[key] = os.path.normpath(os.path.join(base, prop[key]))
+    return prop
+
+
+def gpu_arch(gpu_id: int = 0):
+    nvmlInit()
+    major, minor = nvmlDeviceGetCudaComputeCapability(nvmlDeviceGetHandleByIndex(gpu_id))
+    return f"sm{major}{minor}"
+
+
+def _file_digest(path: str):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:10]
+
+
+class EngineCache:
+    """
+    Engines TensorRT em cache_dir nomeados por
+      <modelo>-<hash do onnx>_b<batch>_<precisao>_<sm arch>.engine
+    para que mudar o numero de cameras (batch-size do nvinfer) aponte para o
+    engine certo em vez de reconstruir o que esta no config do modelo.
+    Engines ainda nao cacheados sao construidos pelo proprio nvinfer e
+    adotados (copiados para o cache, o original fica ao lado do modelo)
+    apos a primeira inferencia.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._arch = {}
+        self._digest = {}
+
+    def _arch_for(self, gpu_id: int):
+        if gpu_id not in self._arch:
+            self._arch[gpu_id] = gpu_arch(gpu_id)
+        return self._arch[gpu_id]
+
+    def key(self, pgie_config: str, batch: int):
+        """Chave do engine para o config/batch, ou None se nao ha modelo para construir."""
+        prop = read_nvinfer_config(pgie_config)
+        model = prop.get("onnx-file") or prop.get("model-file")
+        if not model or not os.path.isfile(model):
+            return None
+        if model not in self._digest:
+            self._digest[model] = _file_digest(model)
+        gpu_id = int(prop.get("gpu-id", 0))
+        return {
+            "model": model,
+            "model_name": os.path.splitext(os.path.basename(model))[0],
+            "digest": self._digest[model],
+            "batch": int(batch),
+            "precision": PRECISIONS.get(int(prop.get("network-mode", 0)), "fp32"),
+            "gpu_id": gpu_id,
+            "arch": self._arch_for(gpu_id),
+        }
+
+    def path_for(self, key: dict):
+        name = f"{key['model_name']}-{key['digest']}_b{key['batch']}_{key['precision']}_{key['arch']}.engine"
+        return os.path.join(self.cache_dir, name)
+
+    def lookup(self, pgie_config: str, batch: int):
+        """(caminho no cache, existe?) ou (None, False) se o modelo nao e cacheavel."""
+        key = self.key(pgie_config, batch)
+        if key is None:
+            return None, False
+        path = self.path_for(key)
+        return path, os.path.isfile(path)
+
+    def adopt(self, pgie_config: str, batch: int, since: float):
+        """
+        Copia para o cache o engine que o nvinfer serializou ao lado do modelo
+        (<modelo>_b<batch>_gpu<id>_<precisao>.engine) depois de `since`. O
+        original fica no lugar: configs/ferramentas com model-engine-file no
+        diretorio do modelo (build_engines.py, outra instancia do pipeline)
+        continuam usando-o sem reconstruir.
+        """
+        key = self.key(pgie_config, batch)
+        if key is None:
+            return None
+        pattern = os.path.join(
+            os.path.dirname(key["model"]),
+            f"*_b{key['batch']}_gpu{key['gpu_id']}_{key['precision']}.engine",
+        )
+        built = [p for p in glob.glob(pattern) if os.path.getmtime(p) >= since - 1]
+        if not built:
+            return None
+        src = max(built, key=os.path.getmtime)
+        dst = self.path_for(key)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = dst + ".tmp"
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+        return dst
+
+    def entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return sorted(os.path.basename(p) for p in glob.glob(os.path.join(self.cache_dir, "*.engine")))
+
+
+def first_inference_probe(pad, info, state):
+    """One-shot no src do pgie: registra o tempo ate a 1a inferencia."""
+    if state.get("first_inference_s") is None:
+        state["first_inference_s"] = round(time.monotonic() - state["started_at"], 2)
+        print(f">> Primeira inferencia em {state['first_inference_s']}s (engine: {state.get('engine')})")
+        cb = state.get("on_first")
+        if cb is not None:
+            GLib.idle_add(cb)
+    return Gst.PadProbeReturn.REMOVE
+
+
+def warm_engine(cache: EngineCache, pgie_config: str, batch: int, timeout_s: float = 1800.0):
+    """
+    Sobe um pipeline sintetico (batch x videotestsrc -> nvstreammux -> nvinfer
+    -> fakesink) para construir/carregar o engine do batch pedido e mede o
+    tempo ate a primeira inferencia. Engines novos vao para o cache.
+    """
+    path, cached = cache.lookup(pgie_config, batch)
+    if path is None:
+        raise ValueError(f"{pgie_config}: sem onnx-file/model-file para construir o engine")
+
+    p = Gst.Pipeline()
+    mux = make("warm_mux", "nvstreammux")
+    mux.set_property("width", 640)
+    mux.set_property("height", 480)
+    mux.set_property("batch-size", batch)
+    mux.set_property("batched-push-timeout", 40000)
+    pgie = make("warm_pgie", "nvinfer")
+    pgie.set_property("config-file-path", pgie_config)
+    pgie.set_property("batch-size", batch)
+    if cached:
+        pgie.set_property("model-engine-file", path)
+    sink = make("warm_sink", "fakesink")
+    sink.set_property("sync", False)
+    for e in [mux, pgie, sink]:
+        p.add(e)
+    link_many(mux, pgie, sink)
+
+    for i in range(batch):
+        src = make(f"warm_src_{i}", "videotestsrc")
+        src.set_property("is-live", True)
+        conv = make(f"warm_conv_{i}", "nvvideoconvert")
+        caps = make(f"warm_caps_{i}", "capsfilter")
+        caps.set_property("caps", Gst.Caps.from_string("video/x-raw(memory:NVMM), format=NV12, width=640, height=480"))
+        for e in [src, conv, caps]:
+            p.add(e)
+        link_many(src, conv, caps)
+        caps.get_static_pad("src").link(mux.request_pad_simple(f"sink_{i}"))
+
+    loop = GLib.MainLoop()
+    state = {"started_at": time.monotonic(), "first_inference_s": None, "engine": path, "on_first": loop.quit}
+    pgie.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, first_inference_probe, state)
+    error = {}
+
+    def _on_message(bus, message):
+        if message.type == Gst.MessageType.ERROR:
+            err, _ = message.parse_error()
+            error["message"] = err.message
+            loop.quit()
+        return True
+
+    bus = p.get_bus()
+    bus.add_signal_watch()
+    bus.connect("message", _on_message)
+    started_wall = time.time()
+    GLib.timeout_add(int(timeout_s * 1000), loop.quit)
+    p.set_state(Gst.State.PLAYING)
+    loop.run()
+    p.set_state(Gst.State.NULL)
+    bus.remove_signal_watch()
+
+    if error:
+        raise RuntimeError(f"warm b{batch}: {error['message']}")
+    if state["first_inference_s"] is None:
+        raise TimeoutError(f"warm b{batch}: sem inferencia em {timeout_s}s")
+    if not cached:
+        path = cache.adopt(pgie_config, batch, started_wall) or path
+    return {
+        "batch": batch,
+        "engine": path,
+        "cached": cached,
+        "first_inference_s": state["first_inference_s"],
+    }
@@ -0,0 +1,273 @@
+# ds_analytics/pipeline/events.py
+import collections
+import json
+import os
+import socket
+import threading
+import time
+
+from common.histogram import Histogram
+
+BATCH_BUCKETS = [1, 8, 32, 64, 128, 256, 512, 1024]
+_SEPARATORS = (",", ":")
+
+
+def encode_batch(seq: int, events: list):
+    """Uma linha JSON compacta por batch: {"v":1,"seq":n,"ts":..,"ev":[...]}\\n."""
+    doc = {"v": 1, "seq": seq, "ts": round(time.time(), 3), "ev": events}
+    return (json.dumps(doc, separators=_SEPARATORS) + "\n").encode("utf-8")
+
+
+class UnixSocketTransport:
+    """
+    SOCK_STREAM em um socket Unix onde o consumidor escuta (ver
+    scripts/event_consumer.py). Sem consumidor o batch e descartado e a
+    reconexao so e tentada apos retry_s.
+    """
+
+    def __init__(self, path: str, retry_s: float = 2.0, timeout_s: float = 1.0):
+        self.path = path
+        self.retry_s = float(retry_s)
+        self.timeout_s = float(timeout_s)
+        self._sock = None
+        self._next_try = 0.0
+
+    def _connect(self):
+        now = time.monotonic()
+        if now < self._next_try:
+            return False
+        self._next_try = now + self.retry_s
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout_s)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            return False
+        self._sock = sock
+        return True
+
+    def send(self, data: bytes):
+        if self._sock is None and not self._connect():
+            return False
+        try:
+            self._sock.sendall(data)
+            return True
+        except OSError:
+            self.close()
+            return False
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class ZmqTransport:
+    """
+    PUSH do pyzmq (opcional) em ipc:// ou tcp://; send nao bloqueia: com a
+    fila do socket cheia (sndhwm) o batch e descartado.
+    """
+
+    def __init__(self, endpoint: str, bind: bool = False, sndhwm: int = 100):
+        try:
+            import zmq
+        except ImportError:
+            raise RuntimeError("transporte zmq exige pyzmq (pip install pyzmq)") from None
+        self._zmq = zmq
+        self._ctx = zmq.Context.instance()
+        self._sock = self._ctx.socket(zmq.PUSH)
+        self._sock.setsockopt(zmq.SNDHWM, int(sndhwm))
+        self._sock.setsockopt(zmq.LINGER, 0)
+        if bind:
+            self._sock.bind(endpoint)
+        else:
+            self._sock.connect(endpoint)
+
+    def send(self, data: bytes):
+        try:
+            self._sock.send(data, flags=self._zmq.NOBLOCK)
+            return True
+        except self._zmq.Again:
+            return False
+
+    def close(self):
+        self._sock.close()
+
+
+class JsonlTransport:
+    """
+    <dir>/events.jsonl com rotacao por tamanho: events.jsonl.1 e o mais
+    recente rotacionado; mantem `keep` arquivos.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, keep: int = 5):
+        if keep < 1:
+            raise ValueError("keep deve ser >= 1")
+        self.path = os.path.join(directory, "events.jsonl")
+        self.max_bytes = int(max_bytes)
+        self.keep = int(keep)
+        os.makedirs(directory, exist_ok=True)
+        self._f = open(self.path, "ab")
+
+    def _rotate(self):
+        self._f.close()
+        for i in range(self.keep - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        self._f = open(self.path, "ab")
+
+    def send(self, data: bytes):
+        try:
+            if self._f.tell() + len(data) > self.max_bytes and self._f.tell() > 0:
+                self._rotate()
+            self._f.write(data)
+            self._f.flush()
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        self._f.close()
+
+
+def make_transport(url: str):
+    """
+    unix:///tmp/ds_events.sock | zmq+ipc:///tmp/ds_events | zmq+tcp://127.0.0.1:5557
+    | jsonl:///app/logs/events
+    """
+    if url.startswith("unix://"):
+        return UnixSocketTransport(url[len("unix://"):])
+    if url.startswith("zmq+"):
+        return ZmqTransport(url[len("zmq+"):])
+    if url.startswith("jsonl://"):
+        return JsonlTransport(url[len("jsonl://"):])
+    raise ValueError("url de eventos deve comecar com unix://, zmq+ipc://, zmq+tcp:// ou jsonl://")
+
+
+class EventPublisher:
+    """
+    Eventos por frame (deteccoes, cruzamentos de linha, mudancas de
+    overcrowding) em registros compactos, enviados em batches por uma
+    thread propria:
+      - publish() nunca bloqueia o probe: fila limitada a max_queue, o
+        excedente e descartado e contado (dropped_queue)
+      - um batch sai com batch_size eventos ou apos linger_ms do primeiro
+      - falha do transporte descarta o batch (dropped_transport)
+    Registros ("k" = tipo):
+      det {"k","s","ts","f","o": [[class_id, conf, left, top, w, h, track_id], ...]}
+      lc  {"k","s","ts","line","label","track"}
+      oc  {"k","s","ts","roi","active"}
+    """
+
+    def __init__(self, transport, batch_size: int = 256, linger_ms: float = 50.0, max_queue: int = 10000):
+        if batch_size < 1:
+            raise ValueError("batch_size deve ser >= 1")
+        if max_queue < batch_size:
+            raise ValueError("max_queue deve ser >= batch_size")
+        self.transport = transport
+        self.batch_size = int(batch_size)
+        self.linger_s = float(linger_ms) / 1000.0
+        self.max_queue = int(max_queue)
+        self._queue = collections.deque()
+        self._first_at = None  # monotonic do evento mais antigo na fila
+        self._cond = threading.Condition()
+        self._oc = {}
+        self._seq = 0
+        self._stop = False
+        self._counters = {
+            "published": 0,
+            "sent": 0,
+            "batches": 0,
+            "dropped_queue": 0,
+            "dropped_transport": 0,
+        }
+        self._batch_hist = Histogram(BATCH_BUCKETS)
+        self._thread = threading.Thread(target=self._run, name="events", daemon=True)
+        self._thread.start()
+
+    def publish(self, event: dict):
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._counters["dropped_queue"] += 1
+                return False
+            self._queue.append(event)
+            self._counters["published"] += 1
+            # acorda na 1a entrada (inicia o linger) e no batch cheio
+            if len(self._queue) == 1:
+                self._first_at = time.monotonic()
+                self._cond.notify()
+            elif len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def detections(self, stream_key: str, ts: float, frame_num: int, objects: list):
+        """objects: [[class_id, conf, left, top, width, height, track_id], ...]."""
+        return self.publish({"k": "det", "s": stream_key, "ts": ts, "f": frame_num, "o": objects})
+
+    def line_crossing(self, stream_key: str, ts: float, line: str, label: str, track_id: int):
+        return self.publish({"k": "lc", "s": stream_key, "ts": ts, "line": line, "label": label, "track": track_id})
+
+    def overcrowding(self, stream_key: str, ts: float, status: dict):
+        """Publica so as ROIs cujo estado de overcrowding mudou."""
+        prev = self._oc.setdefault(stream_key, {})
+        for roi, active in status.items():
+            active = bool(active)
+            if prev.get(roi, False) != active:
+                prev[roi] = active
+                self.publish({"k": "oc", "s": stream_key, "ts": ts, "roi": roi, "active": active})
+
+    def _take(self):
+        """
+        Espera ate batch_size eventos ou linger_s desde o enfileiramento do
+        primeiro; None ao parar.
+        """
+        with self._cond:
+            while not self._queue and not self._stop:
+                self._cond.wait(0.5)
+            if not self._queue:
+                return None
+            deadline = (self._first_at or time.monotonic()) + self.linger_s
+            while len(self._queue) < self.batch_size and not self._stop:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            n = min(self.batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(n)]
+            # o que sobrou ja estava esperando: o linger conta a partir de agora
+            self._first_at = time.monotonic() if self._queue else None
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch is None:
+                return
+            self._seq += 1
+            ok = self.transport.send(encode_batch(self._seq, batch))
+            with self._cond:
+                if ok:
+                    self._counters["sent"] += len(batch)
+                    self._counters["batches"] += 1
+                    self._batch_hist.add(len(batch))
+                else:
+                    self._counters["dropped_transport"] += len(batch)
+
+    def stats(self):
+        with self._cond:
+            out = dict(self._counters)
+            out["queue_depth"] = len(self._queue)
+            out["batch_size"] = self._batch_hist.export()
+        out["transport"] = type(self.transport).__name__
+        return out
+
+    def close(self, timeout_s: float = 2.0):
+        """Envia o que estiver na fila (ate timeout_s) e fecha o transporte."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._thread.join(timeout_s)
+        self.transport.close()
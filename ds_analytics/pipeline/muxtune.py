@@ -0,0 +1,174 @@
+# ds_analytics/pipeline/muxtune.py
+import math
+import threading
+import time
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst, GLib
+import pyds
+
+from common.histogram import Histogram
+
+# Limites dos histogramas exportados (o ultimo bucket e "acima do maior").
+FILL_BUCKETS = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+WAIT_BUCKETS_MS = [1, 2, 5, 10, 20, 33, 50, 100, 200]
+
+
+class MuxTuner:
+    """
+    Mede a entrada e a saida do nvstreammux:
+      - intervalo entre frames por source (EWMA, via probe nos sink pads)
+      - ocupacao de cada batch (num_frames_in_batch / batch-size)
+      - espera do batch (1o frame que chegou -> push do batch)
+    Em mode="auto", a cada check_ms ajusta
+      push timeout = min(orcamento de latencia, periodo do source mais lento)
+    e calcula o batch-size recomendado = frames esperados nessa janela
+    (sum(min(1, T/periodo))). batch-size do nvstreammux nao e mutavel em
+    PLAYING (e o engine do nvinfer depende dele): a recomendacao so aparece
+    no /metrics, para o proximo start (--max-sources). mode="observe" so
+    exporta.
+    """
+
+    def __init__(
+        self,
+        mux,
+        perf,
+        max_batch: int,
+        mode: str = "observe",
+        latency_budget_ms: float = 50.0,
+        min_timeout_ms: float = 5.0,
+        stale_s: float = 2.0,
+        check_ms: int = 5000,
+    ):
+        if mode not in ("observe", "auto"):
+            raise ValueError("mode deve ser observe ou auto")
+        self.mux = mux
+        self.perf = perf
+        self.max_batch = int(max_batch)
+        self.mode = mode
+        self.latency_budget_ms = float(latency_budget_ms)
+        self.min_timeout_ms = float(min_timeout_ms)
+        self.stale_s = float(stale_s)
+        self.check_ms = int(check_ms)
+
+        self._lock = threading.Lock()
+        self._last_arrival = {}
+        self._period_ms = {}
+        self._first_pending = None
+        self.fill_hist = Histogram(FILL_BUCKETS)
+        self.wait_hist = Histogram(WAIT_BUCKETS_MS)
+        self._last_decision = None
+
+        mux.connect("pad-added", self._on_pad_added)
+        src = mux.get_static_pad("src")
+        src.add_probe(Gst.PadProbeType.BUFFER, self._on_batch)
+
+    def start(self):
+        if self.mode == "auto":
+            GLib.timeout_add(self.check_ms, self.step)
+
+    def _on_pad_added(self, mux, pad):
+        if pad.get_direction() == Gst.PadDirection.SINK:
+            pad.add_probe(Gst.PadProbeType.BUFFER, self._on_frame, pad.get_name())
+
+    def _on_frame(self, pad, info, pad_name):
+        now = time.monotonic()
+        with self._lock:
+            prev = self._last_arrival.get(pad_name)
+            self._last_arrival[pad_name] = now
+            if prev is not None:
+                dt = (now - prev) * 1000.0
+                old = self._period_ms.get(pad_name)
+                self._period_ms[pad_name] = dt if old is None else 0.9 * old + 0.1 * dt
+            if self._first_pending is None:
+                self._first_pending = now
+        return Gst.PadProbeReturn.OK
+
+    def _on_batch(self, pad, info):
+        buf = info.get_buffer()
+        if not buf:
+            return Gst.PadProbeReturn.OK
+        now = time.monotonic()
+        batch_meta = pyds.gst_buffer_get_nvds_batch_meta(hash(buf))
+        n = batch_meta.num_frames_in_batch if batch_meta else 0
+        size = max(1, self.mux.get_property("batch-size"))
+        with self._lock:
+            first = self._first_pending
+            self._first_pending = None
+            self.fill_hist.add(min(1.0, n / size))
+            if first is not None:
+                self.wait_hist.add((now - first) * 1000.0)
+        return Gst.PadProbeReturn.OK
+
+    def _live_periods(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                p
+                for name, p in self._period_ms.items()
+                if p and now - self._last_arrival.get(name, 0.0) < self.stale_s
+            ]
+
+    def decide(self, periods_ms):
+        """(timeout_ms, batch_size) para os periodos medidos dos sources vivos."""
+        if not periods_ms:
+            return None
+        timeout_ms = min(self.latency_budget_ms, max(periods_ms) * 1.05)
+        timeout_ms = max(self.min_timeout_ms, timeout_ms)
+        expected = sum(min(1.0, timeout_ms / p) for p in periods_ms)
+        batch = int(min(self.max_batch, max(1, math.ceil(expected - 1e-6))))
+        return timeout_ms, batch
+
+    def _set_if_mutable(self, prop: str, value: int):
+        pspec = self.mux.find_property(prop)
+        if pspec is None or not (pspec.flags & Gst.PARAM_MUTABLE_PLAYING):
+            _, state, _ = self.mux.get_state(0)
+            if state > Gst.State.READY:
+                return False
+        self.mux.set_property(prop, value)
+        return True
+
+    def step(self):
+        decision = self.decide(self._live_periods())
+        if decision is None:
+            return True
+        timeout_ms, batch = decision
+        cur_timeout_us = self.mux.get_property("batched-push-timeout")
+        new_timeout_us = int(timeout_ms * 1000)
+        applied = {}
+        if abs(new_timeout_us - cur_timeout_us) > 0.1 * max(1, cur_timeout_us):
+            applied["batched-push-timeout"] = self._set_if_mutable("batched-push-timeout", new_timeout_us)
+        self._last_decision = {
+            "timeout_ms": round(timeout_ms, 1),
+            "recommended_batch_size": batch,
+            "applied": applied,
+            "at": time.time(),
+        }
+        if applied:
+            print(f">> nvstreammux: timeout={timeout_ms:.1f}ms {applied} (batch-size recomendado: {batch})")
+        return True
+
+    def _stream_for_pad(self, pad_name: str):
+        # sink_<slot> -> nome do stream no PerfManager
+        try:
+            return self.perf.stream_key(int(pad_name.rsplit("_", 1)[1]))
+        except (IndexError, ValueError):
+            return pad_name
+
+    def stats(self):
+        with self._lock:
+            periods = {self._stream_for_pad(k): round(v, 1) for k, v in self._period_ms.items()}
+            fill = self.fill_hist.export()
+            wait = self.wait_hist.export()
+        return {
+            "mode": self.mode,
+            "batch_size": self.mux.get_property("batch-size"),
+            "batched_push_timeout_us": self.mux.get_property("batched-push-timeout"),
+            "latency_budget_ms": self.latency_budget_ms,
+            "source_period_ms": periods,
+            "batch_fill": fill,
+            "batch_wait_ms": wait,
+            "last_decision": self._last_decision,
+        }
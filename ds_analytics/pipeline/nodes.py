@@ -3,7 +3,51 @@ import gi
 gi.require_version("Gst", "1.0")
 from gi.repository import Gst
 
-def create_source_bin(index: int, uri: str):
+# Prioridade por camera, aplicada no nvv4l2decoder:
+#   drop-frame-interval: entrega 1 de cada N frames decodificados (0 = todos)
+#   skip-frames: 0 decodifica tudo, 1 so referencia, 2 so keyframes
+SOURCE_TIERS = {
+    "high": {"drop-frame-interval": 0, "skip-frames": 0},
+    "medium": {"drop-frame-interval": 2, "skip-frames": 0},
+    "low": {"drop-frame-interval": 0, "skip-frames": 2},
+}
+
+
+def _is_decoder(elem):
+    return elem.find_property("drop-frame-interval") is not None
+
+
+def apply_source_tier(src_bin, tier: str):
+    """
+    Aplica o tier nos decoders ja criados dentro do source bin.
+    Retorna False se alguma propriedade nao pode mudar no estado atual
+    (ex.: drop-frame-interval so muda em NULL/READY) e o bin precisa ser
+    recriado para o tier valer.
+    """
+    props = SOURCE_TIERS[tier]
+    applied = True
+    it = src_bin.iterate_recurse()
+    while True:
+        res, elem = it.next()
+        if res != Gst.IteratorResult.OK:
+            break
+        if not _is_decoder(elem):
+            continue
+        _, state, _ = elem.get_state(0)
+        for prop, val in props.items():
+            pspec = elem.find_property(prop)
+            if pspec is None or elem.get_property(prop) == val:
+                continue
+            if state > Gst.State.READY and not (pspec.flags & Gst.PARAM_MUTABLE_PLAYING):
+                applied = False
+                continue
+            elem.set_property(prop, val)
+    return applied
+
+
+def create_source_bin(index: int, uri: str, tier: str = "high"):
+    if tier not in SOURCE_TIERS:
+        raise ValueError(f"tier deve ser um de {sorted(SOURCE_TIERS)}")
     bin_name = f"source-bin-{index:02d}"
     nbin = Gst.Bin.new(bin_name)
     if not nbin:
@@ -33,6 +77,10 @@ def create_source_bin(index: int, uri: str):
                 pass
         if "decodebin" in name:
             obj.connect("child-added", _child_added, user_data)
+        if _is_decoder(obj):
+            for prop, val in SOURCE_TIERS[tier].items():
+                if obj.find_property(prop) is not None:
+                    obj.set_property(prop, val)
 
     uri_decode_bin = Gst.ElementFactory.make("uridecodebin", f"uri-decode-bin-{index}")
     if not uri_decode_bin:
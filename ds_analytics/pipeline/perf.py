@@ -1,6 +1,7 @@
 # ds_analytics/pipeline/perf.py
-import os, time, threading
+import csv, os, time, threading
 from common.gpu_usage import GpuUsage
+from .aggregates import WindowedAggregator
 
 class _GETFPS:
     def __init__(self):
@@ -27,12 +28,17 @@ class PerfManager:
         labels: list | None = None,
         stream_names: list | None = None,
     ):
-        self.stream_names = stream_names or []
+        self.stream_names = list(stream_names or [])
         self.fps = {self.stream_key(i): _GETFPS() for i in range(n_streams)}
+        self.last_frame_at = {}
+        self.last_fps = {}
+        self.last_gpu = None
         self.gpu = GpuUsage()
         self.csv_path = csv_path
         self._csv_keys = sorted(self.fps.keys())
         self._csv_header_written = False
+        self._csv_extra = {}
+        self._csv_extra_keys = []
         os.makedirs(os.path.dirname(self.csv_path), exist_ok=True)
         if os.path.exists(self.csv_path):
             os.remove(self.csv_path)
@@ -41,9 +47,42 @@ class PerfManager:
         self._counts_total = self._init_counts()
         self._counts_by_stream = {}
         self._counts_updated_at = 0.0
+        self._load = {"state": "ok", "queues": {}, "updated_at": 0.0}
+        # nvdsanalytics por stream; "interval" fecha a cada snapshot_and_log
+        self._analytics = {}
+        self._analytics_interval_start = time.time()
+        # contagens por label em janelas de 1 min / 15 min / 1 h
+        self.aggregates = WindowedAggregator()
 
     def on_frame(self, stream_idx: int):
-        self.fps[self.stream_key(stream_idx)].tick()
+        key = self.stream_key(stream_idx)
+        fps = self.fps.get(key)
+        if fps is not None:
+            fps.tick()
+        self.last_frame_at[key] = time.monotonic()
+
+    def add_stream(self, stream_idx: int, name: str | None = None):
+        """Registra um stream adicionado em runtime; retorna a chave usada."""
+        if name:
+            while len(self.stream_names) <= stream_idx:
+                self.stream_names.append(f"stream{len(self.stream_names)}")
+            self.stream_names[stream_idx] = name
+        key = self.stream_key(stream_idx)
+        self.fps.setdefault(key, _GETFPS())
+        return key
+
+    def remove_stream(self, stream_idx: int):
+        key = self.stream_key(stream_idx)
+        self.fps.pop(key, None)
+        self.last_frame_at.pop(key, None)
+        with self._counts_lock:
+            self._counts_by_stream.pop(key, None)
+            self._analytics.pop(key, None)
+        self.aggregates.remove_stream(key)
+        # slot reutilizado sem nome nao herda o nome (nem a coluna do CSV) antigo
+        if 0 <= stream_idx < len(self.stream_names):
+            self.stream_names[stream_idx] = f"stream{stream_idx}"
+        return key
 
     def stream_key(self, stream_idx: int):
         if 0 <= stream_idx < len(self.stream_names):
@@ -59,10 +98,20 @@ class PerfManager:
         return f"class_{class_id}"
 
     def update_counts(self, counts_by_stream: dict, counts_total: dict):
+        now = time.time()
         with self._counts_lock:
             self._counts_by_stream = counts_by_stream
             self._counts_total = counts_total
-            self._counts_updated_at = time.time()
+            self._counts_updated_at = now
+        for key, counts in counts_by_stream.items():
+            self.aggregates.add(key, counts, now)
+
+    def get_aggregates(self):
+        return {"windows": list(self.aggregates.windows), "streams": self.aggregates.snapshot()}
+
+    def stream_counts(self, stream_key: str):
+        with self._counts_lock:
+            return dict(self._counts_by_stream.get(stream_key, {}))
 
     def get_counts(self):
         with self._counts_lock:
@@ -72,16 +121,144 @@ class PerfManager:
                 "updated_at": self._counts_updated_at,
             }
 
+    def set_csv_field(self, name: str, value):
+        """Coluna extra do CSV (apos gpu_pct), com o ultimo valor registrado."""
+        self._csv_extra[name] = value
+
+    def update_load(self, state: str, queues: dict):
+        with self._counts_lock:
+            self._load = {"state": state, "queues": queues, "updated_at": time.time()}
+
+    def get_load(self):
+        with self._counts_lock:
+            return dict(self._load)
+
+    def update_analytics(
+        self,
+        stream_key: str,
+        lc_cum: dict,
+        lc_curr: dict,
+        roi: dict,
+        overcrowding: dict,
+        lc_by_label: dict | None = None,
+    ):
+        """Um frame do nvdsanalytics (ver probes.analytics_src_pad_buffer_probe)."""
+        with self._counts_lock:
+            st = self._analytics.get(stream_key)
+            if st is None:
+                st = self._analytics[stream_key] = {"lines": {}, "roi": {}, "overcrowding": {}}
+            for line, cum in lc_cum.items():
+                ln = st["lines"].get(line)
+                if ln is None:
+                    ln = st["lines"][line] = {"cumulative": 0, "interval": 0, "last_interval": 0, "by_label": {}}
+                ln["cumulative"] = int(cum)
+                ln["interval"] += int(lc_curr.get(line, 0))
+            for line, labels in (lc_by_label or {}).items():
+                ln = st["lines"].get(line)
+                if ln is None:
+                    continue
+                for label, n in labels.items():
+                    ln["by_label"][label] = ln["by_label"].get(label, 0) + n
+            for name, n in roi.items():
+                r = st["roi"].get(name)
+                if r is None:
+                    r = st["roi"][name] = {"current": 0, "interval_max": 0, "last_interval_max": 0}
+                r["current"] = int(n)
+                r["interval_max"] = max(r["interval_max"], int(n))
+            for name, active in overcrowding.items():
+                oc = st["overcrowding"].get(name)
+                if oc is None:
+                    oc = st["overcrowding"][name] = {"active": False, "events": 0}
+                if active and not oc["active"]:
+                    oc["events"] += 1
+                oc["active"] = bool(active)
+
+    def _roll_analytics(self):
+        """Fecha o intervalo atual; devolve (cruzamentos no intervalo, ROIs em overcrowding)."""
+        crossings = 0
+        oc_active = 0
+        with self._counts_lock:
+            for st in self._analytics.values():
+                for ln in st["lines"].values():
+                    ln["last_interval"] = ln["interval"]
+                    ln["interval"] = 0
+                    crossings += ln["last_interval"]
+                for r in st["roi"].values():
+                    r["last_interval_max"] = r["interval_max"]
+                    r["interval_max"] = r["current"]
+                oc_active += sum(1 for oc in st["overcrowding"].values() if oc["active"])
+            self._analytics_interval_start = time.time()
+        return crossings, oc_active
+
+    def get_analytics(self):
+        with self._counts_lock:
+            return {
+                "streams": {
+                    key: {
+                        "lines": {
+                            name: {
+                                "cumulative": ln["cumulative"],
+                                "last_interval": ln["last_interval"],
+                                "current_interval": ln["interval"],
+                                "by_label": dict(ln["by_label"]),
+                            }
+                            for name, ln in st["lines"].items()
+                        },
+                        "roi": {
+                            name: {"occupancy": r["current"], "last_interval_max": r["last_interval_max"]}
+                            for name, r in st["roi"].items()
+                        },
+                        "overcrowding": {name: dict(oc) for name, oc in st["overcrowding"].items()},
+                    }
+                    for key, st in self._analytics.items()
+                },
+                "interval_started_at": self._analytics_interval_start,
+            }
+
+    def _csv_columns(self):
+        return ["ts_epoch", *self._csv_keys, "gpu_pct", *self._csv_extra_keys]
+
+    def _rewrite_csv(self, keys, extra_keys):
+        """Reescreve o CSV com novas colunas (valores ausentes ficam vazios no historico)."""
+        with open(self.csv_path, "r", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self._csv_keys = keys
+        self._csv_extra_keys = extra_keys
+        with open(self.csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(
+                f, fieldnames=self._csv_columns(), extrasaction="ignore", restval=""
+            )
+            writer.writeheader()
+            writer.writerows(rows)
+
     def snapshot_and_log(self):
         perf = {k: v.fps_and_reset() for k, v in self.fps.items()}
         gpu = self.gpu.get_gpu_utilization()
+        self.last_fps = perf
+        self.last_gpu = gpu
+        if self._analytics:
+            crossings, oc_active = self._roll_analytics()
+            self.set_csv_field("lc_crossings", crossings)
+            self.set_csv_field("oc_active", oc_active)
         print(f"\n**PERF: {perf}, GPU={gpu}%\n")
+        # Streams removidos mantem a coluna (vazia); colunas novas reescrevem o header.
+        keys = sorted(set(self._csv_keys) | set(perf))
+        extra_keys = self._csv_extra_keys + [
+            k for k in self._csv_extra if k not in self._csv_extra_keys
+        ]
+        if keys != self._csv_keys or extra_keys != self._csv_extra_keys:
+            if self._csv_header_written:
+                self._rewrite_csv(keys, extra_keys)
+            else:
+                self._csv_keys = keys
+                self._csv_extra_keys = extra_keys
         if not self._csv_header_written:
-            header = "ts_epoch," + ",".join(self._csv_keys) + ",gpu_pct\n"
             with open(self.csv_path, "a") as f:
-                f.write(header)
+                f.write(",".join(self._csv_columns()) + "\n")
             self._csv_header_written = True
-        line = f"{time.time()}," + ",".join(str(perf[k]) for k in self._csv_keys) + f",{gpu}\n"
+        values = [time.time(), *(perf.get(k, "") for k in self._csv_keys), gpu]
+        values += [self._csv_extra.get(k, "") for k in self._csv_extra_keys]
+        line = ",".join(str(v) for v in values) + "\n"
         with open(self.csv_path, "a") as f:
             f.write(line)
         return True
@@ -1,9 +1,12 @@
 # /app/pipeline/probes.py
 import ctypes
+import time
 import numpy as np
 import pyds
 from gi.repository import Gst
 
+from .tracks import UNTRACKED_OBJECT_ID
+
 CROP_SCORE_THRESH = 0.10
 MAX_DETECTIONS_PER_FRAME = 100
 
@@ -120,6 +123,16 @@ def pgie_src_pad_buffer_probe(pad, info, perf_mgr):
                             if dets >= MAX_DETECTIONS_PER_FRAME:
                                 break
 
+            if not getattr(fmeta, "bInferDone", True):
+                # Frame pulado pelo interval do nvinfer: mantem a ultima contagem
+                # do stream (o tracker preenche as caixas mais adiante).
+                frame_counts = perf_mgr.stream_counts(stream_key)
+                for label, n in frame_counts.items():
+                    counts_total[label] = counts_total.get(label, 0) + n
+                counts_by_stream[stream_key] = frame_counts
+                l_frame = l_frame.next
+                continue
+
             frame_counts = perf_mgr._init_counts()
             l_obj = fmeta.obj_meta_list
             while l_obj:
@@ -154,3 +167,306 @@ def pgie_src_pad_buffer_probe(pad, info, perf_mgr):
     perf_mgr.update_counts(counts_by_stream, counts_total)
 
     return Gst.PadProbeReturn.OK
+
+
+def _analytics_frame_meta(fmeta):
+    l_user = fmeta.frame_user_meta_list
+    while l_user:
+        try:
+            umeta = pyds.NvDsUserMeta.cast(l_user.data)
+        except StopIteration:
+            break
+        if umeta.base_meta.meta_type == pyds.nvds_get_user_meta_type("NVIDIA.DSANALYTICSFRAME.USER_META"):
+            return pyds.NvDsAnalyticsFrameMeta.cast(umeta.user_meta_data)
+        try:
+            l_user = l_user.next
+        except StopIteration:
+            break
+    return None
+
+
+def _crossings_by_label(fmeta, perf_mgr):
+    """{linha: {label: n}} a partir do lcStatus dos objetos que cruzaram neste frame."""
+    out = {}
+    obj_type = pyds.nvds_get_user_meta_type("NVIDIA.DSANALYTICSOBJ.USER_META")
+    l_obj = fmeta.obj_meta_list
+    while l_obj:
+        try:
+            obj_meta = pyds.NvDsObjectMeta.cast(l_obj.data)
+        except StopIteration:
+            break
+        l_user = obj_meta.obj_user_meta_list
+        while l_user:
+            try:
+                umeta = pyds.NvDsUserMeta.cast(l_user.data)
+            except StopIteration:
+                break
+            if umeta.base_meta.meta_type == obj_type:
+                info = pyds.NvDsAnalyticsObjInfo.cast(umeta.user_meta_data)
+                if info.lcStatus:
+                    label = perf_mgr.label_for_class_id(int(obj_meta.class_id))
+                    for line in info.lcStatus:
+                        per_line = out.setdefault(line, {})
+                        per_line[label] = per_line.get(label, 0) + 1
+            try:
+                l_user = l_user.next
+            except StopIteration:
+                break
+        try:
+            l_obj = l_obj.next
+        except StopIteration:
+            break
+    return out
+
+
+def analytics_src_pad_buffer_probe(pad, info, perf_mgr):
+    """
+    Probe no src do nvdsanalytics: leva NvDsAnalyticsFrameMeta (cruzamentos
+    de linha por frame e acumulados, ocupacao de ROI, overcrowding) e o
+    lcStatus dos objetos para os contadores por stream do PerfManager.
+    """
+    buf = info.get_buffer()
+    if not buf:
+        return Gst.PadProbeReturn.OK
+
+    batch_meta = pyds.gst_buffer_get_nvds_batch_meta(hash(buf))
+    l_frame = batch_meta.frame_meta_list
+    while l_frame:
+        try:
+            fmeta = pyds.NvDsFrameMeta.cast(l_frame.data)
+        except StopIteration:
+            break
+        ameta = _analytics_frame_meta(fmeta)
+        if ameta is not None:
+            lc_curr = dict(ameta.objLCCurrCnt)
+            perf_mgr.update_analytics(
+                perf_mgr.stream_key(fmeta.pad_index),
+                lc_cum=dict(ameta.objLCCumCnt),
+                lc_curr=lc_curr,
+                roi=dict(ameta.objInROIcnt),
+                overcrowding=dict(ameta.ocStatus),
+                lc_by_label=_crossings_by_label(fmeta, perf_mgr) if any(lc_curr.values()) else None,
+            )
+        try:
+            l_frame = l_frame.next
+        except StopIteration:
+            break
+
+    return Gst.PadProbeReturn.OK
+
+
+def zones_src_pad_buffer_probe(pad, info, args):
+    """
+    Probe apos o tracker/nvdsanalytics: boxes de cada frame -> ZoneEngine
+    (ocupacao por zona). source_coords=True quando os objetos vem do caminho
+    Triton cru (adicionados em coordenadas do frame de origem, ver _frame_dims).
+    """
+    engine, perf_mgr, source_coords = args
+    buf = info.get_buffer()
+    if not buf:
+        return Gst.PadProbeReturn.OK
+
+    batch_meta = pyds.gst_buffer_get_nvds_batch_meta(hash(buf))
+    l_frame = batch_meta.frame_meta_list
+    while l_frame:
+        try:
+            fmeta = pyds.NvDsFrameMeta.cast(l_frame.data)
+        except StopIteration:
+            break
+        if fmeta.pad_index in engine.masks:
+            boxes = []
+            class_ids = []
+            l_obj = fmeta.obj_meta_list
+            while l_obj:
+                try:
+                    obj_meta = pyds.NvDsObjectMeta.cast(l_obj.data)
+                except StopIteration:
+                    break
+                r = obj_meta.rect_params
+                boxes.append((r.left, r.top, r.width, r.height))
+                class_ids.append(obj_meta.class_id)
+                try:
+                    l_obj = l_obj.next
+                except StopIteration:
+                    break
+            frame_size = None
+            if source_coords:
+                h, w = _frame_dims(buf, fmeta)
+                frame_size = (w, h)
+            engine.update(perf_mgr.stream_key(fmeta.pad_index), fmeta.pad_index, boxes, class_ids, frame_size)
+        try:
+            l_frame = l_frame.next
+        except StopIteration:
+            break
+
+    return Gst.PadProbeReturn.OK
+
+
+def _obj_analytics_info(obj_meta, obj_type):
+    l_user = obj_meta.obj_user_meta_list
+    while l_user:
+        try:
+            umeta = pyds.NvDsUserMeta.cast(l_user.data)
+        except StopIteration:
+            break
+        if umeta.base_meta.meta_type == obj_type:
+            return pyds.NvDsAnalyticsObjInfo.cast(umeta.user_meta_data)
+        try:
+            l_user = l_user.next
+        except StopIteration:
+            break
+    return None
+
+
+def events_src_pad_buffer_probe(pad, info, args):
+    """
+    Probe no src do nvdsanalytics: deteccoes do frame, cruzamentos de linha
+    (lcStatus) e mudancas de overcrowding -> EventPublisher (nao bloqueia).
+    """
+    publisher, perf_mgr = args
+    buf = info.get_buffer()
+    if not buf:
+        return Gst.PadProbeReturn.OK
+
+    obj_type = pyds.nvds_get_user_meta_type("NVIDIA.DSANALYTICSOBJ.USER_META")
+    batch_meta = pyds.gst_buffer_get_nvds_batch_meta(hash(buf))
+    ts = round(time.time(), 3)
+    l_frame = batch_meta.frame_meta_list
+    while l_frame:
+        try:
+            fmeta = pyds.NvDsFrameMeta.cast(l_frame.data)
+        except StopIteration:
+            break
+        stream_key = perf_mgr.stream_key(fmeta.pad_index)
+        objects = []
+        l_obj = fmeta.obj_meta_list
+        while l_obj:
+            try:
+                obj_meta = pyds.NvDsObjectMeta.cast(l_obj.data)
+            except StopIteration:
+                break
+            r = obj_meta.rect_params
+            track_id = -1 if obj_meta.object_id == UNTRACKED_OBJECT_ID else int(obj_meta.object_id)
+            objects.append(
+                [
+                    int(obj_meta.class_id),
+                    round(float(obj_meta.confidence), 3),
+                    round(r.left, 1),
+                    round(r.top, 1),
+                    round(r.width, 1),
+                    round(r.height, 1),
+                    track_id,
+                ]
+            )
+            ainfo = _obj_analytics_info(obj_meta, obj_type)
+            if ainfo is not None and ainfo.lcStatus:
+                label = perf_mgr.label_for_class_id(int(obj_meta.class_id))
+                for line in ainfo.lcStatus:
+                    publisher.line_crossing(stream_key, ts, line, label, track_id)
+            try:
+                l_obj = l_obj.next
+            except StopIteration:
+                break
+        if objects:
+            publisher.detections(stream_key, ts, int(fmeta.frame_num), objects)
+        ameta = _analytics_frame_meta(fmeta)
+        if ameta is not None and ameta.ocStatus:
+            publisher.overcrowding(stream_key, ts, dict(ameta.ocStatus))
+        try:
+            l_frame = l_frame.next
+        except StopIteration:
+            break
+
+    return Gst.PadProbeReturn.OK
+
+
+def tracker_src_pad_buffer_probe(pad, info, args):
+    """Probe no src do nvtracker: (object_id, label) de cada frame -> TrackCounter."""
+    counter, perf_mgr = args
+    buf = info.get_buffer()
+    if not buf:
+        return Gst.PadProbeReturn.OK
+
+    batch_meta = pyds.gst_buffer_get_nvds_batch_meta(hash(buf))
+    l_frame = batch_meta.frame_meta_list
+    while l_frame:
+        try:
+            fmeta = pyds.NvDsFrameMeta.cast(l_frame.data)
+        except StopIteration:
+            break
+        tracks = []
+        l_obj = fmeta.obj_meta_list
+        while l_obj:
+            try:
+                obj_meta = pyds.NvDsObjectMeta.cast(l_obj.data)
+            except StopIteration:
+                break
+            if obj_meta.object_id != UNTRACKED_OBJECT_ID:
+                tracks.append((obj_meta.object_id, perf_mgr.label_for_class_id(int(obj_meta.class_id))))
+            try:
+                l_obj = l_obj.next
+            except StopIteration:
+                break
+        counter.update(perf_mgr.stream_key(fmeta.pad_index), tracks)
+        try:
+            l_frame = l_frame.next
+        except StopIteration:
+            break
+
+    return Gst.PadProbeReturn.OK
+
+
+def recorder_src_pad_buffer_probe(pad, info, args):
+    """
+    Probe no src do nvdsanalytics: deteccoes de cada frame -> DetectionRecorder.
+    Com source_coords (caminho Triton cru) os boxes sao levados para a
+    resolucao do mux, como os do nvinfer.
+    """
+    recorder, perf_mgr, source_coords = args
+    buf = info.get_buffer()
+    if not buf:
+        return Gst.PadProbeReturn.OK
+
+    mux_w, mux_h = recorder.meta["mux"]
+    batch_meta = pyds.gst_buffer_get_nvds_batch_meta(hash(buf))
+    ts = time.time()
+    l_frame = batch_meta.frame_meta_list
+    while l_frame:
+        try:
+            fmeta = pyds.NvDsFrameMeta.cast(l_frame.data)
+        except StopIteration:
+            break
+        sx = sy = 1.0
+        if source_coords:
+            h, w = _frame_dims(buf, fmeta)
+            sx, sy = mux_w / w, mux_h / h
+        objects = []
+        l_obj = fmeta.obj_meta_list
+        while l_obj:
+            try:
+                obj_meta = pyds.NvDsObjectMeta.cast(l_obj.data)
+            except StopIteration:
+                break
+            r = obj_meta.rect_params
+            objects.append(
+                (
+                    obj_meta.class_id,
+                    obj_meta.confidence,
+                    r.left * sx,
+                    r.top * sy,
+                    r.width * sx,
+                    r.height * sy,
+                    -1 if obj_meta.object_id == UNTRACKED_OBJECT_ID else obj_meta.object_id,
+                )
+            )
+            try:
+                l_obj = l_obj.next
+            except StopIteration:
+                break
+        recorder.add_frame(perf_mgr.stream_key(fmeta.pad_index), ts, fmeta.frame_num, objects, fmeta.pad_index)
+        try:
+            l_frame = l_frame.next
+        except StopIteration:
+            break
+
+    return Gst.PadProbeReturn.OK
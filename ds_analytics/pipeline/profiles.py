@@ -0,0 +1,173 @@
+# ds_analytics/pipeline/profiles.py
+import copy
+import os
+
+import jsonschema
+import yaml
+
+# Valores usados pelo PipelineBuilder quando nenhum perfil e escolhido
+# (os mesmos que antes eram fixos no codigo).
+DEFAULT_TUNING = {
+    "mux": {"width": 640, "height": 480, "batched_push_timeout_us": 33000},
+    "tiler": {"width": 1280, "height": 720},
+    "queues": {
+        "infer": {"buffers": 2, "time_ms": 0, "leaky": 2},
+        "render": {"buffers": 4, "time_ms": 200, "leaky": 2},
+        "encode": {"buffers": 2, "time_ms": 0, "leaky": 2},
+    },
+    "encoder": {
+        "iframeinterval": 30,
+        "preset_level": 1,
+        "control_rate": 1,
+        "tuning_info_id": 2,
+    },
+    "tracker_config": "/app/config/dsnvanalytics_tracker_config.txt",
+    "analytics_config": "/app/config/config_nvdsanalytics.txt",
+}
+
+_QUEUE = {
+    "type": "object",
+    "additionalProperties": False,
+    "properties": {
+        "buffers": {"type": "integer", "minimum": 0},
+        "time_ms": {"type": "number", "minimum": 0},
+        "leaky": {"enum": [0, 1, 2]},
+    },
+}
+
+_SIZE = {
+    "type": "object",
+    "additionalProperties": False,
+    "properties": {
+        "width": {"type": "integer", "minimum": 16},
+        "height": {"type": "integer", "minimum": 16},
+    },
+}
+
+# Opcoes do run.py que um perfil pode definir (a linha de comando ainda vence).
+_RUN = {
+    "type": "object",
+    "additionalProperties": False,
+    "properties": {
+        "layout": {"enum": ["mosaic", "demux", "headless"]},
+        "codec": {"enum": ["H264", "H265"]},
+        "bitrate": {"type": "integer", "minimum": 1},
+        "output": {"enum": ["udp", "appsrc"]},
+        "queue_policy": {"enum": ["bounded", "unbounded"]},
+        "mux_tuning": {"enum": ["off", "observe", "auto"]},
+        "mux_latency_ms": {"type": "number", "exclusiveMinimum": 0},
+        "adaptive_interval": {"type": "boolean"},
+        "interval_min": {"type": "integer", "minimum": 0},
+        "interval_max": {"type": "integer", "minimum": 0},
+        "gate_on_viewers": {"type": "boolean"},
+        "max_sources": {"type": "integer", "minimum": 1},
+        "engine_cache": {"type": "string"},
+        "crops_dir": {"type": "string"},
+        "crop_interval_s": {"type": "number", "minimum": 0},
+        "crop_min_conf": {"type": "number", "minimum": 0, "maximum": 1},
+        "crops_max_mb": {"type": "number", "exclusiveMinimum": 0},
+        "crops_max_age_h": {"type": "number", "exclusiveMinimum": 0},
+        "zones_config": {"type": "string"},
+        "zones_cell": {"type": "integer", "minimum": 1},
+        "events_url": {"type": "string"},
+        "events_batch": {"type": "integer", "minimum": 1},
+        "events_linger_ms": {"type": "number", "minimum": 0},
+        "events_queue": {"type": "integer", "minimum": 1},
+        "record": {"type": "string"},
+    },
+}
+
+PROFILE_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "properties": {
+        "description": {"type": "string"},
+        "run": _RUN,
+        "mux": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                **_SIZE["properties"],
+                "batched_push_timeout_us": {"type": "integer", "minimum": 0},
+            },
+        },
+        "tiler": _SIZE,
+        "queues": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {"infer": _QUEUE, "render": _QUEUE, "encode": _QUEUE},
+        },
+        "encoder": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "iframeinterval": {"type": "integer", "minimum": 1},
+                "preset_level": {"type": "integer", "minimum": 0, "maximum": 4},
+                "control_rate": {"type": "integer", "minimum": 0, "maximum": 2},
+                "tuning_info_id": {"type": "integer", "minimum": 1, "maximum": 4},
+            },
+        },
+        "tracker_config": {"type": "string", "minLength": 1},
+        "analytics_config": {"type": "string", "minLength": 1},
+    },
+}
+
+CONFIG_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["profiles"],
+    "properties": {
+        "version": {"const": 1},
+        "profiles": {
+            "type": "object",
+            "minProperties": 1,
+            "additionalProperties": PROFILE_SCHEMA,
+        },
+    },
+}
+
+
+def _merge(base: dict, over: dict):
+    out = copy.deepcopy(base)
+    for k, v in over.items():
+        if isinstance(v, dict) and isinstance(out.get(k), dict):
+            out[k] = _merge(out[k], v)
+        else:
+            out[k] = copy.deepcopy(v)
+    return out
+
+
+def load_config(path: str):
+    """Le e valida o YAML de perfis (ValueError com o caminho do campo invalido)."""
+    with open(path, "r", encoding="utf-8") as f:
+        doc = yaml.safe_load(f) or {}
+    try:
+        jsonschema.validate(doc, CONFIG_SCHEMA)
+    except jsonschema.ValidationError as exc:
+        where = "/".join(str(p) for p in exc.absolute_path) or "<raiz>"
+        raise ValueError(f"{path}: {where}: {exc.message}") from None
+    return doc
+
+
+def load_profile(path: str, name: str, check_paths: bool = True):
+    """
+    Perfil `name` de `path` mesclado sobre DEFAULT_TUNING.
+    Devolve (run, tuning): `run` sao defaults para o argparse do run.py e
+    `tuning` vai para PipelineBuilder(tuning=...).
+    """
+    doc = load_config(path)
+    profiles = doc["profiles"]
+    if name not in profiles:
+        raise ValueError(f"{path}: perfil '{name}' nao existe (disponiveis: {', '.join(sorted(profiles))})")
+    prof = dict(profiles[name])
+    run = prof.pop("run", {})
+    prof.pop("description", None)
+    tuning = _merge(DEFAULT_TUNING, prof)
+
+    if run.get("interval_min", 0) > run.get("interval_max", run.get("interval_min", 0)):
+        raise ValueError(f"{path}: {name}: interval_min > interval_max")
+    if check_paths:
+        for key in ("tracker_config", "analytics_config"):
+            if not os.path.isfile(tuning[key]):
+                raise ValueError(f"{path}: {name}: {key} nao encontrado: {tuning[key]}")
+    return run, tuning
@@ -0,0 +1,272 @@
+# ds_analytics/pipeline/recorder.py
+import json
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+MAGIC = b"DSREC001"
+_FILE_HEADER = struct.Struct("<8sII")  # magic, chunk_rows, reservado
+_CHUNK_HEADER = struct.Struct("<II")  # linhas validas, reservado
+_INDEX_ENTRY = struct.Struct("<qq")  # segundo, primeiro registro
+
+# Registro de largura fixa (44 bytes). class_id = -1 marca frame sem deteccoes.
+FIELDS = (
+    ("ts", np.float64),
+    ("track_id", np.int64),
+    ("frame", np.uint32),
+    ("conf", np.float32),
+    ("left", np.float32),
+    ("top", np.float32),
+    ("width", np.float32),
+    ("height", np.float32),
+    ("stream", np.uint16),
+    ("class_id", np.int16),
+)
+EMPTY_FRAME = -1
+
+
+def _chunk_bytes(chunk_rows: int):
+    return _CHUNK_HEADER.size + sum(np.dtype(dt).itemsize for _, dt in FIELDS) * chunk_rows
+
+
+class DetectionRecorder:
+    """
+    Deteccoes de cada frame em arquivo colunar mapeavel (<path>):
+      - cabecalho + chunks de chunk_rows registros; dentro do chunk cada
+        campo de FIELDS e um array contiguo (leitura por coluna via mmap)
+      - <path>.idx: (segundo, primeiro registro) a cada segundo novo,
+        entradas de 16 bytes para busca por horario
+      - <path>.meta.json: nomes dos streams (stream = indice), pad do mux
+        de cada um, labels e a resolucao do mux (boxes em coordenadas do mux)
+    O chunk em andamento fica em memoria e vai para o disco cheio ou no
+    flush()/close(); chunks parciais sao validos (linhas validas no header).
+    Reabrir um arquivo existente continua a gravacao (um chunk incompleto de
+    uma gravacao interrompida e descartado).
+    """
+
+    def __init__(self, path: str, labels: list | None = None, mux_size=(640, 480), chunk_rows: int = 4096):
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows deve ser >= 1")
+        self.path = path
+        self.chunk_rows = int(chunk_rows)
+        self.meta_path = path + ".meta.json"
+        self._lock = threading.Lock()
+        self._cols = {name: np.zeros(self.chunk_rows, dtype=dt) for name, dt in FIELDS}
+        self._n = 0
+        self._written = 0
+        self._last_sec = None
+        self._bytes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        meta = {"version": 1, "streams": [], "pads": {}, "labels": list(labels or []), "mux": list(mux_size)}
+        if os.path.exists(path):
+            reader = DetectionReader(path)
+            if reader.chunk_rows != self.chunk_rows:
+                raise ValueError(f"{path}: chunk_rows {reader.chunk_rows} != {self.chunk_rows}")
+            meta["streams"] = reader.meta.get("streams", [])
+            meta["pads"] = reader.meta.get("pads", {})
+            self._written = reader.n
+            valid = _FILE_HEADER.size + len(reader._chunks) * _chunk_bytes(self.chunk_rows)
+            index = reader._index.copy()
+            reader.close()
+            self._f = open(path, "ab")
+            self._f.truncate(valid)
+            with open(path + ".idx", "wb") as f:
+                f.write(index.tobytes())
+            if len(index):
+                self._last_sec = int(index[-1, 0])
+        else:
+            self._f = open(path, "wb")
+            self._f.write(_FILE_HEADER.pack(MAGIC, self.chunk_rows, 0))
+            open(path + ".idx", "wb").close()
+        self._idx = open(path + ".idx", "ab")
+        self.meta = meta
+        self._stream_ids = {name: i for i, name in enumerate(meta["streams"])}
+        self._write_meta()
+
+    def _write_meta(self):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.meta_path)
+
+    def _stream_id(self, stream_key: str, pad_index: int | None):
+        sid = self._stream_ids.get(stream_key)
+        if sid is None:
+            sid = self._stream_ids[stream_key] = len(self.meta["streams"])
+            self.meta["streams"].append(stream_key)
+            if pad_index is not None:
+                self.meta["pads"][stream_key] = int(pad_index)
+            self._write_meta()
+        return sid
+
+    def add_frame(self, stream_key: str, ts: float, frame_num: int, objects, pad_index: int | None = None):
+        """objects: iteravel de (class_id, conf, left, top, width, height, track_id)."""
+        with self._lock:
+            sid = self._stream_id(stream_key, pad_index)
+            sec = int(ts)
+            if sec != self._last_sec:
+                self._last_sec = sec
+                self._idx.write(_INDEX_ENTRY.pack(sec, self._written + self._n))
+            rows = list(objects) or [(EMPTY_FRAME, 0.0, 0.0, 0.0, 0.0, 0.0, -1)]
+            cols = self._cols
+            for class_id, conf, left, top, width, height, track_id in rows:
+                i = self._n
+                cols["ts"][i] = ts
+                cols["stream"][i] = sid
+                cols["frame"][i] = frame_num
+                cols["class_id"][i] = class_id
+                cols["conf"][i] = conf
+                cols["left"][i] = left
+                cols["top"][i] = top
+                cols["width"][i] = width
+                cols["height"][i] = height
+                cols["track_id"][i] = track_id
+                self._n += 1
+                if self._n == self.chunk_rows:
+                    self._write_chunk()
+
+    def _write_chunk(self):
+        if self._n == 0:
+            return
+        self._f.write(_CHUNK_HEADER.pack(self._n, 0))
+        for name, _ in FIELDS:
+            # chunk sempre com chunk_rows linhas por coluna (offsets fixos)
+            self._f.write(self._cols[name].tobytes())
+        self._bytes += _chunk_bytes(self.chunk_rows)
+        self._written += self._n
+        self._n = 0
+        self._f.flush()
+        self._idx.flush()
+
+    def flush(self):
+        with self._lock:
+            self._write_chunk()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "records": self._written + self._n,
+                "buffered": self._n,
+                "bytes_written": self._bytes,
+                "streams": len(self.meta["streams"]),
+            }
+
+    def close(self):
+        with self._lock:
+            self._write_chunk()
+            self._f.close()
+            self._idx.close()
+
+
+class DetectionReader:
+    """Leitura por mmap do arquivo do DetectionRecorder (sem copiar ate pedir colunas)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path + ".meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._f = open(path, "rb")
+        size = os.fstat(self._f.fileno()).st_size
+        if size < _FILE_HEADER.size:
+            raise ValueError(f"{path}: arquivo truncado")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.chunk_rows, _ = _FILE_HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: nao e um arquivo {MAGIC.decode()}")
+        step = _chunk_bytes(self.chunk_rows)
+        # chunk incompleto no fim (gravacao interrompida) e ignorado
+        self._chunks = []
+        off = _FILE_HEADER.size
+        while off + step <= size:
+            (n, _) = _CHUNK_HEADER.unpack_from(self._mm, off)
+            self._chunks.append((off, n))
+            off += step
+        self._starts = np.cumsum([0] + [n for _, n in self._chunks])
+        self.n = int(self._starts[-1])
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            raw = open(self.path + ".idx", "rb").read()
+        except OSError:
+            return np.zeros((0, 2), dtype=np.int64)
+        raw = raw[: len(raw) - len(raw) % _INDEX_ENTRY.size]
+        idx = np.frombuffer(raw, dtype=np.int64).reshape(-1, 2)
+        return idx[idx[:, 1] < self.n]
+
+    def _chunk_column(self, chunk: int, name: str):
+        off, n = self._chunks[chunk]
+        col_off = off + _CHUNK_HEADER.size
+        for fname, dt in FIELDS:
+            if fname == name:
+                return np.frombuffer(self._mm, dtype=dt, count=n, offset=col_off)
+            col_off += np.dtype(dt).itemsize * self.chunk_rows
+        raise KeyError(name)
+
+    def columns(self, start: int = 0, stop: int | None = None, names=None):
+        """{campo: array} dos registros [start, stop)."""
+        stop = self.n if stop is None else min(stop, self.n)
+        names = list(names or [name for name, _ in FIELDS])
+        out = {name: [] for name in names}
+        first = int(np.searchsorted(self._starts, start, side="right")) - 1
+        for c in range(max(0, first), len(self._chunks)):
+            base = int(self._starts[c])
+            if base >= stop:
+                break
+            lo, hi = max(start - base, 0), min(stop - base, self._chunks[c][1])
+            for name in names:
+                out[name].append(self._chunk_column(c, name)[lo:hi])
+        return {
+            name: np.concatenate(parts) if parts else np.zeros(0, dtype=dict(FIELDS)[name])
+            for name, parts in out.items()
+        }
+
+    def seconds(self):
+        """(segundo inicial, segundo final) gravados, ou None."""
+        if not len(self._index):
+            return None
+        return int(self._index[0, 0]), int(self._index[-1, 0])
+
+    def record_at(self, t: float):
+        """Primeiro registro do segundo int(t) (ou do seguinte gravado)."""
+        i = int(np.searchsorted(self._index[:, 0], int(t), side="left"))
+        if i >= len(self._index):
+            return self.n
+        return int(self._index[i, 1])
+
+    def frames(self, start: int = 0, stop: int | None = None, block: int = 65536):
+        """
+        Gera (stream, ts, frame, cols) por frame, onde cols e o dict de
+        arrays dos registros do frame (vazio se o frame nao tinha deteccoes).
+        """
+        stop = self.n if stop is None else min(stop, self.n)
+        streams = self.meta.get("streams", [])
+        pending = None
+        pos = start
+        while pos < stop:
+            cols = self.columns(pos, min(stop, pos + block))
+            if pending is not None:
+                cols = {k: np.concatenate([pending[k], v]) for k, v in cols.items()}
+            pos = min(stop, pos + block)
+            key = cols["stream"].astype(np.int64) << 32 | cols["frame"].astype(np.int64)
+            cuts = np.flatnonzero(key[1:] != key[:-1]) + 1
+            bounds = [0, *cuts.tolist(), len(key)]
+            # o ultimo frame pode continuar no proximo bloco
+            last = len(bounds) - 2 if pos < stop else len(bounds) - 1
+            for a, b in zip(bounds[:last], bounds[1:last + 1]):
+                sl = {k: v[a:b] for k, v in cols.items()}
+                sid = int(sl["stream"][0])
+                if sl["class_id"][0] == EMPTY_FRAME:
+                    sl = {k: v[:0] for k, v in sl.items()}
+                name = streams[sid] if sid < len(streams) else f"stream{sid}"
+                yield name, float(cols["ts"][a]), int(cols["frame"][a]), sl
+            pending = {k: v[bounds[last]:] for k, v in cols.items()} if pos < stop else None
+
+    def close(self):
+        self._mm.close()
+        self._f.close()
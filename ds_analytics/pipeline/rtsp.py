@@ -1,4 +1,5 @@
 # ds_analytics/pipeline/rtsp.py
+import threading
 import gi
 
 gi.require_version("Gst", "1.0")
@@ -6,6 +7,124 @@ gi.require_version("GstRtspServer", "1.0")
 from gi.repository import Gst, GstRtspServer
 
 
+class AppSrcBridge:
+    """
+    Ponte intra-processo appsink -> appsrc: o H.264/H.265 sai do encoder do
+    pipeline principal (appsink) e entra direto em cada media do RTSP server
+    (appsrc), sem RTP/UDP de loopback nem rtpjitterbuffer.
+    """
+
+    def __init__(self, codec: str = "H264"):
+        self.codec = codec.upper()
+        self.caps = None
+        self._clients = []  # [appsrc, base_pts | None]
+        self._lock = threading.Lock()
+
+    def attach(self, appsink):
+        appsink.set_property("emit-signals", True)
+        appsink.connect("new-sample", self._on_new_sample)
+
+    def launch(self, payload: int = 96):
+        parse = "h264parse" if self.codec == "H264" else "h265parse"
+        pay = "rtph264pay" if self.codec == "H264" else "rtph265pay"
+        return (
+            "( appsrc name=src is-live=true format=time do-timestamp=false "
+            "max-bytes=4194304 block=false "
+            f"! {parse} ! {pay} name=pay0 pt={payload} config-interval=1 )"
+        )
+
+    def on_media_configure(self, factory, media):
+        appsrc = media.get_element().get_child_by_name("src")
+        if appsrc is None:
+            return
+        if self.caps is not None:
+            appsrc.set_property("caps", self.caps)
+        entry = [appsrc, None]
+        with self._lock:
+            self._clients.append(entry)
+        media.connect("unprepared", self._on_media_unprepared, entry)
+
+    def _on_media_unprepared(self, media, entry):
+        with self._lock:
+            if entry in self._clients:
+                self._clients.remove(entry)
+
+    def _on_new_sample(self, appsink):
+        sample = appsink.emit("pull-sample")
+        if sample is None:
+            return Gst.FlowReturn.OK
+        if self.caps is None:
+            self.caps = sample.get_caps()
+        with self._lock:
+            clients = list(self._clients)
+        if not clients:
+            return Gst.FlowReturn.OK
+        buf = sample.get_buffer()
+        is_delta = buf.has_flags(Gst.BufferFlags.DELTA_UNIT)
+        for entry in clients:
+            appsrc, base = entry
+            if base is None:
+                # Cada media nova comeca num keyframe, com PTS a partir de 0.
+                if is_delta:
+                    continue
+                base = entry[1] = buf.pts
+                if appsrc.get_property("caps") is None:
+                    appsrc.set_property("caps", self.caps)
+            out = buf.copy()
+            out.pts = buf.pts - base
+            out.dts = Gst.CLOCK_TIME_NONE
+            appsrc.emit("push-buffer", out)
+        return Gst.FlowReturn.OK
+
+
+def _track_viewers(server, on_viewers):
+    """Chama on_viewers(n) sempre que um cliente RTSP conecta ou fecha."""
+    clients = set()
+
+    def _on_closed(client):
+        clients.discard(id(client))
+        on_viewers(len(clients))
+
+    def _on_connected(_server, client):
+        clients.add(id(client))
+        client.connect("closed", _on_closed)
+        on_viewers(len(clients))
+
+    server.connect("client-connected", _on_connected)
+
+
+def _add_bridge_factory(mounts, mount: str, bridge: AppSrcBridge, payload: int):
+    factory = GstRtspServer.RTSPMediaFactory.new()
+    factory.set_shared(True)
+    factory.set_launch(bridge.launch(payload))
+    factory.connect("media-configure", bridge.on_media_configure)
+    mounts.add_factory(mount, factory)
+
+
+def start_rtsp_server_multi(
+    bridges: dict,
+    port: str = "9000",
+    payload: int = 96,
+    on_viewers=None,
+):
+    """Um RTSP server com um mount por ponte ({mount: AppSrcBridge})."""
+    Gst.init(None)
+
+    server = GstRtspServer.RTSPServer.new()
+    server.set_service(str(port))
+    if on_viewers is not None:
+        _track_viewers(server, on_viewers)
+
+    mounts = server.get_mount_points()
+    for mount, bridge in bridges.items():
+        _add_bridge_factory(mounts, mount, bridge, payload)
+    server.attach(None)
+
+    for mount in bridges:
+        print(f"*** RTSP at rtsp://localhost:{port}{mount} (in-process appsrc) ***")
+    return server
+
+
 def start_rtsp_server(
     codec: str = "H264",
     port: str = "9000",
@@ -14,13 +133,28 @@ def start_rtsp_server(
     payload: int = 96,
     clock_rate: int = 90000,
     jitter_latency_ms: int = 100,
+    bridge: AppSrcBridge | None = None,
+    on_viewers=None,
 ):
     Gst.init(None)
 
     server = GstRtspServer.RTSPServer.new()
     server.set_service(str(port))
+    if on_viewers is not None:
+        _track_viewers(server, on_viewers)
 
     mounts = server.get_mount_points()
+
+    if bridge is not None:
+        # Alimentado direto pelo pipeline principal (sem UDP de loopback).
+        _add_bridge_factory(mounts, mount, bridge, payload)
+        server.attach(None)
+        print(
+            f"\n*** RTSP at rtsp://localhost:{port}{mount} "
+            f"(in-process appsrc {bridge.codec}, served PT={payload}) ***\n"
+        )
+        return server
+
     factory = GstRtspServer.RTSPMediaFactory.new()
     factory.set_shared(True)
 
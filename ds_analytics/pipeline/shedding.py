@@ -0,0 +1,100 @@
+# ds_analytics/pipeline/shedding.py
+import time
+
+# Politicas de fila usadas por PipelineBuilder._q:
+#   buffers/time_ns: limites (0 = sem limite); leaky: 0 nao, 1 upstream
+#   (descarta o que chega), 2 downstream (descarta o mais antigo).
+QUEUE_POLICIES = {
+    # comportamento original: fila sem limite, nunca descarta
+    "unbounded": {"buffers": 0, "time_ns": 0, "leaky": 0},
+    # antes do nvinfer: no maximo 2 batches esperando, descarta o mais antigo
+    "infer": {"buffers": 2, "time_ns": 0, "leaky": 2},
+    # ramo de render (tiler/osd/conv): poucos frames, descarta o mais antigo
+    "render": {"buffers": 4, "time_ns": 200_000_000, "leaky": 2},
+    # entrada do encoder: latencia minima
+    "encode": {"buffers": 2, "time_ns": 0, "leaky": 2},
+}
+
+
+class LoadShedder:
+    """
+    Amostra as filas limitadas (current-level-buffers/-time), conta descartes
+    (sinal overrun das filas leaky) e deriva o estado de carga:
+      ok -> saturated (fila acima de high_water ou descartando)
+         -> shedding (saturada por sustain_s seguidos)
+    e volta a ok apos sustain_s sem saturacao. Publica em PerfManager.
+    """
+
+    def __init__(self, perf, interval_ms: int = 500, high_water: float = 0.8, sustain_s: float = 5.0):
+        self.perf = perf
+        self.interval_ms = int(interval_ms)
+        self.high_water = float(high_water)
+        self.sustain_s = float(sustain_s)
+        self.state = "ok"
+        self._queues = {}
+        self._high_since = None
+        self._low_since = None
+
+    def watch(self, queue, policy: str, limits: dict | None = None):
+        # limits: {buffers, time_ns, leaky} efetivos da fila (perfil), senao a politica padrao
+        pol = limits or QUEUE_POLICIES[policy]
+        entry = {"queue": queue, "policy": policy, "drops": 0, "last_drops": 0, **pol}
+        self._queues[queue.get_name()] = entry
+        if pol["leaky"]:
+            queue.connect("overrun", self._on_overrun, entry)
+
+    @staticmethod
+    def _on_overrun(queue, entry):
+        # Em fila leaky, cada overrun corresponde a um buffer descartado.
+        entry["drops"] += 1
+
+    def sample(self):
+        now = time.monotonic()
+        queues = {}
+        saturated = False
+        total_drops = 0
+        for name, e in self._queues.items():
+            q = e["queue"]
+            level = q.get_property("current-level-buffers")
+            level_ns = q.get_property("current-level-time")
+            fill = 0.0
+            if e["buffers"]:
+                fill = max(fill, level / e["buffers"])
+            if e["time_ns"]:
+                fill = max(fill, level_ns / e["time_ns"])
+            drops = e["drops"]
+            new_drops = drops - e["last_drops"]
+            e["last_drops"] = drops
+            total_drops += drops
+            if fill >= self.high_water or new_drops > 0:
+                saturated = True
+            queues[name] = {
+                "policy": e["policy"],
+                "level_buffers": level,
+                "level_ms": round(level_ns / 1e6, 1),
+                "fill": round(fill, 2),
+                "drops": drops,
+                "drops_interval": new_drops,
+            }
+
+        if saturated:
+            self._low_since = None
+            if self._high_since is None:
+                self._high_since = now
+            if now - self._high_since >= self.sustain_s:
+                self.state = "shedding"
+            elif self.state == "ok":
+                self.state = "saturated"
+        else:
+            self._high_since = None
+            if self.state != "ok":
+                if self._low_since is None:
+                    self._low_since = now
+                if now - self._low_since >= self.sustain_s:
+                    self.state = "ok"
+                    self._low_since = None
+
+        self.perf.update_load(self.state, queues)
+        self.perf.set_csv_field("shedding", 1 if self.state == "shedding" else 0)
+        self.perf.set_csv_field("queue_drops", total_drops)
+        return True
@@ -0,0 +1,260 @@
+# ds_analytics/pipeline/sources.py
+import collections
+import math
+import threading
+import time
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst, GLib
+
+from .nodes import SOURCE_TIERS, apply_source_tier, create_source_bin
+
+
+class SourceManager:
+    """
+    Liga/desliga source bins no nvstreammux com o pipeline em PLAYING.
+
+    Cada camera ocupa um slot (= pad_index no nvstreammux, sink_<slot>) ate
+    max_sources. Alteracoes no grafo devem rodar no main loop do GLib; a
+    partir de outras threads (HTTP) use run_sync().
+    on_remove: callables(stream_key) chamados em remove() para liberar o
+    estado por stream fora do PerfManager (tracks, crops, zonas).
+    """
+
+    def __init__(
+        self,
+        pipeline,
+        mux,
+        perf,
+        max_sources: int,
+        tiler=None,
+        tiers: dict | None = None,
+        on_remove=None,
+    ):
+        self.pipeline = pipeline
+        # tier default por nome do stream ou URI (ver nodes.SOURCE_TIERS)
+        self.tiers = dict(tiers or {})
+        self.mux = mux
+        self.perf = perf
+        self.max_sources = int(max_sources)
+        self.tiler = tiler
+        self.on_remove = list(on_remove or [])
+        self._slots = {}
+        # bins desmontados por detach(): erros ainda na fila do bus chegam
+        # deles depois do teardown (ver retired_slot_for_element)
+        self._retired = collections.deque(maxlen=4 * self.max_sources)
+        self._lock = threading.Lock()
+
+    def _free_slot(self):
+        for i in range(self.max_sources):
+            if i not in self._slots:
+                return i
+        raise RuntimeError(f"Limite de {self.max_sources} sources atingido")
+
+    def _find(self, key):
+        """Aceita slot (int ou str numerica) ou nome do stream."""
+        with self._lock:
+            for idx, info in self._slots.items():
+                if str(idx) == str(key) or info["name"] == key:
+                    return idx
+        raise KeyError(f"Source '{key}' nao encontrada")
+
+    def add(self, uri: str, name: str | None = None, index: int | None = None, tier: str | None = None):
+        idx = self._free_slot() if index is None else int(index)
+        if idx in self._slots:
+            raise ValueError(f"Slot {idx} ja esta em uso")
+        if not 0 <= idx < self.max_sources:
+            raise ValueError(f"Slot {idx} fora do batch (max {self.max_sources})")
+        with self._lock:
+            taken = {s["name"] for s in self._slots.values()}
+        if name and name in taken:
+            raise ValueError(f"Nome '{name}' ja esta em uso")
+
+        tier = tier or self.tiers.get(name) or self.tiers.get(uri) or "high"
+        if tier not in SOURCE_TIERS:
+            raise ValueError(f"tier deve ser um de {sorted(SOURCE_TIERS)}")
+
+        key = self.perf.add_stream(idx, name)
+        info = {
+            "index": idx,
+            "name": key,
+            "uri": uri,
+            "tier": tier,
+            "bin": None,
+            "added_at": time.time(),
+        }
+        with self._lock:
+            self._slots[idx] = info
+        try:
+            self.attach(idx)
+        except Exception:
+            with self._lock:
+                self._slots.pop(idx, None)
+            self.perf.remove_stream(idx)
+            raise
+        self._update_tiler()
+        return self._public(info)
+
+    def remove(self, key):
+        idx = self._find(key)
+        self.detach(idx)
+        with self._lock:
+            info = self._slots.pop(idx)
+        key = self.perf.remove_stream(idx)
+        for callback in self.on_remove:
+            callback(key)
+        self._update_tiler()
+        return self._public(info)
+
+    def attach(self, idx: int):
+        """Cria o source bin do slot e liga no sink_<idx> do nvstreammux."""
+        info = self._slots[idx]
+        if info["bin"] is not None:
+            return info["bin"]
+        uri = info["uri"]
+        src_bin = create_source_bin(idx, uri, tier=info["tier"])
+        self.pipeline.add(src_bin)
+        sinkpad = self.mux.get_static_pad(f"sink_{idx}") or self.mux.request_pad_simple(f"sink_{idx}")
+        srcpad = src_bin.get_static_pad("src")
+        if not srcpad or not sinkpad:
+            self.pipeline.remove(src_bin)
+            raise RuntimeError(f"Falha criando pads para source {idx} ({uri})")
+        if srcpad.link(sinkpad) != Gst.PadLinkReturn.OK:
+            self.pipeline.remove(src_bin)
+            raise RuntimeError(f"Falha linkando source {idx} no nvstreammux")
+        info["bin"] = src_bin
+
+        _, state, _ = self.pipeline.get_state(0)
+        if state in (Gst.State.PAUSED, Gst.State.PLAYING):
+            src_bin.sync_state_with_parent()
+        return src_bin
+
+    def detach(self, idx: int):
+        """Desmonta o source bin do slot; o slot (nome/URI) continua reservado."""
+        info = self._slots[idx]
+        src_bin = info["bin"]
+        if src_bin is None:
+            return
+        info["bin"] = None
+        with self._lock:
+            self._retired.append((src_bin, idx))
+        src_bin.set_state(Gst.State.NULL)
+        sinkpad = self.mux.get_static_pad(f"sink_{idx}")
+        if sinkpad is not None:
+            srcpad = src_bin.get_static_pad("src")
+            if srcpad is not None:
+                srcpad.unlink(sinkpad)
+            sinkpad.send_event(Gst.Event.new_flush_stop(False))
+            self.mux.release_request_pad(sinkpad)
+        self.pipeline.remove(src_bin)
+
+    def set_tier(self, key, tier: str):
+        """
+        Troca o tier de um source em runtime. Se o decoder nao aceitar a
+        mudanca em PLAYING, o bin e recriado (reconexao rapida so deste source).
+        """
+        if tier not in SOURCE_TIERS:
+            raise ValueError(f"tier deve ser um de {sorted(SOURCE_TIERS)}")
+        idx = self._find(key)
+        info = self._slots[idx]
+        info["tier"] = tier
+        if info["bin"] is not None and not apply_source_tier(info["bin"], tier):
+            self.detach(idx)
+            self.attach(idx)
+        return self._public(info)
+
+    def stream_info(self):
+        """{stream: {slot, tier, attached}} para o /metrics."""
+        with self._lock:
+            return {
+                info["name"]: {
+                    "slot": idx,
+                    "tier": info["tier"],
+                    "attached": info["bin"] is not None,
+                }
+                for idx, info in sorted(self._slots.items())
+            }
+
+    def slot_for_element(self, elem):
+        """Slot cujo source bin contem `elem` (ou None)."""
+        while elem is not None:
+            with self._lock:
+                for idx, info in self._slots.items():
+                    if info["bin"] is not None and info["bin"] is elem:
+                        return idx
+            elem = elem.get_parent()
+        return None
+
+    def retired_slot_for_element(self, elem):
+        """
+        Slot de um bin ja desmontado que contem `elem` (ou None). Um bin fora
+        do pipeline nao tem pai, entao a raiz de `elem` identifica o bin.
+        """
+        root = elem
+        while root is not None and root.get_parent() is not None:
+            root = root.get_parent()
+        if root is None or root is self.pipeline:
+            return None
+        with self._lock:
+            for src_bin, idx in reversed(self._retired):
+                if src_bin is root:
+                    return idx
+        # bin que saiu do historico: ainda e um source-bin fora do pipeline
+        name = root.get_name() or ""
+        if name.startswith("source-bin-"):
+            try:
+                return int(name[len("source-bin-"):])
+            except ValueError:
+                return None
+        return None
+
+    def get(self, idx: int):
+        with self._lock:
+            info = self._slots.get(idx)
+            return self._public(info) if info else None
+
+    def slots(self):
+        with self._lock:
+            return sorted(self._slots)
+
+    def _update_tiler(self):
+        if self.tiler is None:
+            return
+        # O tiler posiciona por pad_index: a grade cobre o maior slot em uso.
+        n = max(self._slots) + 1 if self._slots else 1
+        rows = int(math.ceil(math.sqrt(n)))
+        cols = int(math.ceil(n / rows))
+        self.tiler.set_property("rows", rows)
+        self.tiler.set_property("columns", cols)
+
+    @staticmethod
+    def _public(info):
+        out = {k: v for k, v in info.items() if k != "bin"}
+        out["attached"] = info["bin"] is not None
+        return out
+
+    def list(self):
+        with self._lock:
+            return [self._public(self._slots[i]) for i in sorted(self._slots)]
+
+    def run_sync(self, fn, *args, timeout: float = 10.0, **kwargs):
+        """Executa fn no main loop e devolve o resultado (ou relanca o erro)."""
+        done = threading.Event()
+        result = {}
+
+        def _call():
+            try:
+                result["value"] = fn(*args, **kwargs)
+            except Exception as exc:
+                result["error"] = exc
+            done.set()
+            return False
+
+        GLib.idle_add(_call)
+        if not done.wait(timeout):
+            raise TimeoutError("Main loop nao respondeu")
+        if "error" in result:
+            raise result["error"]
+        return result["value"]
@@ -0,0 +1,144 @@
+# ds_analytics/pipeline/supervisor.py
+import sys
+import time
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst, GLib
+
+from common.bus_call import bus_call
+
+
+class SourceSupervisor:
+    """
+    Watchdog por source. Erros no bus vindos de um source bin e falta de
+    frames (nenhum on_frame por starve_s) reconstroem apenas aquele bin, com
+    backoff exponencial; os demais streams do batch continuam rodando.
+    Erros de um bin ja desmontado (um source costuma postar varios: rtspsrc,
+    depois decodebin) e erros durante "reconnecting" sao so registrados.
+    Erros de outros elementos seguem para o bus_call padrao (encerra o loop).
+    """
+
+    def __init__(
+        self,
+        sources,
+        perf,
+        starve_s: float = 10.0,
+        backoff_base_s: float = 1.0,
+        backoff_max_s: float = 60.0,
+        healthy_s: float = 30.0,
+        check_ms: int = 1000,
+    ):
+        self.sources = sources
+        self.perf = perf
+        self.starve_s = float(starve_s)
+        self.backoff_base_s = float(backoff_base_s)
+        self.backoff_max_s = float(backoff_max_s)
+        self.healthy_s = float(healthy_s)
+        self.check_ms = int(check_ms)
+        self._health = {}
+
+    def start(self):
+        GLib.timeout_add(self.check_ms, self._check)
+
+    def _state(self, idx: int):
+        h = self._health.get(idx)
+        if h is None:
+            h = self._health[idx] = {
+                "state": "running",
+                "reconnects": 0,
+                "downtime_s": 0.0,
+                "last_error": None,
+                "attempts": 0,
+                "attached_at": time.monotonic(),
+                "down_since": None,
+            }
+        return h
+
+    def bus_call(self, bus, message, loop):
+        if message.type == Gst.MessageType.ERROR:
+            idx = self.sources.slot_for_element(message.src)
+            if idx is not None:
+                err, debug = message.parse_error()
+                sys.stderr.write("Source %d error: %s: %s\n" % (idx, err, debug))
+                if self._state(idx)["state"] != "reconnecting":
+                    self._restart(idx, f"error: {err.message}")
+                return True
+            idx = self.sources.retired_slot_for_element(message.src)
+            if idx is not None:
+                err, _ = message.parse_error()
+                sys.stderr.write("Source %d error (bin ja desmontado, ignorado): %s\n" % (idx, err))
+                return True
+        return bus_call(bus, message, loop)
+
+    def _restart(self, idx: int, reason: str):
+        h = self._state(idx)
+        if h["state"] == "reconnecting":
+            return
+        now = time.monotonic()
+        h["state"] = "reconnecting"
+        h["last_error"] = reason
+        h["reconnects"] += 1
+        if h["down_since"] is None:
+            h["down_since"] = now
+        delay = min(self.backoff_max_s, self.backoff_base_s * (2 ** h["attempts"]))
+        h["attempts"] += 1
+        self.sources.detach(idx)
+        print(f">> Source {idx} ({reason}) -> reconectando em {delay:.1f}s")
+        GLib.timeout_add(int(delay * 1000), self._reattach, idx)
+
+    def _reattach(self, idx: int):
+        h = self._state(idx)
+        if self.sources.get(idx) is None:
+            # removido via API durante o backoff
+            self._health.pop(idx, None)
+            return False
+        h["state"] = "running"
+        h["attached_at"] = time.monotonic()
+        try:
+            self.sources.attach(idx)
+        except Exception as exc:
+            self._restart(idx, f"attach: {exc}")
+        return False
+
+    def _check(self):
+        now = time.monotonic()
+        active = self.sources.slots()
+        for idx in list(self._health):
+            if idx not in active:
+                self._health.pop(idx)
+        for idx in active:
+            h = self._state(idx)
+            if h["state"] != "running":
+                continue
+            info = self.sources.get(idx)
+            last = self.perf.last_frame_at.get(info["name"], 0.0)
+            if last > h["attached_at"]:
+                if h["down_since"] is not None:
+                    h["downtime_s"] += last - h["down_since"]
+                    h["down_since"] = None
+                if h["attempts"] and now - h["attached_at"] > self.healthy_s:
+                    h["attempts"] = 0
+            if now - max(last, h["attached_at"]) > self.starve_s:
+                self._restart(idx, "starvation")
+        return True
+
+    def health(self):
+        """Estado por stream para o /metrics (downtime inclui a queda atual)."""
+        now = time.monotonic()
+        out = {}
+        for idx, h in list(self._health.items()):
+            info = self.sources.get(idx)
+            if info is None:
+                continue
+            downtime = h["downtime_s"]
+            if h["down_since"] is not None:
+                downtime += now - h["down_since"]
+            out[info["name"]] = {
+                "state": h["state"],
+                "reconnects": h["reconnects"],
+                "downtime_s": round(downtime, 1),
+                "last_error": h["last_error"],
+            }
+        return out
@@ -0,0 +1,130 @@
+# ds_analytics/pipeline/tracks.py
+import collections
+import threading
+import time
+
+from common.histogram import Histogram
+
+# object_id de objetos que o nvtracker nao acompanha
+UNTRACKED_OBJECT_ID = 0xFFFFFFFFFFFFFFFF
+DWELL_BUCKETS_S = [1, 2, 5, 10, 30, 60, 120, 300, 600]
+
+
+class _StreamTracks:
+    def __init__(self, history: int):
+        # track_id -> [primeira vez, ultima vez, label]; ordem = ultima vez visto
+        self.active = collections.OrderedDict()
+        self.window_id = None
+        self.window_counts = {}
+        self.history = collections.deque(maxlen=history)
+        self.day = None
+        self.today = {}
+        self.dwell = {}
+        self.evicted_capacity = 0
+
+
+class TrackCounter:
+    """
+    Contagem de objetos distintos por object_id do nvtracker, por stream:
+      - conjunto de tracks ativos limitado a max_tracks (LRU) e com TTL:
+        track sem aparecer por ttl_s e encerrado
+      - unicos por janela de window_s (ultimas `history` janelas) e no dia
+      - dwell (ultima - primeira aparicao) dos tracks encerrados, por label,
+        em histograma de buckets fixos
+    A memoria nao cresce com o tempo de execucao: no maximo max_tracks
+    tracks e `history` janelas por stream, e um contador por label.
+    """
+
+    def __init__(self, ttl_s: float = 5.0, window_s: float = 60.0, history: int = 60, max_tracks: int = 1024):
+        self.ttl_s = float(ttl_s)
+        self.window_s = float(window_s)
+        self.history = int(history)
+        self.max_tracks = int(max_tracks)
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def _stream(self, key: str):
+        st = self._streams.get(key)
+        if st is None:
+            st = self._streams[key] = _StreamTracks(self.history)
+        return st
+
+    def _end(self, st: _StreamTracks, entry):
+        first, last, label = entry
+        hist = st.dwell.get(label)
+        if hist is None:
+            hist = st.dwell[label] = Histogram(DWELL_BUCKETS_S)
+        hist.add(last - first)
+
+    def _expire(self, st: _StreamTracks, now: float):
+        # OrderedDict em ordem de ultima aparicao: os expirados estao no inicio.
+        while st.active:
+            track_id, entry = next(iter(st.active.items()))
+            if now - entry[1] < self.ttl_s:
+                break
+            del st.active[track_id]
+            self._end(st, entry)
+
+    def _roll(self, st: _StreamTracks, wall: float):
+        window_id = int(wall // self.window_s)
+        if st.window_id != window_id:
+            if st.window_id is not None:
+                st.history.append({"start": st.window_id * self.window_s, "unique": st.window_counts})
+            st.window_id = window_id
+            st.window_counts = {}
+        day = time.strftime("%Y-%m-%d", time.localtime(wall))
+        if st.day != day:
+            st.day = day
+            st.today = {}
+
+    def update(self, stream_key: str, tracks, t: float | None = None):
+        """
+        tracks: iteravel de (object_id, label) vistos em um frame do stream.
+        t: horario do frame (replay); sem ele usa o relogio atual.
+        """
+        now = time.monotonic() if t is None else t
+        wall = time.time() if t is None else t
+        with self._lock:
+            st = self._stream(stream_key)
+            self._roll(st, wall)
+            self._expire(st, now)
+            for track_id, label in tracks:
+                entry = st.active.get(track_id)
+                if entry is not None:
+                    entry[1] = now
+                    st.active.move_to_end(track_id)
+                    continue
+                st.active[track_id] = [now, now, label]
+                st.window_counts[label] = st.window_counts.get(label, 0) + 1
+                st.today[label] = st.today.get(label, 0) + 1
+                if len(st.active) > self.max_tracks:
+                    _, old = st.active.popitem(last=False)
+                    self._end(st, old)
+                    st.evicted_capacity += 1
+
+    def remove_stream(self, stream_key: str):
+        with self._lock:
+            self._streams.pop(stream_key, None)
+
+    def stats(self, t: float | None = None):
+        now = time.monotonic() if t is None else t
+        wall = time.time() if t is None else t
+        out = {}
+        with self._lock:
+            for key, st in self._streams.items():
+                self._roll(st, wall)
+                self._expire(st, now)
+                active = {}
+                for _, _, label in st.active.values():
+                    active[label] = active.get(label, 0) + 1
+                out[key] = {
+                    "active": active,
+                    "unique_current_window": dict(st.window_counts),
+                    "unique_last_window": dict(st.history[-1]["unique"]) if st.history else {},
+                    "unique_today": dict(st.today),
+                    "windows": [{"start": w["start"], "unique": dict(w["unique"])} for w in st.history],
+                    "dwell_s": {label: h.export() for label, h in st.dwell.items()},
+                    "evicted_capacity": st.evicted_capacity,
+                }
+        return {"window_s": self.window_s, "ttl_s": self.ttl_s, "streams": out}
+
@@ -0,0 +1,348 @@
+# ds_analytics/pipeline/triton.py
+import json
+import os
+import re
+import shutil
+import urllib.error
+import urllib.request
+
+# Arquivo do modelo no repositorio do Triton -> platform do config.pbtxt
+MODEL_PLATFORMS = {
+    "model.plan": "tensorrt_plan",
+    "model.onnx": "onnxruntime_onnx",
+    "model.pt": "pytorch_libtorch",
+}
+
+# nvinferserver (TENSOR_DT_*) -> Triton (TYPE_*)
+_DTYPES = {
+    "TENSOR_DT_FP32": "TYPE_FP32",
+    "TENSOR_DT_FP16": "TYPE_FP16",
+    "TENSOR_DT_INT8": "TYPE_INT8",
+    "TENSOR_DT_INT32": "TYPE_INT32",
+    "TENSOR_DT_UINT8": "TYPE_UINT8",
+}
+
+
+def _read_text(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _strip_comments(text: str):
+    return re.sub(r"#[^\n]*", "", text)
+
+
+def parse_nvinferserver_config(path: str):
+    """Campos do config do nvinferserver usados para gerar/validar o modelo no Triton."""
+    text = _strip_comments(_read_text(path))
+    model = re.search(r'model_name\s*:\s*"([^"]+)"', text)
+    if not model:
+        raise ValueError(f"{path}: triton.model_name ausente")
+    url = re.search(r'(?:url|grpc_server_url)\s*:\s*"([^"]+)"', text)
+    batch = re.search(r"max_batch_size\s*:\s*(\d+)", text)
+    inputs = []
+    for block in re.finditer(r"inputs\s*\{([^}]*)\}", text):
+        body = block.group(1)
+        name = re.search(r'name\s*:\s*"([^"]+)"', body)
+        dims = re.search(r"dims\s*:\s*\[([^\]]*)\]", body)
+        dtype = re.search(r"data_type\s*:\s*(\w+)", body)
+        if name:
+            inputs.append(
+                {
+                    "name": name.group(1),
+                    "dims": [int(d) for d in dims.group(1).split(",")] if dims else [],
+                    "data_type": dtype.group(1) if dtype else "TENSOR_DT_FP32",
+                }
+            )
+    outputs = re.findall(r'outputs\s*\{\s*name\s*:\s*"([^"]+)"', text)
+    return {
+        "model_name": model.group(1),
+        "grpc_url": url.group(1) if url else "localhost:8001",
+        "max_batch_size": int(batch.group(1)) if batch else 0,
+        "inputs": inputs,
+        "outputs": outputs,
+    }
+
+
+def preferred_batch_sizes(batch: int):
+    """Potencias de 2 ate o batch, mais o proprio batch (ex.: 6 -> [2, 4, 6])."""
+    sizes = {batch}
+    b = 2
+    while b < batch:
+        sizes.add(b)
+        b *= 2
+    return sorted(sizes)
+
+
+def render_nvinferserver_config(path: str, batch: int, url: str | None = None):
+    """
+    Texto do config do nvinferserver com max_batch_size = batch e, se `url`
+    for dado, o grpc url trocado (ex.: apontar para o infer_proxy.py).
+    """
+    text = _read_text(path)
+    if re.search(r"max_batch_size\s*:\s*\d+", text):
+        text = re.sub(r"max_batch_size\s*:\s*\d+", f"max_batch_size: {batch}", text, count=1)
+    else:
+        text = re.sub(r"(infer_config\s*\{)", rf"\1\n  max_batch_size: {batch}", text, count=1)
+    if url:
+        text = re.sub(r'((?:url|grpc_server_url)\s*:\s*)"[^"]+"', rf'\1"{url}"', text, count=1)
+    return text
+
+
+def write_nvinferserver_config(path: str, batch: int, out_dir: str, url: str | None = None):
+    """Grava <out_dir>/<nome>_b<batch>.pbtxt e devolve o caminho."""
+    os.makedirs(out_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+    out = os.path.join(out_dir, f"{name}_b{batch}.pbtxt")
+    tmp = out + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_nvinferserver_config(path, batch, url))
+    os.replace(tmp, out)
+    return out
+
+
+def model_platform(repo: str, model_name: str):
+    model_dir = os.path.join(repo, model_name)
+    if not os.path.isdir(model_dir):
+        return None
+    for version in sorted(os.listdir(model_dir), reverse=True):
+        vdir = os.path.join(model_dir, version)
+        if not (version.isdigit() and os.path.isdir(vdir)):
+            continue
+        for fname, platform in MODEL_PLATFORMS.items():
+            if os.path.exists(os.path.join(vdir, fname)):
+                return platform
+    return None
+
+
+def render_triton_config(
+    model: dict,
+    batch: int,
+    platform: str,
+    max_queue_delay_us: int = 2000,
+    instances: int = 1,
+):
+    """
+    config.pbtxt do Triton com max_batch_size/dynamic_batching coerentes com
+    o batch do nvstreammux, para modelos ainda sem config.pbtxt. Saidas
+    ficam para o auto-complete do Triton.
+    """
+    lines = [
+        f'name: "{model["model_name"]}"',
+        f'platform: "{platform}"',
+        f"max_batch_size: {batch}",
+    ]
+    for inp in model["inputs"]:
+        lines += [
+            "input {",
+            f'  name: "{inp["name"]}"',
+            f"  data_type: {_DTYPES.get(inp['data_type'], 'TYPE_FP32')}",
+            f"  dims: [{', '.join(str(d) for d in inp['dims'])}]",
+            "}",
+        ]
+    lines += [
+        "dynamic_batching {",
+        f"  preferred_batch_size: [{', '.join(str(b) for b in preferred_batch_sizes(batch))}]",
+        f"  max_queue_delay_microseconds: {int(max_queue_delay_us)}",
+        "}",
+        "instance_group {",
+        f"  count: {int(instances)}",
+        "  kind: KIND_GPU",
+        "}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _block_span(text: str, key: str):
+    """
+    (inicio, fim) do bloco `key { ... }` de nivel superior (chaves
+    balanceadas, ignorando comentarios e strings), ou None.
+    """
+    depth, i, n = 0, 0, len(text)
+    pattern = re.compile(rf"\b{key}\s*:?\s*\{{")
+    while i < n:
+        c = text[i]
+        if c == "#":
+            i = text.find("\n", i)
+            if i < 0:
+                return None
+            continue
+        if c == '"':
+            i = text.find('"', i + 1) + 1
+            if i <= 0:
+                return None
+            continue
+        if depth == 0:
+            m = pattern.match(text, i)
+            if m:
+                start, j, d = i, m.end(), 1
+                while j < n and d:
+                    if text[j] == "#":
+                        j = text.find("\n", j)
+                        if j < 0:
+                            return None
+                        continue
+                    if text[j] == '"':
+                        j = text.find('"', j + 1) + 1
+                        if j <= 0:
+                            return None
+                        continue
+                    d += {"{": 1, "}": -1}.get(text[j], 0)
+                    j += 1
+                return (start, j) if d == 0 else None
+        depth += {"{": 1, "}": -1}.get(c, 0)
+        i += 1
+    return None
+
+
+def _set_field(body: str, key: str, value: str):
+    """Troca `key: ...` (uma linha) em body ou acrescenta no fim."""
+    pattern = re.compile(rf"^(\s*){key}\s*:[^\n]*", re.M)
+    if pattern.search(body):
+        return pattern.sub(lambda m: f"{m.group(1)}{key}: {value}", body, count=1)
+    return body.rstrip() + f"\n  {key}: {value}\n"
+
+
+def merge_triton_config(text: str, batch: int, max_queue_delay_us: int = 2000):
+    """
+    config.pbtxt existente com max_batch_size e dynamic_batching
+    (preferred_batch_size/max_queue_delay_microseconds) do batch atual;
+    output, instance_group, optimization e demais campos sao mantidos.
+    """
+    top = re.compile(r"^max_batch_size\s*:\s*\d+", re.M)
+    if top.search(text):
+        text = top.sub(f"max_batch_size: {batch}", text, count=1)
+    else:
+        text = text.rstrip() + f"\nmax_batch_size: {batch}\n"
+
+    preferred = f"[{', '.join(str(b) for b in preferred_batch_sizes(batch))}]"
+    span = _block_span(text, "dynamic_batching")
+    if span is None:
+        text = text.rstrip() + (
+            "\ndynamic_batching {\n"
+            f"  preferred_batch_size: {preferred}\n"
+            f"  max_queue_delay_microseconds: {int(max_queue_delay_us)}\n"
+            "}\n"
+        )
+    else:
+        start, end = span
+        open_at = text.index("{", start) + 1
+        body = text[open_at:end - 1]
+        body = _set_field(body, "preferred_batch_size", preferred)
+        body = _set_field(body, "max_queue_delay_microseconds", str(int(max_queue_delay_us)))
+        if not body.endswith("\n"):
+            body += "\n"
+        text = text[:open_at] + body + text[end - 1:]
+    return text
+
+
+def triton_config_text(repo: str, model: dict, batch: int, max_queue_delay_us: int = 2000, instances: int = 1):
+    """
+    (caminho, texto) do config.pbtxt do modelo para o batch: mescla no
+    existente (merge_triton_config) ou gera um novo (render_triton_config,
+    unico caso em que `instances` e usado).
+    """
+    path = os.path.join(repo, model["model_name"], "config.pbtxt")
+    if os.path.isfile(path):
+        return path, merge_triton_config(_read_text(path), batch, max_queue_delay_us)
+    platform = model_platform(repo, model["model_name"])
+    if platform is None:
+        raise ValueError(f"{repo}/{model['model_name']}: nenhuma versao com {'/'.join(MODEL_PLATFORMS)}")
+    return path, render_triton_config(model, batch, platform, max_queue_delay_us, instances)
+
+
+def write_triton_config(repo: str, model: dict, batch: int, **kwargs):
+    """
+    Grava <repo>/<modelo>/config.pbtxt (ver triton_config_text); o anterior
+    fica em config.pbtxt.bak.
+    """
+    path, text = triton_config_text(repo, model, batch, **kwargs)
+    if os.path.exists(path):
+        shutil.copy2(path, path + ".bak")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return path
+
+
+def _repo_model_config(repo: str, model_name: str):
+    path = os.path.join(repo, model_name, "config.pbtxt")
+    if not os.path.isfile(path):
+        return None
+    text = _strip_comments(_read_text(path))
+    batch = re.search(r"max_batch_size\s*:\s*(\d+)", text)
+    return {
+        "source": path,
+        "max_batch_size": int(batch.group(1)) if batch else 0,
+        "dynamic_batching": "dynamic_batching" in text,
+        "inputs": re.findall(r'input\s*\{[^}]*?name\s*:\s*"([^"]+)"', text),
+    }
+
+
+def _server_model_config(http_url: str, model_name: str, timeout: float = 2.0):
+    url = f"{http_url.rstrip('/')}/v2/models/{model_name}/config"
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            cfg = json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as exc:
+        if exc.code in (400, 404):
+            return {"source": url, "missing": True}
+        raise
+    return {
+        "source": url,
+        "max_batch_size": int(cfg.get("max_batch_size", 0)),
+        "dynamic_batching": "dynamic_batching" in cfg,
+        "inputs": [i.get("name") for i in cfg.get("input", [])],
+    }
+
+
+def validate_triton_model(pgie_config: str, batch: int, repo: str | None = None, http_url: str | None = None):
+    """
+    Confere o modelo do config do nvinferserver contra o repositorio (disco)
+    e/ou o Triton em execucao (HTTP). Devolve (problemas, avisos).
+    """
+    model = parse_nvinferserver_config(pgie_config)
+    name = model["model_name"]
+    problems, warnings = [], []
+    sources = []
+    server = None
+    repo_missing = False
+    if repo:
+        cfg = _repo_model_config(repo, name)
+        if cfg is None:
+            repo_missing = True
+        else:
+            sources.append(cfg)
+    if http_url:
+        try:
+            cfg = _server_model_config(http_url, name)
+        except (urllib.error.URLError, OSError, ValueError) as exc:
+            warnings.append(f"Triton em {http_url} inacessivel ({exc}); validado so o repositorio")
+        else:
+            if cfg.get("missing"):
+                problems.append(f"modelo '{name}' nao carregado no Triton ({cfg['source']})")
+            else:
+                sources.append(cfg)
+                server = cfg
+
+    wanted = [i["name"] for i in model["inputs"]]
+    for cfg in sources:
+        if cfg["max_batch_size"] < batch:
+            problems.append(f"{cfg['source']}: max_batch_size={cfg['max_batch_size']} < batch {batch}")
+        if batch > 1 and not cfg["dynamic_batching"]:
+            warnings.append(f"{cfg['source']}: sem dynamic_batching")
+        missing = [n for n in wanted if cfg["inputs"] and n not in cfg["inputs"]]
+        if missing:
+            problems.append(f"{cfg['source']}: entradas {missing} nao existem no modelo")
+    if repo_missing:
+        # sem config.pbtxt o Triton usa auto-complete: basta o config do
+        # servidor validar (ou batch 1, que nao depende de dynamic_batching)
+        msg = f"{repo}/{name}/config.pbtxt nao encontrado"
+        if server is not None and not any(p.startswith(server["source"]) for p in problems):
+            warnings.append(f"{msg} (auto-complete do Triton; validado pelo config do servidor)")
+        elif batch <= 1:
+            warnings.append(f"{msg} (auto-complete do Triton)")
+        else:
+            problems.append(msg)
+    return problems, warnings
@@ -0,0 +1,212 @@
+# ds_analytics/pipeline/zones.py
+import configparser
+import re
+import threading
+import time
+
+import numpy as np
+
+# secoes com poligonos: as do nvdsanalytics (roi-filtering/overcrowding) e
+# [zones-stream-N] proprias; chaves roi-<nome>=x;y;x;y;...
+_SECTION = re.compile(r"^(?:zones|roi-filtering|overcrowding)-stream-(\d+)$")
+_BIT_DTYPES = ((8, np.uint8), (16, np.uint16), (32, np.uint32), (64, np.uint64))
+
+
+def parse_zones_config(path: str):
+    """
+    Le poligonos em formato do nvdsanalytics. Devolve
+    ((config_width, config_height), {stream_idx: {zona: [(x, y), ...]}}).
+    """
+    cfg = configparser.ConfigParser(strict=False)
+    cfg.optionxform = str  # nomes das zonas mantem maiusculas
+    if not cfg.read(path):
+        raise ValueError(f"{path}: arquivo de zonas nao encontrado")
+    prop = cfg["property"] if cfg.has_section("property") else {}
+    size = (int(prop.get("config-width", 1920)), int(prop.get("config-height", 1080)))
+    zones = {}
+    for section in cfg.sections():
+        m = _SECTION.match(section)
+        if not m or cfg.get(section, "enable", fallback="1").strip() != "1":
+            continue
+        for key, value in cfg.items(section):
+            if not key.startswith("roi-"):
+                continue
+            nums = [float(v) for v in value.split(";") if v.strip()]
+            if len(nums) < 6 or len(nums) % 2:
+                raise ValueError(f"{path}: [{section}] {key} precisa de >= 3 pontos x;y")
+            zones.setdefault(int(m.group(1)), {})[key[4:]] = list(zip(nums[0::2], nums[1::2]))
+    return size, zones
+
+
+def _inside(xs, ys, poly):
+    """Par-impar vetorizado: pontos (xs, ys) dentro do poligono."""
+    inside = np.zeros(xs.shape, dtype=bool)
+    px = np.array([p[0] for p in poly], dtype=np.float64)
+    py = np.array([p[1] for p in poly], dtype=np.float64)
+    qx, qy = np.roll(px, 1), np.roll(py, 1)
+    for x0, y0, x1, y1 in zip(px, py, qx, qy):
+        if y0 == y1:
+            continue
+        crosses = (y0 > ys) != (y1 > ys)
+        xint = x0 + (ys - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (xs < xint)
+    return inside
+
+
+class ZoneMask:
+    """
+    Zonas de um stream rasterizadas uma vez em uma grade de celulas de
+    `cell` px na resolucao do mux. Cada celula guarda um bitset das zonas
+    que contem o seu centro, entao classificar N pontos e um unico
+    fancy-index, independente do numero de poligonos (ate 64).
+    """
+
+    def __init__(self, polygons: dict, config_size, mux_size, cell: int = 4):
+        if not polygons:
+            raise ValueError("polygons deve ter pelo menos uma zona")
+        if len(polygons) > 64:
+            raise ValueError("no maximo 64 zonas por stream")
+        if cell < 1:
+            raise ValueError("cell deve ser >= 1")
+        self.names = list(polygons)
+        self.mux_w, self.mux_h = int(mux_size[0]), int(mux_size[1])
+        self.cell = int(cell)
+        self.cols = -(-self.mux_w // self.cell)
+        self.rows = -(-self.mux_h // self.cell)
+        dtype = next(dt for bits, dt in _BIT_DTYPES if len(self.names) <= bits)
+        self.shifts = np.arange(len(self.names), dtype=dtype)
+
+        # centro de cada celula em coordenadas do config
+        sx = config_size[0] / self.mux_w
+        sy = config_size[1] / self.mux_h
+        cx = (np.arange(self.cols) + 0.5) * self.cell * sx
+        cy = (np.arange(self.rows) + 0.5) * self.cell * sy
+        xs, ys = np.meshgrid(cx, cy)
+        self.mask = np.zeros((self.rows, self.cols), dtype=dtype)
+        for bit, name in enumerate(self.names):
+            self.mask[_inside(xs, ys, polygons[name])] |= dtype(1) << dtype(bit)
+
+    def classify(self, boxes, frame_size=None):
+        """
+        boxes: array (N, 4) left, top, width, height em pixels de frame_size
+        (default: resolucao do mux). Devolve matriz booleana (N, zonas) do
+        ponto de apoio (centro da base do box).
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        fw, fh = frame_size or (self.mux_w, self.mux_h)
+        col = ((boxes[:, 0] + boxes[:, 2] * 0.5) * (self.cols / fw)).astype(np.int32)
+        row = ((boxes[:, 1] + boxes[:, 3]) * (self.rows / fh)).astype(np.int32)
+        np.clip(col, 0, self.cols - 1, out=col)
+        np.clip(row, 0, self.rows - 1, out=row)
+        bits = self.mask[row, col]
+        return ((bits[:, None] >> self.shifts) & 1).astype(bool)
+
+
+class ZoneEngine:
+    """
+    Ocupacao por zona (e por label) de cada stream a partir dos boxes do
+    frame, com as mascaras de ZoneMask. Guarda a ocupacao atual e a maxima
+    por intervalo; roll() fecha o intervalo (no mesmo timer do PerfManager).
+    """
+
+    def __init__(self, zones: dict, config_size, mux_size, labels: list | None = None, cell: int = 4):
+        self.mux_size = (int(mux_size[0]), int(mux_size[1]))
+        self.cell = int(cell)
+        self.labels = list(labels or [])
+        self.masks = {int(idx): ZoneMask(polys, config_size, mux_size, cell) for idx, polys in zones.items() if polys}
+        self._state = {}
+        self._lock = threading.Lock()
+        self._interval_start = time.time()
+
+    @classmethod
+    def from_config(cls, path: str, mux_size, labels: list | None = None, cell: int = 4):
+        config_size, zones = parse_zones_config(path)
+        return cls(zones, config_size, mux_size, labels=labels, cell=cell)
+
+    def _label(self, class_id: int):
+        if 0 <= class_id < len(self.labels):
+            return self.labels[class_id]
+        return f"class_{class_id}"
+
+    def count(self, stream_idx: int, boxes, class_ids, frame_size=None):
+        """
+        (ocupacao {zona: n}, {zona: {label: n}}) dos boxes de um frame, ou
+        None se o stream nao tem zonas.
+        """
+        mask = self.masks.get(stream_idx)
+        if mask is None:
+            return None
+        class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        if class_ids.size == 0:
+            return {name: 0 for name in mask.names}, {name: {} for name in mask.names}
+        hits = mask.classify(boxes, frame_size)
+        occupancy = hits.sum(axis=0)
+        # (labels x zonas) = one-hot(labels)^T @ hits
+        uniq, inv = np.unique(class_ids, return_inverse=True)
+        onehot = np.zeros((class_ids.size, uniq.size), dtype=np.int32)
+        onehot[np.arange(class_ids.size), inv] = 1
+        per_label = onehot.T @ hits.astype(np.int32)
+        by_zone = {}
+        for z, name in enumerate(mask.names):
+            col = per_label[:, z]
+            by_zone[name] = {self._label(int(uniq[i])): int(col[i]) for i in np.nonzero(col)[0]}
+        return {name: int(occupancy[z]) for z, name in enumerate(mask.names)}, by_zone
+
+    def update(self, stream_key: str, stream_idx: int, boxes, class_ids, frame_size=None):
+        res = self.count(stream_idx, boxes, class_ids, frame_size)
+        if res is None:
+            return None
+        occupancy, by_zone = res
+        with self._lock:
+            st = self._state.get(stream_key)
+            if st is None:
+                st = self._state[stream_key] = {"zones": {}, "updated_at": 0.0}
+            for name, n in occupancy.items():
+                z = st["zones"].get(name)
+                if z is None:
+                    z = st["zones"][name] = {"occupancy": 0, "interval_max": 0, "last_interval_max": 0, "by_label": {}}
+                z["occupancy"] = n
+                z["interval_max"] = max(z["interval_max"], n)
+                z["by_label"] = by_zone[name]
+            st["updated_at"] = time.time()
+        return res
+
+    def remove_stream(self, stream_key: str):
+        with self._lock:
+            self._state.pop(stream_key, None)
+
+    def roll(self):
+        """Fecha o intervalo atual: o pico vira last_interval_max."""
+        with self._lock:
+            for st in self._state.values():
+                for z in st["zones"].values():
+                    z["last_interval_max"] = z["interval_max"]
+                    z["interval_max"] = z["occupancy"]
+            self._interval_start = time.time()
+
+    def stats(self):
+        """Ocupacao atual por zona e o pico do ultimo intervalo fechado (so leitura)."""
+        with self._lock:
+            out = {
+                key: {
+                    "zones": {
+                        name: {
+                            "occupancy": z["occupancy"],
+                            "last_interval_max": z["last_interval_max"],
+                            "current_interval_max": z["interval_max"],
+                            "by_label": dict(z["by_label"]),
+                        }
+                        for name, z in st["zones"].items()
+                    },
+                    "updated_at": st["updated_at"],
+                }
+                for key, st in self._state.items()
+            }
+            started = self._interval_start
+        return {
+            "mux": list(self.mux_size),
+            "cell": self.cell,
+            "grid": {idx: [m.cols, m.rows] for idx, m in self.masks.items()},
+            "streams": out,
+            "interval_started_at": started,
+        }
@@ -12,7 +12,18 @@ from gi.repository import Gst, GLib
 
 from common.bus_call import bus_call
 from pipeline.builder import PipelineBuilder
-from pipeline.rtsp import start_rtsp_server
+from pipeline.supervisor import SourceSupervisor
+from pipeline.adaptive import InferIntervalController
+from pipeline.nodes import SOURCE_TIERS
+from pipeline.profiles import DEFAULT_TUNING, load_profile
+from pipeline.engines import EngineCache
+from pipeline.crops import CropWriter
+from pipeline.cropstore import CropStore
+from pipeline.zones import ZoneEngine
+from pipeline.events import EventPublisher, make_transport
+from pipeline.recorder import DetectionRecorder
+from pipeline.triton import parse_nvinferserver_config, validate_triton_model
+from pipeline.rtsp import AppSrcBridge, start_rtsp_server, start_rtsp_server_multi
 from metrics_server import start_metrics_server
 
 
@@ -26,12 +37,147 @@ def parse_args():
     p.add_argument("--rtsp-port", default="9000")
     p.add_argument("--rtsp-mount", default="/ds-mosaic")
     p.add_argument("--udp-port", type=int, default=5400)
+    p.add_argument(
+        "--output",
+        default="udp",
+        choices=["udp", "appsrc"],
+        help="udp: RTP via udpsink/udpsrc (loopback); appsrc: RTSP alimentado no mesmo processo",
+    )
+    p.add_argument(
+        "--layout",
+        default="mosaic",
+        choices=["mosaic", "demux", "headless"],
+        help=(
+            "mosaic: 1 mount com tiler; demux: 1 mount /ds-<camera> por entrada (1 pipeline em batch); "
+            "headless: so metadados (sem render/encoder/RTSP)"
+        ),
+    )
+    p.add_argument(
+        "--max-sources",
+        type=int,
+        default=None,
+        help="Slots no batch para cameras adicionadas em runtime (POST /sources no metrics)",
+    )
+    p.add_argument(
+        "--gate-on-viewers",
+        action="store_true",
+        help="Só tila/desenha/encoda enquanto houver clientes RTSP conectados",
+    )
+    p.add_argument(
+        "--priority",
+        nargs="+",
+        default=[],
+        metavar="STREAM=TIER",
+        help="Tier por camera (nome do stream ou URI): high, medium (1/2 dos frames) ou low (só keyframes)",
+    )
+    p.add_argument(
+        "--queue-policy",
+        default="bounded",
+        choices=["bounded", "unbounded"],
+        help="bounded: filas limitadas/leaky com estado de shedding; unbounded: filas sem limite",
+    )
+    p.add_argument(
+        "--adaptive-interval",
+        action="store_true",
+        help="Ajusta o interval do pgie em runtime conforme FPS/GPU medidos",
+    )
+    p.add_argument("--interval-min", type=int, default=0)
+    p.add_argument("--interval-max", type=int, default=4)
+    p.add_argument(
+        "--mux-tuning",
+        default="off",
+        choices=["off", "observe", "auto"],
+        help="observe: histogramas de ocupacao/espera do nvstreammux no /metrics; auto: tambem ajusta o "
+        "batched-push-timeout em runtime e recomenda um batch-size (aplicado so no proximo start, via --max-sources)",
+    )
+    p.add_argument("--mux-latency-ms", type=float, default=50.0, help="Orcamento de espera por batch no modo auto")
+    p.add_argument(
+        "--no-reconnect",
+        action="store_true",
+        help="Desliga o supervisor por source (qualquer erro encerra o processo)",
+    )
+    p.add_argument("--starve-s", type=float, default=10.0, help="Segundos sem frames para reconectar um source")
+    p.add_argument(
+        "--engine-cache",
+        default="/app/models/engine_cache",
+        help="Diretorio dos engines TensorRT por (modelo, batch, precisao, GPU); vazio desliga",
+    )
+    p.add_argument(
+        "--triton-repo",
+        default=os.environ.get("MODELS_DIR"),
+        help="Repositorio de modelos do Triton para validar configs .pbtxt (default: $MODELS_DIR)",
+    )
+    p.add_argument(
+        "--triton-http",
+        default=None,
+        help="URL HTTP do Triton para validar o modelo carregado (default: host do grpc url, porta 8000)",
+    )
+    p.add_argument(
+        "--triton-url",
+        default=None,
+        help="gRPC usado pelo nvinferserver no lugar do config (ex.: localhost:8011 do infer_proxy.py)",
+    )
+    p.add_argument(
+        "--triton-config-dir",
+        default="/app/config/generated",
+        help="Onde gravar o config do nvinferserver com max_batch_size do batch atual; vazio usa o original",
+    )
+    p.add_argument("--track-ttl-s", type=float, default=5.0, help="Track sem aparecer por este tempo e encerrado")
+    p.add_argument("--track-window-s", type=float, default=60.0, help="Janela da contagem de objetos distintos")
+    p.add_argument(
+        "--crops-dir",
+        default="",
+        help="Liga os recortes: melhor recorte de cada track + index.jsonl (painel do web), ex.: /app/crops. "
+        "Acrescenta um nvvideoconvert RGBA no batch inteiro; vazio (default) desliga",
+    )
+    p.add_argument("--crop-interval-s", type=float, default=2.0, help="Intervalo minimo entre recortes do mesmo stream")
+    p.add_argument("--crop-min-conf", type=float, default=0.3, help="Confianca minima para recortar")
+    p.add_argument("--crop-workers", type=int, default=2, help="Threads de JPEG/escrita dos recortes")
+    p.add_argument("--crops-max-mb", type=float, default=512.0, help="Quota em disco dos recortes")
+    p.add_argument("--crops-max-age-h", type=float, default=72.0, help="Recortes mais antigos sao apagados")
+    p.add_argument(
+        "--zones-config",
+        default="",
+        help="Poligonos por stream no formato do nvdsanalytics (ex.: /app/config/zones.txt); vazio desliga",
+    )
+    p.add_argument("--zones-cell", type=int, default=4, help="Lado da celula (px do mux) da mascara de zonas")
+    p.add_argument(
+        "--events-url",
+        default="",
+        help="Stream de eventos: unix:///tmp/ds_events.sock, zmq+ipc://..., jsonl:///app/logs/events; vazio desliga",
+    )
+    p.add_argument("--events-batch", type=int, default=256, help="Eventos por batch enviado")
+    p.add_argument("--events-linger-ms", type=float, default=50.0, help="Espera maxima para completar um batch")
+    p.add_argument("--events-queue", type=int, default=10000, help="Fila maxima (excedente e descartado)")
+    p.add_argument(
+        "--record",
+        default="",
+        help="Grava as deteccoes de cada frame (ex.: /app/logs/detections.dsrec) para scripts/replay.py; vazio desliga",
+    )
     p.add_argument("--metrics-host", default="0.0.0.0")
     p.add_argument("--metrics-port", type=int, default=None)
     p.add_argument("--perf-csv", default=None, help="Caminho do CSV de performance")
     p.add_argument("--stream-name", default=None, help="Nome do stream para métricas/crops")
     p.add_argument("--gst-debug", default=None)
-    return p.parse_args()
+    p.add_argument("--config", default="/app/config/app_config.yaml", help="YAML com os perfis do pipeline")
+    p.add_argument(
+        "--profile",
+        default=None,
+        help="Perfil do --config (ex.: max-throughput, low-latency, headless); flags explicitas vencem o perfil",
+    )
+
+    # 1a passada so para achar o perfil: ele vira default das demais opcoes.
+    args, _ = p.parse_known_args()
+    tuning = None
+    if args.profile:
+        try:
+            run_defaults, tuning = load_profile(args.config, args.profile)
+        except (OSError, ValueError) as exc:
+            p.error(str(exc))
+        p.set_defaults(**run_defaults)
+    args = p.parse_args()
+    args.tuning = tuning
+    return args
 
 
 def _read_text(path: str):
@@ -75,6 +221,43 @@ def _safe_name(text: str):
     return re.sub(r"[^a-zA-Z0-9._-]+", "-", text).strip("-")
 
 
+def _stream_name_from_uri(uri: str, index: int):
+    """rtsp://host:8554/video01 -> video01 (mesmo id usado pelo web/app.py)."""
+    tail = uri.rstrip("/").rsplit("/", 1)[-1]
+    tail = tail.split("?", 1)[0]
+    return _safe_name(tail) or f"stream{index}"
+
+
+def _parse_priorities(items):
+    tiers = {}
+    for item in items:
+        key, sep, tier = item.rpartition("=")
+        if not sep or not key:
+            raise SystemExit(f"--priority invalido: {item} (use STREAM=TIER)")
+        if tier not in SOURCE_TIERS:
+            raise SystemExit(f"--priority invalido: {item} (TIER deve ser um de {sorted(SOURCE_TIERS)})")
+        tiers[key] = tier
+    return tiers
+
+
+def _check_triton(args, batch: int):
+    """Falha cedo se o modelo no Triton nao aceitar o batch do nvstreammux."""
+    http_url = args.triton_http
+    if http_url is None:
+        host = parse_nvinferserver_config(args.pgie_config)["grpc_url"].rsplit(":", 1)[0]
+        http_url = f"http://{host}:8000"
+    problems, warnings = validate_triton_model(args.pgie_config, batch, repo=args.triton_repo, http_url=http_url)
+    for w in warnings:
+        print(f">> Triton: {w}")
+    if problems:
+        raise SystemExit(
+            "Config do Triton incompativel com batch {}:\n  - {}\n"
+            "Gere com: python3 scripts/gen_triton_configs.py --pgie-config {} --cameras {}".format(
+                batch, "\n  - ".join(problems), args.pgie_config, batch
+            )
+        )
+
+
 def main():
     args = parse_args()
 
@@ -87,7 +270,9 @@ def main():
     labels = _load_labels(labels_path)
 
     stream_names = None
-    if args.stream_name:
+    if args.layout in ("demux", "headless"):
+        stream_names = [_stream_name_from_uri(u, i) for i, u in enumerate(args.input)]
+    elif args.stream_name:
         stream_names = [args.stream_name]
     elif args.rtsp_mount:
         stream_names = [args.rtsp_mount.lstrip("/").replace("ds-", "")]
@@ -96,10 +281,56 @@ def main():
         perf_csv_path = args.perf_csv
     else:
         cams = len(args.input)
-        mount = _safe_name(args.rtsp_mount.lstrip("/") or "mosaic")
+        mount = args.layout if args.layout != "mosaic" else _safe_name(args.rtsp_mount.lstrip("/") or "mosaic")
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         perf_csv_path = f"/app/logs/perf_{cams}cams_{mount}_{ts}.csv"
 
+    crop_writer = None
+    if args.crops_dir:
+        crop_writer = CropWriter(
+            args.crops_dir,
+            min_interval_s=args.crop_interval_s,
+            min_conf=args.crop_min_conf,
+            workers=args.crop_workers,
+            store=CropStore(
+                args.crops_dir,
+                max_bytes=int(args.crops_max_mb * 1024 * 1024),
+                max_age_s=args.crops_max_age_h * 3600.0,
+            ),
+        )
+
+    zone_engine = None
+    if args.zones_config:
+        mux_cfg = (args.tuning or DEFAULT_TUNING)["mux"]
+        try:
+            zone_engine = ZoneEngine.from_config(
+                args.zones_config, (mux_cfg["width"], mux_cfg["height"]), labels=labels, cell=args.zones_cell
+            )
+        except (OSError, ValueError) as exc:
+            raise SystemExit(f">> Zonas invalidas: {exc}")
+        print(f">> ZONAS: {sum(len(m.names) for m in zone_engine.masks.values())} em {len(zone_engine.masks)} streams")
+
+    event_publisher = None
+    if args.events_url:
+        try:
+            transport = make_transport(args.events_url)
+        except (OSError, ValueError, RuntimeError) as exc:
+            raise SystemExit(f">> Eventos: {exc}")
+        event_publisher = EventPublisher(
+            transport,
+            batch_size=args.events_batch,
+            linger_ms=args.events_linger_ms,
+            max_queue=args.events_queue,
+        )
+
+    recorder = None
+    if args.record:
+        mux_cfg = (args.tuning or DEFAULT_TUNING)["mux"]
+        try:
+            recorder = DetectionRecorder(args.record, labels=labels, mux_size=(mux_cfg["width"], mux_cfg["height"]))
+        except (OSError, ValueError) as exc:
+            raise SystemExit(f">> Gravacao: {exc}")
+
     builder = PipelineBuilder(
         args.input,
         codec=args.codec,
@@ -109,10 +340,68 @@ def main():
         stream_names=stream_names,
         perf_csv_path=perf_csv_path,
         udp_port=args.udp_port,
+        output="appsink" if args.output == "appsrc" else "udp",
+        gate_on_viewers=args.gate_on_viewers,
+        layout=args.layout,
+        max_sources=args.max_sources,
+        queue_policy=args.queue_policy,
+        source_tiers=_parse_priorities(args.priority),
+        mux_tuning=args.mux_tuning,
+        mux_latency_ms=args.mux_latency_ms,
+        tuning=args.tuning,
+        engine_cache=EngineCache(args.engine_cache) if args.engine_cache else None,
+        triton_config_dir=args.triton_config_dir or None,
+        triton_url=args.triton_url,
+        track_ttl_s=args.track_ttl_s,
+        track_window_s=args.track_window_s,
+        crop_writer=crop_writer,
+        zone_engine=zone_engine,
+        event_publisher=event_publisher,
+        recorder=recorder,
     )
+    if args.pgie_config.endswith(".pbtxt"):
+        _check_triton(args, builder.max_sources)
 
     pipeline = builder.build()
 
+    bridge = None
+    if args.output == "appsrc" and args.layout == "mosaic":
+        bridge = AppSrcBridge(args.codec)
+        bridge.attach(builder.appsink)
+
+    supervisor = None
+    extras = {
+        "load": builder.perf.get_load,
+        "streams": builder.sources.stream_info,
+        "engine": builder.engine_status,
+        "analytics": builder.perf.get_analytics,
+        "tracks": builder.tracks.stats,
+        "aggregates": builder.perf.get_aggregates,
+    }
+    if not args.no_reconnect:
+        supervisor = SourceSupervisor(builder.sources, builder.perf, starve_s=args.starve_s)
+        extras["sources_health"] = supervisor.health
+    if crop_writer is not None:
+        extras["crops"] = crop_writer.stats
+    if zone_engine is not None:
+        extras["zones"] = zone_engine.stats
+    if event_publisher is not None:
+        extras["events"] = event_publisher.stats
+    if recorder is not None:
+        extras["recorder"] = recorder.stats
+    if builder.mux_tuner is not None:
+        extras["muxer"] = builder.mux_tuner.stats
+
+    interval_ctl = None
+    if args.adaptive_interval:
+        interval_ctl = InferIntervalController(
+            builder.pgie,
+            builder.perf,
+            min_interval=args.interval_min,
+            max_interval=args.interval_max,
+        )
+        extras["inference"] = interval_ctl.status
+
     metrics_port = args.metrics_port
     if metrics_port is None:
         try:
@@ -125,28 +414,59 @@ def main():
         port=metrics_port,
         pgie_config=args.pgie_config,
         labels_path=labels_path,
+        source_mgr=builder.sources,
+        extras=extras,
     )
 
-    start_rtsp_server(
-        codec=args.codec,
-        port=str(args.rtsp_port),
-        mount=str(args.rtsp_mount),
-        udp_port=int(args.udp_port),
-    )
+    mounts = [str(args.rtsp_mount)]
+    if args.layout == "headless":
+        mounts = []
+    elif args.layout == "demux":
+        bridges = {}
+        for name, appsink in zip(stream_names, builder.appsinks):
+            bridges[f"/ds-{name}"] = AppSrcBridge(args.codec)
+            bridges[f"/ds-{name}"].attach(appsink)
+        mounts = list(bridges)
+        start_rtsp_server_multi(bridges, port=str(args.rtsp_port))
+    else:
+        start_rtsp_server(
+            codec=args.codec,
+            port=str(args.rtsp_port),
+            mount=str(args.rtsp_mount),
+            udp_port=int(args.udp_port),
+            bridge=bridge,
+            on_viewers=builder.set_viewers if args.gate_on_viewers else None,
+        )
 
     loop = GLib.MainLoop()
     bus = pipeline.get_bus()
     bus.add_signal_watch()
-    bus.connect("message", bus_call, loop)
+    if supervisor is not None:
+        bus.connect("message", supervisor.bus_call, loop)
+        supervisor.start()
+    else:
+        bus.connect("message", bus_call, loop)
 
     builder.schedule_perf_log()
+    if interval_ctl is not None:
+        interval_ctl.start()
     builder.start()
 
     print(f">> INPUT: {args.input}")
     print(f">> PGIE: {args.pgie_config}")
-    print(f">> RTSP out: rtsp://127.0.0.1:{args.rtsp_port}{args.rtsp_mount}  (udp ingest {args.udp_port})")
+    if args.profile:
+        print(f">> PROFILE: {args.profile} ({args.config})")
+    ingest = "in-process appsrc" if bridge or args.layout == "demux" else f"udp ingest {args.udp_port}"
+    for mount in mounts:
+        print(f">> RTSP out: rtsp://127.0.0.1:{args.rtsp_port}{mount}  ({ingest})")
     print(f">> METRICS: http://127.0.0.1:{metrics_port}/metrics")
     print(f">> PERF CSV: {perf_csv_path}")
+    if crop_writer is not None:
+        print(f">> CROPS: {args.crops_dir}")
+    if event_publisher is not None:
+        print(f">> EVENTS: {args.events_url}")
+    if recorder is not None:
+        print(f">> RECORD: {args.record}")
 
     try:
         loop.run()
@@ -157,6 +477,12 @@ def main():
             builder.stop()
         except Exception:
             pass
+        if crop_writer is not None:
+            crop_writer.close()
+        if event_publisher is not None:
+            event_publisher.close()
+        if recorder is not None:
+            recorder.close()
 
     return 0
 
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark de cameras por GPU: perfil completo (tiler -> osd -> encoder ->
+RTP) vs headless (nvdsanalytics -> fakesink, so metadados).
+
+Para cada perfil sobe o PipelineBuilder com N copias da mesma URI, em
+ordem crescente de N, e mede o FPS por stream e a GPU % apos o warmup.
+N "passa" se o stream mais lento mantiver ao menos min_ratio * target_fps;
+cameras/GPU = maior N que passou (para no primeiro que falhar).
+
+Uso (dentro do container, a partir de /app):
+  python3 scripts/bench_headless.py --counts 1 2 4 8 16 32
+  python3 scripts/bench_headless.py --uri rtsp://mediamtx:8554/video01 --target-fps 25
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst, GLib
+
+from pipeline.builder import PipelineBuilder
+
+DEFAULT_URI = "file:///opt/nvidia/deepstream/deepstream/samples/streams/sample_1080p_h264.mp4"
+PROFILES = {"full": "mosaic", "headless": "headless"}
+
+
+def run_once(profile, n, args, tmpdir):
+    builder = PipelineBuilder(
+        [args.uri] * n,
+        pgie_config=args.pgie_config,
+        perf_csv_path=os.path.join(tmpdir, f"perf_{profile}_{n}.csv"),
+        udp_port=args.udp_port,
+        layout=PROFILES[profile],
+    )
+    pipeline = builder.build()
+    loop = GLib.MainLoop()
+    samples = []
+    status = {"error": None}
+
+    def _on_message(bus, message):
+        if message.type == Gst.MessageType.EOS:
+            status["error"] = "EOS antes do fim (use um video mais longo ou RTSP)"
+            loop.quit()
+        elif message.type == Gst.MessageType.ERROR:
+            err, _ = message.parse_error()
+            status["error"] = err.message
+            loop.quit()
+        return True
+
+    def _sample():
+        builder.perf.snapshot_and_log()
+        if time.monotonic() - t0 >= args.warmup:
+            fps = [v for v in builder.perf.last_fps.values() if v is not None]
+            if fps:
+                samples.append((min(fps), sum(fps) / len(fps), builder.perf.last_gpu))
+        return True
+
+    bus = pipeline.get_bus()
+    bus.add_signal_watch()
+    bus.connect("message", _on_message)
+
+    t0 = time.monotonic()
+    GLib.timeout_add(int(args.sample_s * 1000), _sample)
+    GLib.timeout_add(int((args.warmup + args.duration) * 1000), loop.quit)
+    builder.start()
+    loop.run()
+    builder.stop()
+    bus.remove_signal_watch()
+
+    if not samples:
+        return {"profile": profile, "cams": n, "ok": False, "error": status["error"] or "sem amostras"}
+    min_fps = min(s[0] for s in samples)
+    avg_fps = sum(s[1] for s in samples) / len(samples)
+    gpu = [s[2] for s in samples if s[2] is not None]
+    return {
+        "profile": profile,
+        "cams": n,
+        "ok": status["error"] is None and min_fps >= args.min_ratio * args.target_fps,
+        "min_stream_fps": round(min_fps, 1),
+        "avg_stream_fps": round(avg_fps, 1),
+        "gpu_pct": round(sum(gpu) / len(gpu), 1) if gpu else None,
+        "error": status["error"],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cameras por GPU: perfil completo vs headless")
+    ap.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    ap.add_argument("--counts", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    ap.add_argument("--uri", default=DEFAULT_URI)
+    ap.add_argument("--pgie-config", default="/app/models/EPI/epi.txt")
+    ap.add_argument("--target-fps", type=float, default=30.0)
+    ap.add_argument("--min-ratio", type=float, default=0.95)
+    ap.add_argument("--warmup", type=float, default=10.0)
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--sample-s", type=float, default=2.0)
+    ap.add_argument("--udp-port", type=int, default=5600)
+    args = ap.parse_args()
+
+    Gst.init(None)
+    results = []
+    best = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for profile in args.profiles:
+            best[profile] = 0
+            for n in sorted(args.counts):
+                r = run_once(profile, n, args, tmpdir)
+                results.append(r)
+                print(r)
+                if not r["ok"]:
+                    break
+                best[profile] = n
+
+    print("\nprofile   cams  min_fps  avg_fps  gpu_%  ok")
+    for r in results:
+        print(
+            f"{r['profile']:<9} {r['cams']:>4}  {r.get('min_stream_fps')!s:>7}  "
+            f"{r.get('avg_stream_fps')!s:>7}  {r.get('gpu_pct')!s:>5}  {r['ok']}"
+        )
+    print("\ncameras/GPU (>= {:.0f}% de {} fps):".format(args.min_ratio * 100, args.target_fps))
+    for profile, n in best.items():
+        print(f"  {profile:<9} {n}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark da saida RTSP: caminho UDP de loopback (udpsink -> udpsrc ->
+rtpjitterbuffer -> depay -> parse -> pay) vs ponte appsink -> appsrc
+no mesmo processo.
+
+Um pipeline sintetico (videotestsrc -> encoder) alimenta o RTSP server e um
+cliente rtspsrc no mesmo processo consome o mount. A latencia e medida do
+encoder ate o cliente casando cada access unit pelos ultimos bytes (iguais
+nos dois lados, pois o H.264 nao e re-encodado). CPU = tempo de CPU do
+processo / tempo de parede.
+
+Uso (dentro do container, a partir de /app):
+  python3 scripts/bench_rtsp_output.py --duration 30
+  python3 scripts/bench_rtsp_output.py --modes appsrc --encoder x264enc
+"""
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gi
+
+gi.require_version("Gst", "1.0")
+gi.require_version("GstRtspServer", "1.0")
+from gi.repository import Gst, GLib
+
+from pipeline.rtsp import AppSrcBridge, start_rtsp_server
+
+AU_CAPS = "video/x-h264,stream-format=byte-stream,alignment=au"
+
+
+def _au_key(buf):
+    ok, info = buf.map(Gst.MapFlags.READ)
+    if not ok:
+        return None
+    try:
+        return hashlib.blake2b(bytes(info.data[-64:]), digest_size=8).digest()
+    finally:
+        buf.unmap(info)
+
+
+def _encoder_desc(encoder, width, height, fps):
+    if encoder == "x264enc":
+        enc = f"x264enc tune=zerolatency speed-preset=ultrafast key-int-max={fps} bitrate=4000"
+        conv = "videoconvert"
+    else:
+        enc = f"{encoder} iframeinterval={fps} insert-sps-pps=1 bitrate=4000000"
+        conv = "nvvideoconvert ! video/x-raw(memory:NVMM),format=I420"
+    return (
+        f"videotestsrc is-live=true pattern=ball "
+        f"! video/x-raw,width={width},height={height},framerate={fps}/1 "
+        f"! {conv} ! {enc} ! h264parse name=encparse ! {AU_CAPS}"
+    )
+
+
+def run_mode(mode, args):
+    sent = {}
+    latencies = []
+    lock = threading.Lock()
+
+    src = _encoder_desc(args.encoder, args.width, args.height, args.fps)
+    if mode == "udp":
+        desc = (
+            f"{src} ! rtph264pay config-interval=1 pt=96 "
+            f"! udpsink host=127.0.0.1 port={args.udp_port} sync=false async=false"
+        )
+    else:
+        desc = f"{src} ! appsink name=out sync=false max-buffers=30 drop=true"
+    sender = Gst.parse_launch(desc)
+
+    bridge = None
+    if mode == "appsrc":
+        bridge = AppSrcBridge("H264")
+        bridge.attach(sender.get_by_name("out"))
+
+    def _on_encoded(pad, info):
+        key = _au_key(info.get_buffer())
+        if key is not None:
+            with lock:
+                sent[key] = time.monotonic()
+        return Gst.PadProbeReturn.OK
+
+    sender.get_by_name("encparse").get_static_pad("src").add_probe(
+        Gst.PadProbeType.BUFFER, _on_encoded
+    )
+
+    server = start_rtsp_server(
+        codec="H264",
+        port=str(args.rtsp_port),
+        mount="/bench",
+        udp_port=args.udp_port,
+        bridge=bridge,
+    )
+
+    client = Gst.parse_launch(
+        f"rtspsrc location=rtsp://127.0.0.1:{args.rtsp_port}/bench protocols=tcp latency=0 "
+        f"! rtph264depay ! h264parse ! {AU_CAPS} "
+        "! appsink name=client emit-signals=true sync=false"
+    )
+
+    def _on_client_sample(sink):
+        sample = sink.emit("pull-sample")
+        if sample is None:
+            return Gst.FlowReturn.OK
+        key = _au_key(sample.get_buffer())
+        now = time.monotonic()
+        with lock:
+            t0 = sent.pop(key, None)
+        if t0 is not None:
+            latencies.append((now - t0) * 1000.0)
+        return Gst.FlowReturn.OK
+
+    client.get_by_name("client").connect("new-sample", _on_client_sample)
+
+    loop = GLib.MainLoop()
+    sender.set_state(Gst.State.PLAYING)
+    # Deixa o server subir antes do cliente conectar.
+    GLib.timeout_add(500, lambda: client.set_state(Gst.State.PLAYING) and False)
+
+    cpu0 = time.process_time()
+    wall0 = time.time()
+    GLib.timeout_add(int(args.duration * 1000), loop.quit)
+    loop.run()
+    cpu_pct = 100.0 * (time.process_time() - cpu0) / max(1e-6, time.time() - wall0)
+
+    client.set_state(Gst.State.NULL)
+    sender.set_state(Gst.State.NULL)
+    del server
+
+    latencies.sort()
+    n = len(latencies)
+
+    def _pct(p):
+        return round(latencies[min(n - 1, int(p * n))], 2) if n else None
+
+    return {
+        "mode": mode,
+        "frames": n,
+        "latency_ms_p50": _pct(0.50),
+        "latency_ms_p95": _pct(0.95),
+        "latency_ms_max": round(latencies[-1], 2) if n else None,
+        "cpu_pct": round(cpu_pct, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latência/CPU: saída RTSP via UDP vs appsrc")
+    ap.add_argument("--modes", nargs="+", default=["udp", "appsrc"], choices=["udp", "appsrc"])
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--encoder", default="nvv4l2h264enc", help="nvv4l2h264enc ou x264enc")
+    ap.add_argument("--width", type=int, default=1280)
+    ap.add_argument("--height", type=int, default=720)
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--rtsp-port", type=int, default=9500)
+    ap.add_argument("--udp-port", type=int, default=5500)
+    args = ap.parse_args()
+
+    Gst.init(None)
+    results = []
+    for i, mode in enumerate(args.modes):
+        # Porta nova por modo: o server anterior pode ainda segurar a antiga.
+        args.rtsp_port += i
+        results.append(run_mode(mode, args))
+        print(results[-1])
+
+    print("\nmode     frames  p50_ms  p95_ms  max_ms  cpu_%")
+    for r in results:
+        print(
+            f"{r['mode']:<8} {r['frames']:>6}  {r['latency_ms_p50']!s:>6}  "
+            f"{r['latency_ms_p95']!s:>6}  {r['latency_ms_max']!s:>6}  {r['cpu_pct']:>5}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Pre-constroi (ou aquece) os engines TensorRT de um modelo nvinfer para os
+batch sizes configurados, fora do run.py. Cada engine vai para o cache
+(pipeline.engines.EngineCache), nomeado por modelo, batch, precisao e
+arquitetura da GPU; o run.py depois so carrega o engine do batch atual.
+
+Para cada batch mostra se o engine ja estava no cache e o tempo ate a
+primeira inferencia (construcao + carga quando nao estava).
+
+Uso (dentro do container, a partir de /app):
+  python3 scripts/build_engines.py --pgie-config /app/models/EPI/epi.txt --batch-sizes 1 2 4 8
+  python3 scripts/build_engines.py --pgie-config /app/models/Hall/hall.txt --list
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst
+
+from pipeline.engines import EngineCache, warm_engine
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-build/warm de engines TensorRT por batch size")
+    ap.add_argument("--pgie-config", required=True)
+    ap.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 2, 4, 8])
+    ap.add_argument("--engine-cache", default="/app/models/engine_cache")
+    ap.add_argument("--timeout-s", type=float, default=1800.0, help="Limite por engine (construcao inclusa)")
+    ap.add_argument("--list", action="store_true", help="So lista os engines do cache")
+    args = ap.parse_args()
+
+    cache = EngineCache(args.engine_cache)
+    if args.list:
+        for name in cache.entries():
+            print(name)
+        return 0
+
+    Gst.init(None)
+    results = []
+    failed = False
+    for batch in sorted(set(args.batch_sizes)):
+        try:
+            r = warm_engine(cache, args.pgie_config, batch, timeout_s=args.timeout_s)
+        except Exception as exc:
+            r = {"batch": batch, "engine": None, "cached": False, "first_inference_s": None, "error": str(exc)}
+            failed = True
+        results.append(r)
+        print(r)
+
+    print("\nbatch  cached  first_inference_s  engine")
+    for r in results:
+        print(f"{r['batch']:>5}  {r['cached']!s:>6}  {r['first_inference_s']!s:>17}  {r['engine'] or r.get('error')}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Consumidor de teste do stream de eventos (pipeline/events.py).
+
+Escuta no mesmo url passado ao run.py em --events-url (unix:// e zmq+
+fazem bind aqui; jsonl:// acompanha o arquivo) e imprime a cada
+--interval-s os batches/eventos recebidos por tipo e lacunas de seq.
+--print mostra cada evento.
+
+--check sobe o consumidor (unix socket temporario) e um EventPublisher no
+mesmo processo, publica --events deteccoes sinteticas (--rate por
+segundo; 0 = sem pausa, para forcar descarte) e confere que recebidos +
+descartados = publicados. Sai com 1 se a conta nao fechar.
+
+Uso (dentro do container, a partir de /app):
+  python3 scripts/event_consumer.py unix:///tmp/ds_events.sock
+  python3 scripts/event_consumer.py jsonl:///app/logs/events --print
+  python3 scripts/event_consumer.py --check --events 20000 --rate 0
+"""
+import argparse
+import collections
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.events import EventPublisher, UnixSocketTransport
+
+
+class Tally:
+    def __init__(self, show: bool = False):
+        self.show = show
+        self.batches = 0
+        self.kinds = collections.Counter()
+        self.gaps = 0
+        self._last_seq = None
+        self._lock = threading.Lock()
+
+    def line(self, raw: bytes):
+        try:
+            doc = json.loads(raw)
+        except ValueError:
+            return
+        with self._lock:
+            self.batches += 1
+            seq = doc.get("seq")
+            if self._last_seq is not None and seq is not None and seq > self._last_seq + 1:
+                self.gaps += seq - self._last_seq - 1
+            self._last_seq = seq
+            for ev in doc.get("ev", []):
+                self.kinds[ev.get("k")] += 1
+                if self.show:
+                    print(json.dumps(ev, separators=(",", ":")))
+
+    def reset(self):
+        with self._lock:
+            out = (self.batches, dict(self.kinds), self.gaps)
+            self.batches = 0
+            self.kinds = collections.Counter()
+            self.gaps = 0
+        return out
+
+
+def _serve_conn(conn, tally: Tally):
+    buf = b""
+    with conn:
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                return
+            buf += chunk
+            *lines, buf = buf.split(b"\n")
+            for raw in lines:
+                tally.line(raw)
+
+
+def serve_unix(path: str, tally: Tally, ready: threading.Event | None = None):
+    if os.path.exists(path):
+        os.remove(path)
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    srv.bind(path)
+    srv.listen(4)
+    if ready is not None:
+        ready.set()
+    while True:
+        conn, _ = srv.accept()
+        threading.Thread(target=_serve_conn, args=(conn, tally), daemon=True).start()
+
+
+def serve_zmq(endpoint: str, tally: Tally):
+    import zmq
+
+    sock = zmq.Context.instance().socket(zmq.PULL)
+    sock.bind(endpoint)
+    while True:
+        tally.line(sock.recv())
+
+
+def tail_jsonl(directory: str, tally: Tally):
+    path = os.path.join(directory, "events.jsonl")
+    f, ino, buf = None, None, b""
+    while True:
+        try:
+            st = os.stat(path)
+        except OSError:
+            time.sleep(0.5)
+            continue
+        if f is None or st.st_ino != ino:
+            # rotacionado: recomeca no arquivo novo
+            if f is not None:
+                f.close()
+            f, ino, buf = open(path, "rb"), st.st_ino, b""
+        chunk = f.read()
+        if not chunk:
+            time.sleep(0.2)
+            continue
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for raw in lines:
+            tally.line(raw)
+
+
+def check(args):
+    path = os.path.join(tempfile.mkdtemp(), "events.sock")
+    tally = Tally()
+    ready = threading.Event()
+    threading.Thread(target=serve_unix, args=(path, tally, ready), daemon=True).start()
+    ready.wait(5)
+
+    pub = EventPublisher(
+        UnixSocketTransport(path),
+        batch_size=args.batch,
+        linger_ms=args.linger_ms,
+        max_queue=args.queue,
+    )
+    t0 = time.monotonic()
+    for i in range(args.events):
+        if args.rate > 0 and i % 100 == 0:
+            wait = t0 + i / args.rate - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        pub.detections(f"cam{i % 4}", time.time(), i, [[0, 0.9, 10.0, 20.0, 30.0, 40.0, i]])
+    pub.close(timeout_s=10)
+    elapsed = time.monotonic() - t0
+    time.sleep(0.5)
+
+    stats = pub.stats()
+    batches, kinds, gaps = tally.reset()
+    received = sum(kinds.values())
+    dropped = stats["dropped_queue"] + stats["dropped_transport"]
+    print(f"publicados: {args.events}  recebidos: {received}  descartados: {dropped}  ({elapsed:.2f}s)")
+    print(f"batches: {batches}  lacunas de seq: {gaps}")
+    print("batch_size:", stats["batch_size"])
+    return 0 if received + dropped == args.events else 1
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Consumidor de teste do stream de eventos")
+    ap.add_argument("url", nargs="?", default="unix:///tmp/ds_events.sock")
+    ap.add_argument("--print", dest="show", action="store_true", help="Imprime cada evento")
+    ap.add_argument("--interval-s", type=float, default=5.0)
+    ap.add_argument("--check", action="store_true", help="Publicador + consumidor no mesmo processo")
+    ap.add_argument("--events", type=int, default=20000)
+    ap.add_argument("--rate", type=float, default=20000.0, help="Eventos/s no --check (0 = sem pausa)")
+    ap.add_argument("--batch", type=int, default=256)
+    ap.add_argument("--linger-ms", type=float, default=50.0)
+    ap.add_argument("--queue", type=int, default=10000)
+    args = ap.parse_args()
+
+    if args.check:
+        return check(args)
+
+    tally = Tally(args.show)
+    if args.url.startswith("unix://"):
+        target, arg = serve_unix, args.url[len("unix://"):]
+    elif args.url.startswith("zmq+"):
+        target, arg = serve_zmq, args.url[len("zmq+"):]
+    elif args.url.startswith("jsonl://"):
+        target, arg = tail_jsonl, args.url[len("jsonl://"):]
+    else:
+        ap.error("url deve comecar com unix://, zmq+ipc://, zmq+tcp:// ou jsonl://")
+    threading.Thread(target=target, args=(arg, tally), daemon=True).start()
+    print(f">> Consumindo {args.url}")
+    try:
+        while True:
+            time.sleep(args.interval_s)
+            batches, kinds, gaps = tally.reset()
+            print(f">> {batches} batches, eventos {kinds}, lacunas de seq {gaps}")
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Gera os configs de um modelo servido pelo Triton a partir do numero de
+cameras (= batch do nvstreammux):
+  - nvinferserver: copia do .pbtxt com max_batch_size = cameras
+  - Triton: <repo>/<modelo>/config.pbtxt com max_batch_size, dynamic_batching
+    e preferred_batch_size (potencias de 2 ate o batch), mesclados no config
+    existente (output, instance_group, optimization... sao mantidos)
+e valida o resultado contra o repositorio (e o Triton, se estiver no ar).
+O Triton precisa recarregar o modelo (restart ou model-control explicit).
+
+Uso (dentro do container, a partir de /app):
+  python3 scripts/gen_triton_configs.py --pgie-config config/pgie_triton_person.pbtxt --cameras 8
+  python3 scripts/gen_triton_configs.py --pgie-config config/pgie_triton_epi.pbtxt --cameras 4 --dry-run
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.triton import (
+    MODEL_PLATFORMS,
+    model_platform,
+    parse_nvinferserver_config,
+    render_triton_config,
+    triton_config_text,
+    validate_triton_model,
+    write_nvinferserver_config,
+    write_triton_config,
+)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Configs nvinferserver/Triton para N cameras em batch")
+    ap.add_argument("--pgie-config", required=True, help="Config .pbtxt do nvinferserver (template)")
+    ap.add_argument("--cameras", type=int, required=True, help="Batch do nvstreammux (cameras + slots de runtime)")
+    ap.add_argument("--triton-repo", default=os.environ.get("MODELS_DIR", "/models"))
+    ap.add_argument("--triton-http", default=None, help="Valida tambem no Triton em execucao (ex.: http://localhost:8000)")
+    ap.add_argument("--out-dir", default="/app/config/generated", help="Destino do config do nvinferserver")
+    ap.add_argument("--max-queue-delay-us", type=int, default=2000)
+    ap.add_argument("--instances", type=int, default=1, help="instance_group de um config novo (o existente e mantido)")
+    ap.add_argument("--dry-run", action="store_true", help="So imprime o config.pbtxt do Triton")
+    args = ap.parse_args()
+
+    if args.cameras < 1:
+        ap.error("--cameras deve ser >= 1")
+    model = parse_nvinferserver_config(args.pgie_config)
+    opts = {"max_queue_delay_us": args.max_queue_delay_us, "instances": args.instances}
+
+    if args.dry_run:
+        try:
+            _, text = triton_config_text(args.triton_repo, model, args.cameras, **opts)
+        except ValueError:
+            platform = model_platform(args.triton_repo, model["model_name"]) or MODEL_PLATFORMS["model.onnx"]
+            text = render_triton_config(model, args.cameras, platform, **opts)
+        print(text)
+        return 0
+
+    infer_cfg = write_nvinferserver_config(args.pgie_config, args.cameras, args.out_dir)
+    print(f">> nvinferserver: {infer_cfg}")
+    triton_cfg = write_triton_config(args.triton_repo, model, args.cameras, **opts)
+    print(f">> Triton: {triton_cfg}")
+
+    problems, warnings = validate_triton_model(
+        infer_cfg, args.cameras, repo=args.triton_repo, http_url=args.triton_http
+    )
+    for w in warnings:
+        print(f">> aviso: {w}")
+    for p in problems:
+        print(f">> erro: {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Triton falso (gRPC KServe v2) para testar o infer_proxy sem GPU.
+
+O modelo "mock" recebe "input" FP32 [N, D] e devolve "output" FP32 [N, 1]
+com a soma de cada linha, registrando o tamanho de cada batch recebido.
+
+--check sobe o mock e o proxy no mesmo processo, dispara --clients threads
+com requisicoes batch 1 (dados diferentes por cliente) pelo proxy e confere
+que cada resposta volta para quem pediu; imprime os batches vistos pelo mock
+e as metricas do proxy. Sai com 1 se alguma resposta vier errada.
+
+Uso (dentro do container, a partir de /app):
+  python3 scripts/mock_triton.py --port 8101
+  python3 scripts/mock_triton.py --check --clients 8 --requests 50
+"""
+import argparse
+import collections
+import os
+import sys
+import threading
+from concurrent import futures
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import grpc
+import numpy as np
+from tritonclient.grpc import service_pb2, service_pb2_grpc, model_config_pb2
+
+from infer_proxy import GRPC_OPTIONS, InferenceProxy, start_proxy
+
+
+class MockTriton(service_pb2_grpc.GRPCInferenceServiceServicer):
+    def __init__(self, max_batch_size: int = 16, delay_ms: float = 2.0):
+        self.max_batch_size = int(max_batch_size)
+        self.delay_s = float(delay_ms) / 1000.0
+        self.batches = collections.Counter()
+        self._lock = threading.Lock()
+
+    def ServerLive(self, request, context):
+        return service_pb2.ServerLiveResponse(live=True)
+
+    def ServerReady(self, request, context):
+        return service_pb2.ServerReadyResponse(ready=True)
+
+    def ModelReady(self, request, context):
+        return service_pb2.ModelReadyResponse(ready=request.name == "mock")
+
+    def ModelConfig(self, request, context):
+        if request.name != "mock":
+            context.abort(grpc.StatusCode.NOT_FOUND, f"modelo {request.name} nao existe")
+        cfg = model_config_pb2.ModelConfig(name="mock", max_batch_size=self.max_batch_size)
+        return service_pb2.ModelConfigResponse(config=cfg)
+
+    def ModelInfer(self, request, context):
+        if request.model_name != "mock":
+            context.abort(grpc.StatusCode.NOT_FOUND, f"modelo {request.model_name} nao existe")
+        shape = list(request.inputs[0].shape)
+        if shape[0] > self.max_batch_size:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"batch {shape[0]} > {self.max_batch_size}")
+        x = np.frombuffer(request.raw_input_contents[0], dtype=np.float32).reshape(shape)
+        with self._lock:
+            self.batches[shape[0]] += 1
+        if self.delay_s:
+            threading.Event().wait(self.delay_s)
+        y = x.sum(axis=1, keepdims=True).astype(np.float32)
+        resp = service_pb2.ModelInferResponse(model_name="mock", model_version="1", id=request.id)
+        out = resp.outputs.add()
+        out.name = "output"
+        out.datatype = "FP32"
+        out.shape.extend(y.shape)
+        resp.raw_output_contents.append(y.tobytes())
+        return resp
+
+
+def start_mock(mock: MockTriton, port: int):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=16), options=GRPC_OPTIONS)
+    service_pb2_grpc.add_GRPCInferenceServiceServicer_to_server(mock, server)
+    server.add_insecure_port(f"127.0.0.1:{port}")
+    server.start()
+    return server
+
+
+def _client(target: str, cid: int, n: int, dim: int, errors: list):
+    channel = grpc.insecure_channel(target, options=GRPC_OPTIONS)
+    stub = service_pb2_grpc.GRPCInferenceServiceStub(channel)
+    for i in range(n):
+        x = np.full((1, dim), cid * 1000 + i, dtype=np.float32)
+        req = service_pb2.ModelInferRequest(model_name="mock", id=f"{cid}-{i}")
+        t = req.inputs.add()
+        t.name = "input"
+        t.datatype = "FP32"
+        t.shape.extend(x.shape)
+        req.raw_input_contents.append(x.tobytes())
+        req.outputs.add().name = "output"
+        try:
+            resp = stub.ModelInfer(req, timeout=10)
+        except grpc.RpcError as exc:
+            errors.append(f"{cid}-{i}: {exc.code()} {exc.details()}")
+            continue
+        y = np.frombuffer(resp.raw_output_contents[0], dtype=np.float32)
+        if resp.id != req.id or list(resp.outputs[0].shape) != [1, 1] or y[0] != x.sum():
+            errors.append(f"{cid}-{i}: resposta errada id={resp.id} y={y.tolist()}")
+    channel.close()
+
+
+def check(args):
+    mock = MockTriton(args.max_batch_size, args.delay_ms)
+    mock_server = start_mock(mock, args.port)
+    proxy = InferenceProxy(f"127.0.0.1:{args.port}", window_ms=args.window_ms)
+    proxy_server = start_proxy(proxy, f"127.0.0.1:{args.proxy_port}")
+
+    errors = []
+    threads = [
+        threading.Thread(target=_client, args=(f"127.0.0.1:{args.proxy_port}", c, args.requests, args.dim, errors))
+        for c in range(args.clients)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    proxy_server.stop(0)
+    mock_server.stop(0)
+    total = args.clients * args.requests
+    calls = sum(mock.batches.values())
+    print(f"requisicoes: {total}  chamadas no mock: {calls}  media/batch: {total / max(1, calls):.2f}")
+    print("batches no mock:", dict(sorted(mock.batches.items())))
+    stats = proxy.stats()["models"].get("mock:latest", {})
+    print("proxy batch_size:", stats.get("batch_size"))
+    print("proxy queue_depth_at_dispatch:", stats.get("queue_depth_at_dispatch"))
+    for e in errors[:10]:
+        print("ERRO", e)
+    return 1 if errors else 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Triton gRPC falso para testar o infer_proxy")
+    ap.add_argument("--port", type=int, default=8101)
+    ap.add_argument("--max-batch-size", type=int, default=16)
+    ap.add_argument("--delay-ms", type=float, default=2.0, help="Tempo simulado por chamada ModelInfer")
+    ap.add_argument("--check", action="store_true", help="Roda mock + proxy + clientes e confere as respostas")
+    ap.add_argument("--proxy-port", type=int, default=8111)
+    ap.add_argument("--window-ms", type=float, default=5.0)
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=50)
+    ap.add_argument("--dim", type=int, default=16)
+    args = ap.parse_args()
+
+    if args.check:
+        return check(args)
+
+    server = start_mock(MockTriton(args.max_batch_size, args.delay_ms), args.port)
+    print(f">> Mock Triton em 127.0.0.1:{args.port} (modelo 'mock', max_batch_size {args.max_batch_size})")
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(0)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Replay de uma gravacao do DetectionRecorder (run.py --record) sem
+GStreamer nem GPU: cada frame gravado passa pela contagem por label
+(aggregates.WindowedAggregator), pelos tracks distintos
+(tracks.TrackCounter) e, com --zones-config, pela ocupacao por zona
+(zones.ZoneEngine), usando o horario gravado como relogio.
+
+--min-conf / --classes refiltram as deteccoes (para testar limiares);
+--speed 0 roda o mais rapido possivel, N > 0 roda a N x tempo real.
+--synthetic S grava antes um arquivo sintetico de S segundos em <path>
+(para testar o replay sem uma gravacao real).
+
+Uso (dentro do container, a partir de /app):
+  python3 scripts/replay.py /app/logs/detections.dsrec --min-conf 0.5
+  python3 scripts/replay.py /app/logs/detections.dsrec --zones-config /app/config/zones.txt --json /tmp/replay.json
+  python3 scripts/replay.py /tmp/synth.dsrec --synthetic 600 --streams 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from pipeline.aggregates import WindowedAggregator
+from pipeline.recorder import DetectionReader, DetectionRecorder
+from pipeline.tracks import TrackCounter
+from pipeline.zones import ZoneEngine
+
+
+def synthesize(path: str, seconds: int, streams: int, fps: float, labels: list, seed: int = 0):
+    """Objetos andando em linha reta, com track_id e confianca aleatoria."""
+    rng = np.random.default_rng(seed)
+    for suffix in ("", ".idx", ".meta.json"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rec = DetectionRecorder(path, labels=labels, mux_size=(640, 480))
+    t0 = float(int(time.time()) - seconds)
+    next_id = 1
+    live = {s: [] for s in range(streams)}
+    for f in range(int(seconds * fps)):
+        ts = t0 + f / fps
+        for s in range(streams):
+            objs = live[s]
+            if rng.random() < 0.05:
+                objs.append([next_id, int(rng.integers(len(labels))), rng.uniform(0, 600), rng.uniform(0, 300),
+                             rng.uniform(-4, 4), rng.uniform(1, 4)])
+                next_id += 1
+            out = []
+            for o in objs:
+                o[2] += o[4]
+                o[3] += o[5]
+                out.append((o[1], float(rng.uniform(0.2, 0.95)), o[2], o[3], 40.0, 90.0, o[0]))
+            live[s] = [o for o in objs if 0 <= o[2] <= 620 and o[3] <= 470]
+            rec.add_frame(f"cam{s:02d}", ts, f, out, pad_index=s)
+    rec.close()
+
+
+class _ZoneSummary:
+    def __init__(self):
+        self.frames = {}
+        self.sum = {}
+        self.max = {}
+
+    def add(self, stream: str, occupancy: dict):
+        for zone, n in occupancy.items():
+            key = (stream, zone)
+            self.frames[key] = self.frames.get(key, 0) + 1
+            self.sum[key] = self.sum.get(key, 0) + n
+            self.max[key] = max(self.max.get(key, 0), n)
+
+    def export(self):
+        out = {}
+        for (stream, zone), frames in self.frames.items():
+            out.setdefault(stream, {})[zone] = {
+                "mean": round(self.sum[(stream, zone)] / frames, 3),
+                "max": self.max[(stream, zone)],
+                "frames": frames,
+            }
+        return out
+
+
+def replay(args):
+    reader = DetectionReader(args.path)
+    meta = reader.meta
+    labels = meta.get("labels", [])
+    pads = meta.get("pads", {})
+    streams = meta.get("streams", [])
+    mux = tuple(int(v) for v in args.mux.split("x")) if args.mux else tuple(meta.get("mux", (640, 480)))
+
+    start, stop = 0, reader.n
+    span = reader.seconds()
+    if span and args.start_s:
+        start = reader.record_at(span[0] + args.start_s)
+    if span and args.duration_s:
+        stop = reader.record_at(span[0] + (args.start_s or 0) + args.duration_s)
+
+    counter = TrackCounter(ttl_s=args.track_ttl_s, window_s=args.track_window_s)
+    aggregator = WindowedAggregator()
+    zone_engine = None
+    zone_summary = _ZoneSummary()
+    if args.zones_config:
+        zone_engine = ZoneEngine.from_config(args.zones_config, mux, labels=labels, cell=args.zones_cell)
+    classes = np.array(args.classes, dtype=np.int16) if args.classes else None
+    n_labels = max(len(labels), 1)
+
+    def label(c):
+        return labels[c] if 0 <= c < len(labels) else f"class_{c}"
+
+    frames = detections = 0
+    first_ts = last_ts = None
+    wall0 = time.monotonic()
+    for stream, ts, _, cols in reader.frames(start, stop):
+        if first_ts is None:
+            first_ts = ts
+        last_ts = ts
+        if args.speed > 0:
+            ahead = (ts - first_ts) / args.speed - (time.monotonic() - wall0)
+            if ahead > 0:
+                time.sleep(ahead)
+        keep = cols["conf"] >= args.min_conf
+        if classes is not None:
+            keep &= np.isin(cols["class_id"], classes)
+        cls = cols["class_id"][keep].astype(np.int64)
+        frames += 1
+        detections += int(cls.size)
+
+        per_class = np.bincount(cls, minlength=n_labels) if cls.size else np.zeros(n_labels, dtype=np.int64)
+        aggregator.add(stream, {label(c): int(n) for c, n in enumerate(per_class) if n or c < len(labels)}, ts)
+
+        tids = cols["track_id"][keep]
+        tracked = tids >= 0
+        counter.update(stream, [(int(t), label(int(c))) for t, c in zip(tids[tracked], cls[tracked])], t=ts)
+
+        if zone_engine is not None:
+            boxes = np.stack(
+                [cols["left"][keep], cols["top"][keep], cols["width"][keep], cols["height"][keep]], axis=1
+            )
+            res = zone_engine.update(stream, pads.get(stream, streams.index(stream)), boxes, cls)
+            if res is not None:
+                zone_summary.add(stream, res[0])
+
+    elapsed = time.monotonic() - wall0
+    recorded = (last_ts - first_ts) if frames > 1 else 0.0
+    tracks = counter.stats(t=last_ts) if last_ts is not None else {"streams": {}}
+    report = {
+        "file": args.path,
+        "records": stop - start,
+        "frames": frames,
+        "detections": detections,
+        "recorded_s": round(recorded, 2),
+        "elapsed_s": round(elapsed, 3),
+        "speedup": round(recorded / elapsed, 1) if elapsed > 0 else None,
+        "frames_per_s": round(frames / elapsed, 1) if elapsed > 0 else None,
+        "filters": {"min_conf": args.min_conf, "classes": args.classes},
+        "tracks": tracks,
+        "aggregates": aggregator.snapshot(),
+        "zones": zone_summary.export() if zone_engine is not None else None,
+    }
+    reader.close()
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay de deteccoes gravadas (sem GStreamer/GPU)")
+    ap.add_argument("path", help="Arquivo gravado por run.py --record")
+    ap.add_argument("--speed", type=float, default=0.0, help="0 = o mais rapido possivel; N = N x tempo real")
+    ap.add_argument("--start-s", type=float, default=0.0, help="Segundos apos o inicio da gravacao")
+    ap.add_argument("--duration-s", type=float, default=0.0, help="0 = ate o fim")
+    ap.add_argument("--min-conf", type=float, default=0.0)
+    ap.add_argument("--classes", type=int, nargs="+", default=None, help="class_ids considerados")
+    ap.add_argument("--zones-config", default="", help="Poligonos (formato do nvdsanalytics, ver config/zones.txt)")
+    ap.add_argument("--zones-cell", type=int, default=4)
+    ap.add_argument("--mux", default="", help="WxH do mux (default: o gravado)")
+    ap.add_argument("--track-ttl-s", type=float, default=5.0)
+    ap.add_argument("--track-window-s", type=float, default=60.0)
+    ap.add_argument("--json", default="", help="Grava o relatorio completo (- = stdout)")
+    ap.add_argument("--synthetic", type=int, default=0, help="Grava antes S segundos sinteticos em path")
+    ap.add_argument("--streams", type=int, default=4)
+    ap.add_argument("--fps", type=float, default=25.0)
+    args = ap.parse_args()
+
+    if args.synthetic:
+        synthesize(args.path, args.synthetic, args.streams, args.fps, ["person", "helmet", "vest"])
+        print(f">> Gravacao sintetica: {args.path} ({args.synthetic}s, {args.streams} streams)")
+
+    report = replay(args)
+    print(
+        f">> {report['frames']} frames, {report['detections']} deteccoes, "
+        f"{report['recorded_s']}s gravados em {report['elapsed_s']}s (x{report['speedup']})"
+    )
+    for stream, st in sorted(report["tracks"]["streams"].items()):
+        print(f"   {stream}: unicos {st['unique_today']}")
+    if report["zones"]:
+        for stream, zones in sorted(report["zones"].items()):
+            print(f"   {stream} zonas: {zones}")
+    if args.json == "-":
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f">> Relatorio: {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,15 +1,30 @@
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse, Response
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import time
 import threading
 import json
+import asyncio
+import struct
+from collections import deque
 from urllib.request import urlopen
 from pathlib import Path
 import os
 import cv2
 
+# GStreamer (PyGObject) e opcional: sem ele o relay HLS fica desabilitado
+# e o dashboard continua apenas com MJPEG.
+try:
+    import gi
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst
+    Gst.init(None)
+    HLS_AVAILABLE = True
+except Exception:
+    Gst = None
+    HLS_AVAILABLE = False
+
 app = FastAPI()
 STATIC_DIR = Path(__file__).parent / "static"
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
@@ -66,25 +81,50 @@ def _port_for(cam_id: str, base: int) -> int:
         idx = 0
     return base + idx
 
+# "per-process": um run.py por camera (RTSP 9000+N, metrics 10000+N).
+# "batched": um run.py --layout demux com todas as cameras (mesmos mounts
+# /ds-videoNN em DS_RTSP_PORT, contagens em counts.streams[videoNN]).
+DS_LAYOUT = os.getenv("DS_LAYOUT", "per-process").lower()
+DS_RTSP_PORT = int(os.getenv("DS_RTSP_PORT", "9000"))
+DS_METRICS_PORT = int(os.getenv("DS_METRICS_PORT", "10000"))
+
 RTSP_SOURCES = []
 for cam_id, label in CAMERA_DEFS:
-    rtsp_port = _port_for(cam_id, 9000)
-    metrics_port = _port_for(cam_id, 10000)
+    if DS_LAYOUT == "batched":
+        rtsp_port = DS_RTSP_PORT
+        metrics_port = DS_METRICS_PORT
+        metrics_stream = cam_id
+    else:
+        rtsp_port = _port_for(cam_id, DS_RTSP_PORT)
+        metrics_port = _port_for(cam_id, DS_METRICS_PORT)
+        metrics_stream = None
     RTSP_SOURCES.append(
         {
             "id": cam_id,
             "label": label,
             "url": f"rtsp://{RTSP_HOST}:{rtsp_port}/ds-{cam_id}",
             "metrics_url": f"http://{RTSP_HOST}:{metrics_port}/metrics",
+            "metrics_stream": metrics_stream,
         }
     )
 
+# "mjpeg" (decodifica + JPEG) ou "hls" (remux H.264 -> fMP4, sem decodificar)
+STREAM_MODE = os.getenv("STREAM_MODE", "mjpeg").lower()
+HLS_FRAGMENT_MS = int(os.getenv("HLS_FRAGMENT_MS", "1000"))
+HLS_MAX_SEGMENTS = int(os.getenv("HLS_MAX_SEGMENTS", "6"))
+HLS_IDLE_S = float(os.getenv("HLS_IDLE_S", "30"))
+# Miniaturas: so IDR decodificados (iframeinterval=30 no encoder => ~1 fps).
+# Largura alvo; a altura segue o aspecto da camera (4:3 nao e esticado).
+THUMB_WIDTH = int(os.getenv("THUMB_WIDTH", "320"))
+THUMB_MIN_INTERVAL_S = float(os.getenv("THUMB_MIN_INTERVAL_S", "0.5"))
+
 stats_lock = threading.Lock()
 stats = {}
 for source in RTSP_SOURCES:
     cam_id = source["id"]
     stats[cam_id] = {
         "fps": 0.0,
+        "thumb_fps": 0.0,
         "status": "offline",
         "url": source.get("url"),
         "label": source.get("label", cam_id),
@@ -92,6 +132,19 @@ for source in RTSP_SOURCES:
         "label_order": [],
     }
 
+# Cameras com campos alterados desde o ultimo broadcast do /ws/state.
+stats_dirty = set()
+
+
+def _update_stats(cam_id: str, **fields):
+    """Atualiza campos de `stats` e marca a camera como suja apenas se algo mudou."""
+    with stats_lock:
+        entry = stats[cam_id]
+        for key, value in fields.items():
+            if entry.get(key) != value:
+                entry[key] = value
+                stats_dirty.add(cam_id)
+
 
 # FUNCOES AUXILIARES
 def find_working_rtsp(candidates):
@@ -107,14 +160,27 @@ def find_working_rtsp(candidates):
     raise RuntimeError("Nenhum stream RTSP valido encontrado.")
 
 
-def open_capture(url):
+def open_capture(url, thumbnail=False):
     import cv2
     # Tenta GStreamer primeiro; se falhar, cai para FFMPEG.
-    gst = (
-        f"rtspsrc location={url} protocols=tcp latency=100 ! "
-        "rtph264depay ! h264parse ! avdec_h264 ! videoconvert ! "
-        "appsink drop=1 max-buffers=1 sync=false"
-    )
+    if thumbnail:
+        # Descarta os P-frames antes do decoder (identity drop-buffer-flags)
+        # e reduz a resolucao logo na saida do decoder, antes do videoconvert.
+        gst = (
+            f"rtspsrc location={url} protocols=tcp latency=100 ! "
+            "rtph264depay ! h264parse ! video/x-h264,alignment=au ! "
+            "identity drop-buffer-flags=delta-unit ! "
+            "avdec_h264 max-threads=1 ! "
+            "videoscale method=nearest-neighbour ! "
+            f"video/x-raw,width={THUMB_WIDTH},pixel-aspect-ratio=1/1 ! "
+            "videoconvert ! appsink drop=1 max-buffers=1 sync=false"
+        )
+    else:
+        gst = (
+            f"rtspsrc location={url} protocols=tcp latency=100 ! "
+            "rtph264depay ! h264parse ! avdec_h264 ! videoconvert ! "
+            "appsink drop=1 max-buffers=1 sync=false"
+        )
     cap = cv2.VideoCapture(gst, cv2.CAP_GSTREAMER)
     if cap.isOpened():
         return cap
@@ -125,25 +191,283 @@ def open_capture(url):
     return cap
 
 
+class _CpuMeter:
+    """
+    % de CPU do processo inteiro (todas as threads, inclusive as de
+    streaming do GStreamer/FFMPEG). A comparacao por stream entre HLS e
+    MJPEG fica no benchmark isolado (web/bench_relay_cpu.py): tempo de
+    CPU de thread nao ve as threads internas dos decoders/pipelines.
+    """
+
+    def __init__(self, min_window_s: float = 1.0):
+        self._lock = threading.Lock()
+        self._prev_wall = time.time()
+        self._prev_proc = time.process_time()
+        self._min_window_s = min_window_s
+        self._last = {"process_cpu_pct": 0.0}
+
+    def snapshot(self):
+        """% de um core desde a ultima janela (>= min_window_s)."""
+        now = time.time()
+        with self._lock:
+            elapsed = now - self._prev_wall
+            if elapsed < self._min_window_s:
+                return self._last
+            proc = time.process_time()
+            self._last = {"process_cpu_pct": round(100.0 * (proc - self._prev_proc) / elapsed, 2)}
+            self._prev_wall = now
+            self._prev_proc = proc
+            return self._last
+
+
+cpu_meter = _CpuMeter()
+
+
+def _split_mp4_boxes(data: bytearray):
+    """Consome do inicio de `data` os boxes MP4 completos e retorna [(tipo, bytes)]."""
+    boxes = []
+    pos = 0
+    while len(data) - pos >= 8:
+        size, kind = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            if len(data) - pos < 16:
+                break
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        if size < header:
+            # size=0 ("ate o fim do arquivo") nao aparece em fMP4 streamable.
+            raise ValueError(f"Box MP4 invalido ({kind!r}, size={size})")
+        if len(data) - pos < size:
+            break
+        boxes.append((kind.decode("latin-1"), bytes(data[pos:pos + size])))
+        pos += size
+    del data[:pos]
+    return boxes
+
+
+class HlsRelay:
+    """
+    Relay RTSP H.264 -> fMP4/HLS sem decodificar:
+      rtspsrc -> rtph264depay -> h264parse -> mp4mux (fragmentado) -> appsink
+    O init segment (ftyp+moov) e os ultimos HLS_MAX_SEGMENTS fragmentos
+    (moof+mdat) ficam em memoria. O pipeline para sozinho apos HLS_IDLE_S
+    sem requisicoes.
+    """
+
+    def __init__(self, cam_id: str, url: str):
+        self.cam_id = cam_id
+        self.url = url
+        self.lock = threading.Lock()
+        self.init_segment = None
+        self.generation = 0
+        self.segments = deque(maxlen=HLS_MAX_SEGMENTS)
+        self.seq = 0
+        self.last_access = time.time()
+        self._running = False
+        self._pending = bytearray()
+        self._header = []
+        self._moof = None
+        self._last_seg_ts = None
+
+    def touch(self):
+        self.last_access = time.time()
+        with self.lock:
+            if self._running:
+                return
+            self._running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _idle(self):
+        return time.time() - self.last_access > HLS_IDLE_S
+
+    def _launch(self):
+        return (
+            f"rtspsrc location={self.url} protocols=tcp latency=100 ! "
+            "rtph264depay ! h264parse config-interval=-1 ! "
+            "video/x-h264,stream-format=avc,alignment=au ! "
+            f"mp4mux streamable=true fragment-duration={HLS_FRAGMENT_MS} ! "
+            "appsink name=sink sync=false max-buffers=64"
+        )
+
+    def _reset_stream(self):
+        self._pending = bytearray()
+        self._header = []
+        self._moof = None
+        self._last_seg_ts = None
+        with self.lock:
+            self.init_segment = None
+            self.segments.clear()
+
+    def _run(self):
+        backoff = 0.5
+        while not self._idle():
+            self._reset_stream()
+            try:
+                pipeline = Gst.parse_launch(self._launch())
+            except Exception as exc:
+                print(f"[hls] {self.cam_id}: falha criando pipeline: {exc}")
+                break
+            pipeline.set_state(Gst.State.PLAYING)
+            try:
+                healthy = self._pump(pipeline.get_by_name("sink"), pipeline.get_bus())
+            finally:
+                pipeline.set_state(Gst.State.NULL)
+            if healthy:
+                backoff = 0.5
+                continue
+            _update_stats(self.cam_id, status="offline")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 5)
+        self._reset_stream()
+        with self.lock:
+            self._running = False
+
+    def _pump(self, sink, bus):
+        """Le fragmentos do appsink ate ficar ocioso (True) ou falhar (False)."""
+        last_data = time.time()
+        while not self._idle():
+            sample = sink.emit("try-pull-sample", Gst.SECOND)
+            if sample is None:
+                msg = bus.pop_filtered(Gst.MessageType.ERROR)
+                if msg is not None:
+                    err, _ = msg.parse_error()
+                    print(f"[hls] {self.cam_id}: {err}")
+                    return False
+                if sink.get_property("eos") or time.time() - last_data > 10:
+                    return False
+                continue
+            last_data = time.time()
+            buf = sample.get_buffer()
+            ok, info = buf.map(Gst.MapFlags.READ)
+            if ok:
+                try:
+                    self._pending.extend(info.data)
+                finally:
+                    buf.unmap(info)
+                try:
+                    for kind, box in _split_mp4_boxes(self._pending):
+                        self._on_box(kind, box)
+                except ValueError as exc:
+                    print(f"[hls] {self.cam_id}: {exc}")
+                    return False
+        return True
+
+    def _on_box(self, kind: str, box: bytes):
+        if kind in ("ftyp", "moov"):
+            self._header.append(box)
+            if kind == "moov":
+                with self.lock:
+                    self.init_segment = b"".join(self._header)
+                    self.generation += 1
+                self._header = []
+                _update_stats(self.cam_id, status="online")
+        elif kind == "moof":
+            self._moof = box
+        elif kind == "mdat" and self._moof is not None:
+            now = time.time()
+            if self._last_seg_ts is None:
+                dur = HLS_FRAGMENT_MS / 1000.0
+            else:
+                dur = max(0.001, now - self._last_seg_ts)
+            self._last_seg_ts = now
+            with self.lock:
+                self.seq += 1
+                self.segments.append((self.seq, dur, self._moof + box))
+            self._moof = None
+
+    def wait_ready(self, timeout: float):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                if self.init_segment is not None and self.segments:
+                    return True
+            time.sleep(0.1)
+        return False
+
+    def playlist(self):
+        with self.lock:
+            if self.init_segment is None or not self.segments:
+                return None
+            segs = [(seq, dur) for seq, dur, _ in self.segments]
+            generation = self.generation
+        target = max(1, int(max(d for _, d in segs) + 0.999))
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:7",
+            f"#EXT-X-TARGETDURATION:{target}",
+            f"#EXT-X-MEDIA-SEQUENCE:{segs[0][0]}",
+            f'#EXT-X-MAP:URI="init.mp4?g={generation}"',
+        ]
+        for seq, dur in segs:
+            lines.append(f"#EXTINF:{dur:.3f},")
+            lines.append(f"seg{seq}.m4s")
+        return "\n".join(lines) + "\n"
+
+    def segment(self, seq: int):
+        with self.lock:
+            for s, _, data in self.segments:
+                if s == seq:
+                    return data
+        return None
+
+    def info(self):
+        with self.lock:
+            return {
+                "running": self._running,
+                "segments": len(self.segments),
+                "cache_bytes": sum(len(d) for _, _, d in self.segments)
+                + len(self.init_segment or b""),
+                "last_seq": self.seq,
+            }
+
+
+_hls_lock = threading.Lock()
+_hls_relays = {}
+
+
+def _get_relay(cam_id: str):
+    if not HLS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="GStreamer indisponivel para relay HLS")
+    source = next((s for s in RTSP_SOURCES if s["id"] == cam_id), None)
+    if source is None or not source.get("url"):
+        raise HTTPException(status_code=404, detail=f"Camera '{cam_id}' nao encontrada.")
+    with _hls_lock:
+        relay = _hls_relays.get(cam_id)
+        if relay is None:
+            relay = HlsRelay(cam_id, source["url"])
+            _hls_relays[cam_id] = relay
+    relay.touch()
+    return relay
+
+
 def _poll_label_metrics():
     while True:
+        # Cada endpoint e lido uma vez por ciclo (no layout batched, todas as
+        # cameras compartilham o mesmo /metrics).
+        fetched = {}
         for source in RTSP_SOURCES:
             cam_id = source["id"]
             metrics_url = source.get("metrics_url")
             if not metrics_url:
                 continue
-            try:
-                with urlopen(metrics_url, timeout=0.6) as resp:
-                    data = json.loads(resp.read().decode("utf-8"))
-                counts = data.get("counts", {}).get("total", {})
-                order = data.get("label_order", [])
-                with stats_lock:
-                    stats[cam_id]["labels"] = counts
-                    stats[cam_id]["label_order"] = order
-            except Exception:
-                with stats_lock:
-                    stats[cam_id]["labels"] = {}
-                    stats[cam_id]["label_order"] = []
+            if metrics_url not in fetched:
+                try:
+                    with urlopen(metrics_url, timeout=0.6) as resp:
+                        fetched[metrics_url] = json.loads(resp.read().decode("utf-8"))
+                except Exception:
+                    fetched[metrics_url] = None
+            data = fetched[metrics_url]
+            if data is None:
+                _update_stats(cam_id, labels={}, label_order=[])
+                continue
+            counts = data.get("counts", {})
+            if source.get("metrics_stream"):
+                labels = counts.get("streams", {}).get(source["metrics_stream"], {})
+            else:
+                labels = counts.get("total", {})
+            order = data.get("label_order", [])
+            _update_stats(cam_id, labels=labels, label_order=order)
         time.sleep(1.0)
 
 
@@ -151,10 +475,190 @@ _metrics_thread = threading.Thread(target=_poll_label_metrics, daemon=True)
 _metrics_thread.start()
 
 
+# ESTADO (push via WebSocket)
+class _CropIndex:
+    """
+    Recortes a partir do index.jsonl append-only do pipeline
+    (ds_analytics/pipeline/cropstore.py). So age quando o mtime muda: le
+    apenas as linhas novas desde o ultimo offset; inode trocado ou arquivo
+    menor (compactacao) forcam releitura completa. O ultimo recorte por
+    stream e o JSON de /crops (so esses ultimos, mais novo primeiro) ficam
+    em cache entre mudancas.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._inode = None
+        self._offset = 0
+        self._items = {}
+        self._latest = {}
+        self._body = b'{"items": []}'
+
+    def _reset(self):
+        self._inode = None
+        self._offset = 0
+        self._items = {}
+        self._latest = {}
+
+    def _apply(self, rec: dict, touched: set):
+        path = rec.get("path")
+        if not path:
+            return
+        if rec.get("op") == "del":
+            old = self._items.pop(path, None)
+            if old is not None:
+                touched.add(old["stream"])
+            return
+        item = {k: v for k, v in rec.items() if k != "op"}
+        if item.get("stream"):
+            self._items[path] = item
+            touched.add(item["stream"])
+
+    def _refresh(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            st = None
+        mtime = (st.st_mtime_ns, st.st_size) if st else None
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        if st is None:
+            self._reset()
+            self._body = b'{"items": []}'
+            return
+        reset = st.st_ino != self._inode or st.st_size < self._offset
+        if reset:
+            self._reset()
+            self._inode = st.st_ino
+        touched = set()
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read()
+        except OSError:
+            return
+        # linha incompleta no fim: fica para a proxima leitura
+        end = chunk.rfind(b"\n") + 1
+        self._offset += end
+        for line in chunk[:end].splitlines():
+            try:
+                self._apply(json.loads(line), touched)
+            except ValueError:
+                continue
+        if not touched and not reset:
+            return
+        for stream in touched:
+            self._latest.pop(stream, None)
+        for item in self._items.values():
+            stream = item["stream"]
+            if stream in touched and item.get("ts", 0) >= self._latest.get(stream, {}).get("ts", float("-inf")):
+                self._latest[stream] = item
+        # /crops entrega so o ultimo recorte de cada stream, mais novo primeiro
+        items = sorted(self._latest.values(), key=lambda it: it.get("ts", 0), reverse=True)
+        self._body = json.dumps({"items": items}).encode("utf-8")
+
+    def index_body(self):
+        with self._lock:
+            self._refresh()
+            return self._body
+
+    def latest(self, stream: str | None = None):
+        with self._lock:
+            self._refresh()
+            if stream is not None:
+                return self._latest.get(stream)
+            return dict(self._latest)
+
+
+crop_index = _CropIndex(CROPS_DIR / "index.jsonl")
+
+
+class StateHub:
+    """
+    Publica o estado do dashboard para todos os sockets de /ws/state.
+    Cada cliente recebe um snapshot completo ao conectar; depois, a cada
+    `interval_s`, um unico diff (apenas cameras/campos alterados) e
+    calculado e enviado a todos, independente do numero de abas.
+    O cliente entra em `clients` antes do snapshot ser tirado (nenhum diff
+    posterior e perdido) e o lock por socket garante que os diffs saem
+    depois do snapshot; o navegador aplica os dois como merge idempotente.
+    """
+
+    def __init__(self, interval_s: float = 0.5):
+        self.interval_s = interval_s
+        self.clients = {}
+        self._sent_crops = {}
+
+    def snapshot(self):
+        with stats_lock:
+            cameras = {cam_id: stats[cam_id].copy() for cam_id in stats}
+        return {"type": "snapshot", "cameras": cameras, "crops": crop_index.latest()}
+
+    def _diff(self):
+        with stats_lock:
+            dirty = list(stats_dirty)
+            stats_dirty.clear()
+            cameras = {cam_id: stats[cam_id].copy() for cam_id in dirty}
+        crops = {}
+        latest = crop_index.latest()
+        for stream, item in latest.items():
+            if self._sent_crops.get(stream) != item:
+                crops[stream] = item
+        self._sent_crops = latest
+        if not cameras and not crops:
+            return None
+        return {"type": "diff", "cameras": cameras, "crops": crops}
+
+    async def connect(self, ws):
+        lock = self.clients[ws] = asyncio.Lock()
+        async with lock:
+            await ws.send_text(json.dumps(self.snapshot()))
+
+    def disconnect(self, ws):
+        self.clients.pop(ws, None)
+
+    async def _send(self, ws, text):
+        lock = self.clients.get(ws)
+        if lock is None:
+            return
+        try:
+            async with lock:
+                await ws.send_text(text)
+        except Exception:
+            self.disconnect(ws)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            if not self.clients:
+                with stats_lock:
+                    stats_dirty.clear()
+                continue
+            diff = self._diff()
+            if diff is None:
+                continue
+            text = json.dumps(diff)
+            await asyncio.gather(*(self._send(ws, text) for ws in list(self.clients)))
+
+
+state_hub = StateHub()
+
+
+@app.on_event("startup")
+async def _start_state_hub():
+    asyncio.create_task(state_hub.run())
+
+
 # STREAM
-def generate_frames(cam_id):
+def generate_frames(cam_id, thumbnail=False):
     import cv2
-    """Gera frames JPEG (MJPEG) com calculo de FPS e suporte a fallback."""
+    """Gera frames JPEG (MJPEG) com calculo de FPS e suporte a fallback.
+
+    Com thumbnail=True decodifica apenas keyframes em resolucao reduzida.
+    """
     source = next((s for s in RTSP_SOURCES if s["id"] == cam_id), None)
     if source is None:
         raise RuntimeError(f"Camera '{cam_id}' nao encontrada.")
@@ -163,7 +667,9 @@ def generate_frames(cam_id):
     backoff = 0.5
     prev_time = time.time()
     frame_count = 0
+    last_yield = 0.0
     rtsp_url = source.get("url")
+    fps_key = "thumb_fps" if thumbnail else "fps"
 
     while True:
         if cap is None or not cap.isOpened():
@@ -172,34 +678,46 @@ def generate_frames(cam_id):
                     rtsp_url = find_working_rtsp(source.get("candidates", []))
             except RuntimeError:
                 print("Nenhum stream RTSP acessivel. Tentando novamente...")
-                with stats_lock:
-                    stats[cam_id]["status"] = "offline"
+                _update_stats(cam_id, status="offline")
                 time.sleep(3)
                 continue
 
-            cap = open_capture(rtsp_url)
+            cap = open_capture(rtsp_url, thumbnail=thumbnail)
             if not cap.isOpened():
                 time.sleep(backoff)
                 backoff = min(backoff * 2, 5)
                 cap.release()
                 cap = None
-                with stats_lock:
-                    stats[cam_id]["status"] = "offline"
+                _update_stats(cam_id, status="offline")
                 continue
             backoff = 0.5
-            with stats_lock:
-                stats[cam_id]["status"] = "online"
-                stats[cam_id]["url"] = rtsp_url
+            _update_stats(cam_id, status="online", url=rtsp_url)
 
-        ok, frame = cap.read()
+        if thumbnail and time.time() - last_yield < THUMB_MIN_INTERVAL_S:
+            # Fallback FFMPEG entrega todos os frames: dentro do intervalo so
+            # avanca o stream com grab(), sem retrieve (conversao BGR + copia).
+            ok, frame = cap.grab(), None
+            if ok:
+                continue
+        else:
+            ok, frame = cap.read()
         if not ok or frame is None:
             print("Perda de conexao com RTSP. Reabrindo...")
             cap.release()
             cap = None
-            with stats_lock:
-                stats[cam_id]["status"] = "offline"
+            _update_stats(cam_id, status="offline")
             continue
 
+        if thumbnail:
+            # Fallback FFMPEG nao reduz a resolucao: reduz aqui.
+            last_yield = time.time()
+            if frame.shape[1] != THUMB_WIDTH:
+                h, w = frame.shape[:2]
+                thumb_h = max(2, int(round(THUMB_WIDTH * h / w / 2)) * 2)
+                frame = cv2.resize(
+                    frame, (THUMB_WIDTH, thumb_h), interpolation=cv2.INTER_AREA
+                )
+
         # Se estiver usando um stream sem overlay, desenha uma bbox generica
         if rtsp_url and "video02" in rtsp_url:
             h, w, _ = frame.shape
@@ -211,8 +729,8 @@ def generate_frames(cam_id):
         curr_time = time.time()
         elapsed = curr_time - prev_time
         if elapsed >= 1.0:
-            with stats_lock:
-                stats[cam_id]["fps"] = frame_count / elapsed
+            # 1 casa decimal: e a precisao exibida e evita diffs a cada segundo.
+            _update_stats(cam_id, **{fps_key: round(frame_count / elapsed, 1)})
             frame_count = 0
             prev_time = curr_time
 
@@ -245,30 +763,92 @@ def config():
                 "url": source.get("url"),
             }
         )
-    return JSONResponse({"cameras": payload})
+    return JSONResponse(
+        {
+            "cameras": payload,
+            "stream_mode": STREAM_MODE if HLS_AVAILABLE else "mjpeg",
+        }
+    )
 
 
 @app.get("/crops")
 def crops_index():
-    index_file = CROPS_DIR / "index.json"
-    if not index_file.exists():
-        return JSONResponse({"items": []})
+    return Response(content=crop_index.index_body(), media_type="application/json")
+
+
+@app.websocket("/ws/state")
+async def ws_state(ws: WebSocket):
+    """Snapshot completo ao conectar e depois apenas diffs de FPS/status/labels/recortes."""
+    await ws.accept()
     try:
-        with open(index_file, "r", encoding="utf-8") as f:
-            return JSONResponse(json.load(f))
-    except Exception:
-        return JSONResponse({"items": []})
+        await state_hub.connect(ws)
+        while True:
+            await ws.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        state_hub.disconnect(ws)
 
 
 @app.get("/video_feed/{cam_id}")
-def video_feed(cam_id: str):
-    """Endpoint MJPEG."""
+def video_feed(cam_id: str, thumb: bool = False):
+    """Endpoint MJPEG (thumb=1: so keyframes, com THUMB_WIDTH de largura)."""
     return StreamingResponse(
-        generate_frames(cam_id),
+        generate_frames(cam_id, thumbnail=thumb),
         media_type="multipart/x-mixed-replace; boundary=frame",
     )
 
 
+@app.get("/hls/{cam_id}/index.m3u8")
+def hls_playlist(cam_id: str):
+    """Playlist HLS (fMP4) do relay sem decodificacao."""
+    relay = _get_relay(cam_id)
+    relay.wait_ready(timeout=HLS_FRAGMENT_MS / 1000.0 * 3 + 5)
+    text = relay.playlist()
+    if text is None:
+        raise HTTPException(status_code=503, detail="Relay HLS ainda sem segmentos")
+    return Response(
+        text,
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@app.get("/hls/{cam_id}/init.mp4")
+def hls_init(cam_id: str):
+    relay = _get_relay(cam_id)
+    with relay.lock:
+        data = relay.init_segment
+    if data is None:
+        raise HTTPException(status_code=404, detail="Init segment indisponivel")
+    return Response(data, media_type="video/mp4", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/hls/{cam_id}/seg{seq}.m4s")
+def hls_segment(cam_id: str, seq: int):
+    relay = _get_relay(cam_id)
+    data = relay.segment(seq)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Segmento fora do cache")
+    return Response(data, media_type="video/iso.segment")
+
+
+@app.get("/relay/stats")
+def relay_stats():
+    """CPU do processo (% de um core) + estado do cache dos relays HLS."""
+    with _hls_lock:
+        relays = dict(_hls_relays)
+    payload = cpu_meter.snapshot()
+    return JSONResponse(
+        {
+            "stream_mode": STREAM_MODE,
+            "hls_available": HLS_AVAILABLE,
+            "process_cpu_pct": payload["process_cpu_pct"],
+            "relays": {cam_id: relay.info() for cam_id, relay in relays.items()},
+        }
+    )
+
+
 @app.get("/metrics")
 def metrics():
     """Retorna FPS e status."""
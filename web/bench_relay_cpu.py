@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark de CPU por stream: relay HLS (remux, sem decodificar) vs MJPEG
+(decodifica + JPEG) vs miniatura MJPEG (?thumb=1).
+
+Cada modo roda sozinho em um processo filho, consumindo uma camera por
+--seconds apos --warmup-s. CPU = getrusage(RUSAGE_SELF) do filho na janela
+/ tempo de parede, o que inclui todas as threads (streaming do GStreamer,
+threads do FFMPEG/OpenCV, Python). O modo "idle" so importa o app e mede
+o custo de fundo (poller de /metrics etc.), que e o mesmo nos outros modos.
+
+Uso (a partir da raiz do repo, no mesmo ambiente do servico web):
+  python3 -m web.bench_relay_cpu --cam video01 --seconds 30
+  python3 -m web.bench_relay_cpu --cam video03 --modes mjpeg hls --json /tmp/relay_cpu.json
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+MODES = ("idle", "mjpeg", "mjpeg_thumb", "hls")
+
+
+def _cpu_s():
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return ru.ru_utime + ru.ru_stime
+
+
+def _consume(app, mode: str, cam_id: str, until: float):
+    """Consome o stream ate `until`; devolve o numero de frames/segmentos."""
+    if mode == "idle":
+        time.sleep(max(0.0, until - time.time()))
+        return 0
+    if mode == "hls":
+        relay = app._get_relay(cam_id)
+        last = 0
+        while time.time() < until:
+            relay.touch()
+            time.sleep(0.5)
+            last = relay.info()["last_seq"]
+        return last
+    n = 0
+    for _ in app.generate_frames(cam_id, thumbnail=(mode == "mjpeg_thumb")):
+        n += 1
+        if time.time() >= until:
+            break
+    return n
+
+
+def child(args):
+    from web import app
+
+    if args.mode == "hls" and not app.HLS_AVAILABLE:
+        print(json.dumps({"mode": args.mode, "error": "GStreamer indisponivel (HLS_AVAILABLE=False)"}))
+        return 1
+    start = time.time()
+    # aquecimento: conexao RTSP, negociacao e threads internas ja criadas
+    _consume(app, args.mode, args.cam, start + args.warmup_s)
+    cpu0, wall0 = _cpu_s(), time.time()
+    seq0 = app._hls_relays[args.cam].info()["last_seq"] if args.mode == "hls" else 0
+    units = _consume(app, args.mode, args.cam, wall0 + args.seconds) - seq0
+    wall = time.time() - wall0
+    cpu = _cpu_s() - cpu0
+    print(
+        json.dumps(
+            {
+                "mode": args.mode,
+                "cam": args.cam,
+                "seconds": round(wall, 2),
+                "cpu_s": round(cpu, 3),
+                "cpu_pct": round(100.0 * cpu / wall, 2),
+                # frames JPEG entregues (MJPEG) ou segmentos fMP4 (HLS)
+                "units": units,
+            }
+        )
+    )
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="CPU por stream: HLS (remux) vs MJPEG")
+    ap.add_argument("--cam", default="video01", help="id da camera (CAMERA_DEFS do web/app.py)")
+    ap.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    ap.add_argument("--seconds", type=float, default=30.0)
+    ap.add_argument("--warmup-s", type=float, default=5.0)
+    ap.add_argument("--json", default="", help="Grava os resultados")
+    ap.add_argument("--child", dest="mode", choices=MODES, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.mode:
+        return child(args)
+
+    results = []
+    for mode in args.modes:
+        cmd = [
+            sys.executable, "-m", "web.bench_relay_cpu", "--child", mode, "--cam", args.cam,
+            "--seconds", str(args.seconds), "--warmup-s", str(args.warmup_s),
+        ]
+        out = subprocess.run(cmd, capture_output=True, text=True)
+        lines = [ln for ln in out.stdout.splitlines() if ln.startswith("{")]
+        res = json.loads(lines[-1]) if lines else {"mode": mode, "error": out.stderr.strip()[-300:]}
+        results.append(res)
+
+    idle = next((r["cpu_pct"] for r in results if r.get("mode") == "idle" and "cpu_pct" in r), 0.0)
+    print(f"{'modo':<12} {'cpu %':>7} {'- idle':>7} {'units':>7}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['mode']:<12} erro: {r['error']}")
+            continue
+        r["cpu_pct_over_idle"] = round(r["cpu_pct"] - idle, 2)
+        print(f"{r['mode']:<12} {r['cpu_pct']:>7} {r['cpu_pct_over_idle']:>7} {r['units']:>7}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f">> Resultados: {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,14 +6,62 @@ async function fetchConfig() {
   return await res.json();
 }
 
-function buildCard(cam) {
+function canPlayHls() {
+  const probe = document.createElement("video");
+  return (
+    probe.canPlayType("application/vnd.apple.mpegurl") !== "" ||
+    (window.Hls !== undefined && window.Hls.isSupported())
+  );
+}
+
+function videoMarkup(cam, mode) {
+  if (mode === "hls") {
+    return `<video data-cam="${cam.id}" muted autoplay playsinline></video>`;
+  }
+  return `<img data-cam="${cam.id}" src="/video_feed/${cam.id}?thumb=1" alt="Stream ${cam.label}">`;
+}
+
+// Miniaturas usam o feed so de keyframes; o card principal usa o feed completo.
+function setFeedQuality(card, full) {
+  const img = card.querySelector(".video-container img");
+  if (!img) return;
+  const src = `/video_feed/${card.dataset.camId}` + (full ? "" : "?thumb=1");
+  if (img.getAttribute("src") !== src) img.setAttribute("src", src);
+  showFps(card.dataset.camId);
+}
+
+// Cards em miniatura (?thumb=1) mostram o FPS do feed de keyframes (thumb_fps).
+function showFps(camId) {
+  const fpsEl = document.getElementById("fps-" + camId);
+  const cam = camState[camId];
+  if (!fpsEl || !cam) return;
+  const img = document.querySelector(`img[data-cam="${camId}"]`);
+  const thumb = img !== null && (img.getAttribute("src") || "").includes("thumb=1");
+  const fps = thumb ? cam.thumb_fps : cam.fps;
+  fpsEl.textContent = (fps || 0).toFixed(1);
+}
+
+function attachHls(card, cam) {
+  const video = card.querySelector("video");
+  if (!video) return;
+  const src = `/hls/${cam.id}/index.m3u8`;
+  if (video.canPlayType("application/vnd.apple.mpegurl") !== "") {
+    video.src = src;
+    return;
+  }
+  const hls = new window.Hls({ lowLatencyMode: true, liveSyncDurationCount: 2 });
+  hls.loadSource(src);
+  hls.attachMedia(video);
+}
+
+function buildCard(cam, mode) {
   const card = document.createElement("div");
   card.className = "card cam-card";
   card.dataset.camId = cam.id;
   card.innerHTML = `
     <div class="card-title">${cam.label}</div>
     <div class="video-container">
-      <img data-cam="${cam.id}" src="/video_feed/${cam.id}" alt="Stream ${cam.label}">
+      ${videoMarkup(cam, mode)}
     </div>
     <div class="stats">
       <span class="stat">FPS: <b id="fps-${cam.id}">0</b></span>
@@ -51,20 +99,36 @@ function updateLabels(camId, cam) {
       : "Labels: <b>Sem dados</b>";
 }
 
+const camState = {};
+
+function applyStat(camId, stat) {
+  const cam = Object.assign(camState[camId] || {}, stat);
+  camState[camId] = cam;
+  const statusEl = document.getElementById("status-" + camId);
+  if (stat.fps !== undefined || stat.thumb_fps !== undefined) showFps(camId);
+  if (statusEl && stat.status !== undefined) {
+    statusEl.textContent = cam.status === "online" ? "Online" : "Offline";
+  }
+  if (stat.labels !== undefined || stat.label_order !== undefined) {
+    updateLabels(camId, cam);
+  }
+}
+
+function applyCrop(camId, item) {
+  const img = document.getElementById("crop-" + camId);
+  if (!img || !item) return;
+  img.src = item.path + "?t=" + Math.floor(item.ts * 1000);
+  img.style.display = "block";
+}
+
 async function updateStats(cams) {
   try {
     const res = await fetch("/metrics");
     if (!res.ok) throw new Error();
     const data = await res.json();
     for (const cam of cams) {
-      const camId = cam.id;
-      const stat = data[camId];
-      if (!stat) continue;
-      const fpsEl = document.getElementById("fps-" + camId);
-      const statusEl = document.getElementById("status-" + camId);
-      if (fpsEl) fpsEl.textContent = stat.fps.toFixed(1);
-      if (statusEl) statusEl.textContent = stat.status === "online" ? "Online" : "Offline";
-      updateLabels(camId, stat);
+      const stat = data[cam.id];
+      if (stat) applyStat(cam.id, stat);
     }
   } catch {
     for (const cam of cams) {
@@ -84,8 +148,10 @@ function attachSwapHandlers() {
     if (currentMain === card) return;
     if (currentMain) {
       thumbGrid.prepend(currentMain);
+      setFeedQuality(currentMain, false);
     }
     mainSlot.appendChild(card);
+    setFeedQuality(card, true);
     window.scrollTo({ top: 0, behavior: "smooth" });
   }
 
@@ -101,6 +167,7 @@ function attachSwapHandlers() {
     const card = e.target.closest(".cam-card");
     if (!card) return;
     thumbGrid.prepend(card);
+    setFeedQuality(card, false);
     setMainCard(thumbGrid.querySelector(".cam-card"));
   });
 }
@@ -112,26 +179,66 @@ async function updateCrops(cams) {
     const data = await res.json();
     const items = data.items || [];
     for (const cam of cams) {
-      const item = items.find((it) => it.stream === cam.id);
-      if (!item) continue;
-      const img = document.getElementById("crop-" + cam.id);
-      if (!img) continue;
-      img.src = item.path + "?t=" + Math.floor(item.ts * 1000);
-      img.style.display = "block";
+      applyCrop(cam.id, items.find((it) => it.stream === cam.id));
     }
   } catch {}
 }
 
+// Estado via WebSocket (snapshot + diffs); polling apenas enquanto o socket
+// estiver fechado.
+function connectState(cams) {
+  let pollTimers = [];
+  const startPolling = () => {
+    if (pollTimers.length > 0) return;
+    pollTimers = [
+      setInterval(() => updateStats(cams), 1000),
+      setInterval(() => updateCrops(cams), 1500),
+    ];
+  };
+  const stopPolling = () => {
+    pollTimers.forEach(clearInterval);
+    pollTimers = [];
+  };
+
+  const proto = window.location.protocol === "https:" ? "wss:" : "ws:";
+  let ws;
+  try {
+    ws = new WebSocket(`${proto}//${window.location.host}/ws/state`);
+  } catch {
+    startPolling();
+    return;
+  }
+  ws.onopen = stopPolling;
+  ws.onmessage = (ev) => {
+    const msg = JSON.parse(ev.data);
+    for (const [camId, stat] of Object.entries(msg.cameras || {})) {
+      applyStat(camId, stat);
+    }
+    for (const [camId, item] of Object.entries(msg.crops || {})) {
+      applyCrop(camId, item);
+    }
+  };
+  ws.onclose = () => {
+    startPolling();
+    setTimeout(() => {
+      stopPolling();
+      connectState(cams);
+    }, 3000);
+  };
+}
+
 async function boot() {
   const cfg = await fetchConfig();
   const cams = cfg.cameras || [];
+  const mode = cfg.stream_mode === "hls" && canPlayHls() ? "hls" : "mjpeg";
   const grid = document.getElementById("thumb-grid");
   for (const cam of cams) {
-    grid.appendChild(buildCard(cam));
+    const card = buildCard(cam, mode);
+    grid.appendChild(card);
+    if (mode === "hls") attachHls(card, cam);
   }
   attachSwapHandlers();
-  setInterval(() => updateStats(cams), 1000);
-  setInterval(() => updateCrops(cams), 1500);
+  connectState(cams);
 }
 
 boot().catch((err) => {
@@ -0,0 +1,34 @@
+#!/usr/bin/env bash
+# Baixa o hls.js do painel (versao fixa) para web/static/vendor e confere o
+# sha256 gravado em hls.min.js.sha256. Sem o .sha256 (primeira vez), grava
+# o do arquivo baixado: commite os dois para fixar a copia.
+# Uso: web/vendor_hls.sh [versao]   (chamado pelo make vendor-hls e pelo compose)
+set -euo pipefail
+
+VERSION="${1:-${HLS_JS_VERSION:-1.5.20}}"
+DIR="$(cd "$(dirname "$0")" && pwd)/static/vendor"
+FILE="$DIR/hls.min.js"
+SUM="$FILE.sha256"
+URL="https://cdn.jsdelivr.net/npm/hls.js@${VERSION}/dist/hls.min.js"
+
+mkdir -p "$DIR"
+if [ ! -s "$FILE" ]; then
+  if ! curl -fsSL "$URL" -o "$FILE.tmp"; then
+    rm -f "$FILE.tmp"
+    echo ">> hls.js: download falhou ($URL); o painel usa MJPEG" >&2
+    exit 0
+  fi
+  mv "$FILE.tmp" "$FILE"
+fi
+
+if [ -s "$SUM" ]; then
+  if ! (cd "$DIR" && sha256sum --quiet -c "$(basename "$SUM")"); then
+    echo ">> hls.js: sha256 nao confere com $SUM; arquivo removido" >&2
+    rm -f "$FILE"
+    exit 1
+  fi
+else
+  (cd "$DIR" && sha256sum "$(basename "$FILE")" > "$(basename "$SUM")")
+  echo ">> hls.js ${VERSION}: $SUM gravado (commite hls.min.js e o .sha256)"
+fi
+echo ">> hls.js ${VERSION} ok: $FILE"